@@ -0,0 +1,56 @@
+"""
+Concurrency benchmark for the async data-access layer.
+
+Fires N concurrent requests at the FastAPI app (in-process, via
+httpx.ASGITransport) against a fake backend with a fixed round-trip
+latency. "blocking" emulates the old sync client, which sleeps on the
+event loop; "async" is the awaited client.
+
+    python bench/bench_async_io.py --concurrency 200 --latency 0.02
+"""
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import httpx
+
+from fake_supabase import FakeSupabase
+from src import db
+from src.main import app
+
+
+async def run(concurrency: int, latency: float, blocking: bool) -> dict:
+    backend = FakeSupabase(latency=latency, blocking=blocking)
+    backend.tables["customers"].append({
+        "customer_id": backend.next_id("customers"), "first_name": "Bench",
+        "last_name": "User", "email": "bench@example.com", "password_hash": "x",
+    })
+    db.set_client(backend)
+
+    samples = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            r = await client.get("/get_customer_details", params={"email": "bench@example.com"})
+            r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(common.timed(one, samples, start) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return common.summarize(samples, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake round-trip seconds")
+    args = parser.parse_args()
+
+    for label, blocking in (("before (blocking client)", True), ("after (async client)", False)):
+        stats = asyncio.run(run(args.concurrency, args.latency, blocking))
+        common.print_row(label, stats)
+
+
+if __name__ == "__main__":
+    main()
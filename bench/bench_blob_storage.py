@@ -0,0 +1,154 @@
+"""
+Storage size and latency of inline itinerary_data against content-addressed blobs.
+
+Builds a corpus the way users fill the table: --users customers save
+--per-user itineraries each, drawn from --templates popular trips (a few
+much more popular than the rest). --duplicates of the saves are exact
+copies of a trip, the rest a copy with one activity edited. The same
+corpus is loaded with ITINERARY_STORAGE=inline and with blobs under each
+available encoding. Reports the bytes stored, the latency of each
+customer's batch insert, of reading all their itineraries with a cold
+and then a warm blob cache, and of listing only names, which never
+touches a blob. The memory backend adds --latency per query for the
+round trip. With --dsn it runs against Postgres instead, in a scratch
+database it creates and drops, and the sizes include TOAST and indexes.
+
+    python bench/bench_blob_storage.py --users 200 --per-user 10 --templates 40
+"""
+import argparse
+import asyncio
+import copy
+import logging
+import random
+from typing import Any, Dict, List
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import orjson
+
+from src.blobs import BlobCodec, BlobRepository
+from src.memory_repository import MemoryRepository
+from src.repository import ITINERARY_SUMMARY_COLUMNS, Repository
+
+SCRATCH_DATABASE = "bench_blob_storage"
+
+
+def corpus(args: argparse.Namespace) -> List[List[Dict[str, Any]]]:
+    """itinerary rows (without customer_id) per customer."""
+    rng = random.Random(3)
+    templates = []
+    for _ in range(args.templates):
+        trip = common.itinerary_of_size(rng.choice([2_000, 5_000, 10_000, 20_000]), rng)
+        start = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 21):02d}"
+        templates.append({**trip, "destination": rng.choice(common.CITIES), "start_date": start,
+                          "end_date": start[:-2] + f"{int(start[-2:]) + 7:02d}"})
+    # Popularity falls off like 1/rank: a few trips are saved over and over
+    weights = [1 / (rank + 1) for rank in range(len(templates))]
+    users = []
+    for u in range(args.users):
+        rows = []
+        for i in range(args.per_user):
+            trip = rng.choices(templates, weights)[0]
+            if rng.random() >= args.duplicates:
+                trip = copy.deepcopy(trip)
+                day = rng.choice(trip["days"])
+                rng.choice(day["activities"])["notes"] = f"Edited by user {u}: {rng.choice(common.WORDS)}"
+            rows.append({"itinerary_name": f"{trip['destination']} trip {i}", "itinerary_data": trip})
+        users.append(rows)
+    return users
+
+
+async def stored_bytes(inner: Repository) -> int:
+    if isinstance(inner, MemoryRepository):
+        rows = sum(len(row["itinerary_data"] or b"") for row in inner._itineraries.values())
+        return rows + sum(len(blob.data) for blob in inner._blobs.values())
+    async with inner.pool.acquire() as conn:
+        await conn.execute("VACUUM ANALYZE itineraries")
+        await conn.execute("VACUUM ANALYZE itinerary_blobs")
+        return await conn.fetchval(
+            "SELECT pg_total_relation_size('itineraries') + pg_total_relation_size('itinerary_blobs')"
+        )
+
+
+async def run(args: argparse.Namespace, users: List[List[Dict[str, Any]]], inner: Repository, encoding: str | None) -> None:
+    repo = inner if encoding is None else BlobRepository(inner, BlobCodec(encoding))
+    customer_ids = [
+        await inner.insert_customer({"first_name": "Blob", "last_name": f"User{u}",
+                                     "email": f"blob-{u}@example.com", "password_hash": "x"})
+        for u in range(len(users))
+    ]
+
+    writes: List[float] = []
+    for cid, rows in zip(customer_ids, users):
+        await common.timed(lambda: repo.insert_itineraries([{**row, "customer_id": cid} for row in rows]), writes)
+    size = await stored_bytes(inner)
+
+    label = "inline" if encoding is None else f"blob ({encoding})"
+    raw = sum(len(orjson.dumps(row["itinerary_data"])) for rows in users for row in rows)
+    print(f"{label:<14} stored={size / 1e6:>8.2f} MB ({size / raw:>6.1%} of the JSON)  "
+          f"insert p50={common.percentile(writes, 50) * 1000:>7.2f}ms p99={common.percentile(writes, 99) * 1000:>7.2f}ms")
+    for read, columns in (("read all, cold", None), ("read all, warm", None), ("names only", ITINERARY_SUMMARY_COLUMNS)):
+        samples: List[float] = []
+        for cid in customer_ids:
+            if columns is None:
+                await common.timed(lambda: repo.list_itineraries(cid), samples)
+            else:
+                await common.timed(lambda: repo.list_itineraries(cid, columns), samples)
+        print(f"  {read:<16} p50={common.percentile(samples, 50) * 1000:>7.2f}ms "
+              f"p99={common.percentile(samples, 99) * 1000:>7.2f}ms")
+
+
+async def run_all(args: argparse.Namespace) -> None:
+    users = corpus(args)
+    encodings: List[str | None] = [None, "gzip"]
+    try:
+        import zstandard  # noqa: F401
+        encodings.append("zstd")
+    except ImportError:
+        print("(zstandard is not installed; skipping zstd)")
+    distinct = len({orjson.dumps(row["itinerary_data"], option=orjson.OPT_SORT_KEYS) for rows in users for row in rows})
+    saves = sum(map(len, users))
+    print(f"{saves} itineraries, {distinct} distinct payloads; "
+          f"{'Postgres' if args.dsn else f'memory backend, {args.latency * 1000:g}ms per query'}")
+
+    if not args.dsn:
+        for encoding in encodings:
+            await run(args, users, MemoryRepository(args.latency), encoding)
+        return
+
+    import asyncpg
+    from src import migrations
+    from src.postgres_repository import PostgresRepository
+
+    admin = await asyncpg.connect(args.dsn)
+    try:
+        for encoding in encodings:
+            await admin.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DATABASE}")
+            await admin.execute(f"CREATE DATABASE {SCRATCH_DATABASE}")
+            conn = await asyncpg.connect(args.dsn, database=SCRATCH_DATABASE)
+            await migrations.upgrade(conn)
+            await conn.close()
+            repo = await PostgresRepository.connect(args.dsn, database=SCRATCH_DATABASE, min_size=1, max_size=4)
+            try:
+                await run(args, users, repo, encoding)
+            finally:
+                await repo.close()
+    finally:
+        await admin.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DATABASE}")
+        await admin.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--per-user", type=int, default=10, help="itineraries each customer saves")
+    parser.add_argument("--templates", type=int, default=40, help="distinct popular trips")
+    parser.add_argument("--duplicates", type=float, default=0.7, help="fraction of saves that are exact copies")
+    parser.add_argument("--latency", type=float, default=0.001, help="memory backend round trip, seconds")
+    parser.add_argument("--dsn", help="run against Postgres; a scratch database is created and dropped")
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.WARNING)
+    asyncio.run(run_all(args))
+
+
+if __name__ == "__main__":
+    main()
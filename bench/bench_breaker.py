@@ -0,0 +1,187 @@
+"""
+Backend outage drill: circuit breaker and stale-if-error against a faulty backend.
+
+--clients callers keep reading GET /me/get_all_itineraries through the
+app while the in-process backend goes healthy -> down -> healthy. Down
+means every query hangs for --hang seconds and then fails, as a client
+timing out on an unreachable database does (--fault refuse fails at once
+instead). Each configuration reports, per phase, fresh answers, stale
+answers (200 with a Warning header), errors, latency percentiles and
+backend queries, then how long after the backend came back the first
+fresh answer went out: without the breaker every request during the
+outage waits out the hang, with it they are shed in microseconds and
+recovery waits for the first half-open probe. Last, a bulk save
+(POST /save_itineraries) sent while the backend refuses connections must
+answer 503 with Retry-After, not 201 with per-item errors; the script
+exits non-zero if not.
+
+    python bench/bench_breaker.py --clients 20 --outage 3 --reset 1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import httpx
+
+os.environ.setdefault("DB_BACKEND", "memory")
+
+from src import db, tokens  # noqa: E402
+from src import main as app_module  # noqa: E402
+from src.breaker import CircuitBreaker  # noqa: E402
+from src.main import app  # noqa: E402
+from src.memory_repository import MemoryRepository  # noqa: E402
+from src.repository import RepositoryError  # noqa: E402
+
+CONFIGS = (
+    ("neither", False, False),
+    ("stale only", False, True),
+    ("breaker only", True, False),
+    ("breaker + stale", True, True),
+)
+
+
+class FaultyRepository(MemoryRepository):
+    """A MemoryRepository whose queries can be made to hang and fail, or fail at once."""
+
+    def __init__(self, latency: float, hang: float):
+        super().__init__(latency)
+        self.hang = hang
+        self.fault: str | None = None
+
+    async def _round_trip(self) -> None:
+        self.calls += 1
+        if self.fault == "hang":
+            await asyncio.sleep(self.hang)
+            raise RepositoryError("timed out waiting for the database")
+        if self.fault == "refuse":
+            raise RepositoryError("connection refused")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+async def seed(repo: FaultyRepository, users: int) -> List[str]:
+    latency, repo.latency = repo.latency, 0.0
+    tokens_by_user = []
+    for u in range(users):
+        cid = await repo.insert_customer({"first_name": "Out", "last_name": f"Age{u}",
+                                          "email": f"outage-{u}@example.com", "password_hash": "x"})
+        await repo.insert_itineraries([
+            {"customer_id": cid, "itinerary_name": f"Trip {i}", "itinerary_data": {"day": i}} for i in range(5)
+        ])
+        tokens_by_user.append(tokens.issue_token(cid))
+    repo.latency, repo.calls = latency, 0
+    return tokens_by_user
+
+
+async def run(args: argparse.Namespace, label: str, breaker_on: bool, stale_on: bool) -> None:
+    repo = FaultyRepository(args.latency, args.hang)
+    # get_repository() wraps the new repository in whatever db.breaker is then
+    db.breaker = CircuitBreaker("backend", failure_threshold=args.threshold, reset_timeout=args.reset,
+                                enabled=breaker_on)
+    db.set_repository(repo)
+    app_module.stale_responses.clear()
+    app_module.stale_responses.max_age = args.max_age if stale_on else 0
+    bearer = await seed(repo, args.users)
+
+    phases = (("healthy", args.healthy, None), ("outage", args.outage, args.fault), ("recovered", args.recovered, None))
+    results: Dict[str, List[tuple]] = {name: [] for name, _, _ in phases}
+    backend_calls: Dict[str, int] = {}
+    phase = phases[0][0]
+    recovered_at = 0.0
+    first_fresh: float | None = None
+    stop = False
+
+    async def client(i: int) -> None:
+        nonlocal first_fresh
+        headers = {"Authorization": f"Bearer {bearer[i % len(bearer)]}"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            while not stop:
+                sent_in, start = phase, time.perf_counter()
+                r = await http.get("/me/get_all_itineraries", headers=headers)
+                done = time.perf_counter()
+                stale = "warning" in r.headers
+                results[sent_in].append((done - start, r.status_code, stale))
+                if sent_in == "recovered" and r.status_code == 200 and not stale and first_fresh is None:
+                    first_fresh = done - recovered_at
+                await asyncio.sleep(args.think)
+
+    clients = [asyncio.create_task(client(i)) for i in range(args.clients)]
+    for name, duration, fault in phases:
+        phase, repo.fault, calls = name, fault, repo.calls
+        if name == "recovered":
+            recovered_at = time.perf_counter()
+        await asyncio.sleep(duration)
+        backend_calls[name] = repo.calls - calls
+    stop = True
+    await asyncio.gather(*clients)
+
+    print(label)
+    for name, _, _ in phases:
+        rows = results[name]
+        latencies = [latency for latency, _, _ in rows]
+        fresh = sum(status == 200 and not stale for _, status, stale in rows)
+        stale = sum(stale for _, _, stale in rows)
+        print(f"  {name:<10} requests={len(rows):<6} fresh={fresh:<6} stale={stale:<6} "
+              f"errors={len(rows) - fresh - stale:<6} p50={common.percentile(latencies, 50) * 1000:>8.2f}ms "
+              f"p99={common.percentile(latencies, 99) * 1000:>8.2f}ms backend queries={backend_calls[name]}")
+    recovery = "never" if first_fresh is None else f"{first_fresh * 1000:.0f}ms"
+    print(f"  first fresh answer after recovery: {recovery}; circuit opened {db.breaker.opened} time(s)")
+
+
+async def bulk_save_during_outage(args: argparse.Namespace) -> bool:
+    """True if a bulk save hitting the outage answers 503 with Retry-After."""
+    repo = FaultyRepository(0.0, args.hang)
+    db.breaker = CircuitBreaker("backend", failure_threshold=args.threshold, reset_timeout=args.reset)
+    db.set_repository(repo)
+    await repo.insert_customer({"first_name": "Bulk", "last_name": "Save", "email": "bulk@example.com",
+                                "password_hash": "x"})
+    form = {"email": "bulk@example.com", "itineraries": '[{"itinerary_name": "a", "itinerary_data": {}}, {"itinerary_name": "b", "itinerary_data": {}}]'}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        # The first save caches the customer_id, so the outage hits the inserts
+        healthy = await http.post("/save_itineraries", data=form)
+        repo.fault = "refuse"
+        down = await http.post("/save_itineraries", data=form)
+    passed = healthy.status_code == 201 and down.status_code == 503 and "retry-after" in down.headers
+    print(f"bulk save during outage: healthy={healthy.status_code} down={down.status_code} "
+          f"Retry-After={down.headers.get('retry-after')} {'ok' if passed else 'FAIL'}")
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20, help="concurrent callers")
+    parser.add_argument("--users", type=int, default=10, help="distinct customers the callers read")
+    parser.add_argument("--think", type=float, default=0.01, help="pause between a caller's requests, seconds")
+    parser.add_argument("--latency", type=float, default=0.005, help="healthy backend query time, seconds")
+    parser.add_argument("--fault", choices=("hang", "refuse"), default="hang")
+    parser.add_argument("--hang", type=float, default=1.0, help="how long a query hangs before failing, seconds")
+    parser.add_argument("--healthy", type=float, default=1.0, help="phase lengths, seconds")
+    parser.add_argument("--outage", type=float, default=3.0)
+    parser.add_argument("--recovered", type=float, default=2.0)
+    parser.add_argument("--threshold", type=int, default=5, help="failures in a row that open the circuit")
+    parser.add_argument("--reset", type=float, default=1.0, help="seconds the circuit stays open before a probe")
+    parser.add_argument("--max-age", type=float, default=600.0, help="oldest stale answer served, seconds")
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.CRITICAL)
+
+    print(f"{args.clients} callers; backend {args.latency * 1000:.0f}ms, down ({args.fault}) for {args.outage:g}s "
+          f"after {args.healthy:g}s; breaker opens after {args.threshold} failures, probes every {args.reset:g}s")
+
+    async def run_all() -> bool:
+        for label, breaker_on, stale_on in CONFIGS:
+            await run(args, label, breaker_on, stale_on)
+        ok = await bulk_save_during_outage(args)
+        await db.close_client()
+        return ok
+
+    if not asyncio.run(run_all()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Bandwidth and latency of itinerary reads with compression and ETags.
+
+Loads a corpus of itineraries (a few KB to ~100 KB each) into the fake
+backend and fetches GET /me/get_all_itineraries and /me/get_itinerary
+with identity, gzip and brotli encodings. It reports the bytes on the
+wire, server-side p50 latency and the estimated time over a slow link.
+A last row revalidates with If-None-Match, which costs a bodyless 304.
+
+    python bench/bench_compression.py --requests 100 --link-mbps 10
+"""
+import argparse
+import asyncio
+import logging
+import random
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import httpx
+
+from fake_supabase import FakeSupabase
+from src import db, tokens
+from src.main import app
+
+
+async def run(requests: int, link_mbps: float) -> None:
+    backend = FakeSupabase()
+    cid = backend.next_id("customers")
+    backend.tables["customers"].append({
+        "customer_id": cid, "first_name": "Bench", "last_name": "User",
+        "email": "bench@example.com", "password_hash": "x",
+    })
+    rng = random.Random(7)
+    for i in range(20):
+        backend.tables["itineraries"].append({
+            "itinerary_id": backend.next_id("itineraries"), "customer_id": cid,
+            "itinerary_name": f"Trip {i}", "itinerary_data": common.itinerary_of_size(rng.choice([2_000, 10_000, 40_000, 100_000]), rng),
+        })
+    db.set_client(backend)
+    auth = {"Authorization": f"Bearer {tokens.issue_token(cid)}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path, params in (("/me/get_all_itineraries", {}), ("/me/get_itinerary", {"itinerary_id": 1})):
+            print(path)
+            etag = None
+            for label, headers in (
+                ("identity", {"Accept-Encoding": "identity"}),
+                ("gzip", {"Accept-Encoding": "gzip"}),
+                ("br", {"Accept-Encoding": "br"}),
+                ("br + If-None-Match", {"Accept-Encoding": "br"}),
+            ):
+                if label.endswith("If-None-Match"):
+                    headers = {**headers, "If-None-Match": etag}
+                samples: list[float] = []
+                wire = 0
+
+                async def one():
+                    nonlocal wire, etag
+                    r = await client.get(path, params=params, headers={**auth, **headers})
+                    assert r.status_code in (200, 304), r.status_code
+                    wire = r.num_bytes_downloaded
+                    etag = r.headers.get("etag", etag)
+
+                for _ in range(requests):
+                    await common.timed(one, samples)
+                p50 = common.percentile(samples, 50)
+                link = wire * 8 / (link_mbps * 1e6)
+                print(f"  {label:<20} wire={wire / 1000:>8.1f} KB  server p50={p50 * 1000:6.2f}ms  "
+                      f"total at {link_mbps:g} Mbit/s={(p50 + link) * 1000:7.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--link-mbps", type=float, default=10.0, help="client link speed for the transfer estimate")
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.ERROR)
+    asyncio.run(run(args.requests, args.link_mbps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Backend round trips per itinerary write, with and without the
+email -> customer_id cache, on the in-process and shared (fake redis)
+cache backends.
+
+    python bench/bench_customer_id_cache.py --saves 200
+"""
+import argparse
+import asyncio
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+
+from fake_store import FakeRedis
+from fake_supabase import FakeSupabase
+from src import cache, db
+
+EMAIL = "bench@example.com"
+
+
+async def run(saves: int, customer_cache: cache.Cache | None) -> None:
+    backend = FakeSupabase()
+    backend.tables["customers"].append({
+        "customer_id": backend.next_id("customers"), "first_name": "Bench",
+        "last_name": "User", "email": EMAIL, "password_hash": "x",
+    })
+    db.set_client(backend)
+    # A zero TTL turns the cache into a pass-through for the "no cache" run.
+    db.customer_id_cache = customer_cache or cache.MemoryCache("customer_id", ttl=0)
+
+    for i in range(saves):
+        await db.save_itinerary(EMAIL, f"Trip {i}", {"day": 1, "city": "Paris"})
+    await db.update_customer_field(EMAIL, "email", "moved@example.com")
+    stale = await db.save_itinerary(EMAIL, "After move", {})
+
+    stats = db.customer_id_cache.stats()
+    label = type(customer_cache).__name__ if customer_cache else "no cache"
+    print(f"{label:<12} round trips/save={backend.calls / saves:.2f} "
+          f"hits={stats['hits']} misses={stats['misses']} save after email change={stale}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--saves", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.saves, None))
+    asyncio.run(run(args.saves, cache.MemoryCache("customer_id", ttl=300)))
+    asyncio.run(run(args.saves, cache.SharedCache("customer_id", ttl=300, store=FakeRedis())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Peak memory of /get_all_itineraries vs. the streaming /export_itineraries.
+
+Seeds the fake backend with N itineraries (~1 KB of JSON each), then drives
+each endpoint through the raw ASGI interface, discarding body chunks as
+they arrive the way a socket would. Peak Python heap growth is measured
+with tracemalloc (the seeded data is allocated before tracing starts).
+httpx.ASGITransport is not used here because it buffers the full body.
+
+    python bench/bench_export_memory.py --itineraries 10000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+
+from fake_supabase import FakeSupabase
+from src import db
+from src.main import app
+
+EMAIL = "bench@example.com"
+
+
+def seed(count: int) -> FakeSupabase:
+    backend = FakeSupabase()
+    cid = backend.next_id("customers")
+    backend.tables["customers"].append({
+        "customer_id": cid, "first_name": "Bench", "last_name": "User",
+        "email": EMAIL, "password_hash": "x",
+    })
+    for i in range(count):
+        backend.tables["itineraries"].append({
+            "itinerary_id": backend.next_id("itineraries"),
+            "customer_id": cid,
+            "itinerary_name": f"Trip {i}",
+            "itinerary_data": {
+                "days": [{"day": d, "city": "Paris", "activity": "Museum visit " * 4} for d in range(8)],
+            },
+        })
+    return backend
+
+
+async def drive(path: str, query: str) -> tuple[int, int]:
+    """Runs one GET through the ASGI app; returns (status, body bytes)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "headers": [(b"host", b"bench")],
+        "server": ("bench", 80), "client": ("127.0.0.1", 1234), "root_path": "",
+    }
+    status, size = 0, 0
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a live connection: nothing more until the client disconnects.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, size
+
+
+async def measure(label: str, path: str, query: str) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    status, size = await drive(path, query)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} status={status} body={size / 1e6:6.2f} MB "
+          f"peak heap={peak / 1e6:7.2f} MB time={elapsed * 1000:7.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--itineraries", type=int, default=10_000)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    args = parser.parse_args()
+
+    db.set_client(seed(args.itineraries))
+    asyncio.run(measure("get_all_itineraries", "/get_all_itineraries", f"email={EMAIL}"))
+    asyncio.run(measure("export_itineraries", "/export_itineraries",
+                        f"email={EMAIL}&chunk_size={args.chunk_size}"))
+
+
+if __name__ == "__main__":
+    main()
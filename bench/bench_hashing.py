@@ -0,0 +1,78 @@
+"""
+Login throughput vs. hash pool size.
+
+Sends a burst of concurrent POST /auth requests for one user held in the
+fake backend and reports logins/sec as the bcrypt pool grows from 1
+worker up to the CPU count. A last run with a tiny queue shows the 503
+backpressure kicking in.
+
+    python bench/bench_hashing.py --logins 64 --rounds 10 --kind process
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import bcrypt
+import httpx
+
+from fake_supabase import FakeSupabase
+from src import db, hashing
+from src import main as app_module
+from src.main import app
+
+EMAIL, PASSWORD = "bench@example.com", "bench-password"
+
+
+async def run(logins: int, rounds: int) -> tuple[dict, int]:
+    backend = FakeSupabase()
+    backend.tables["customers"].append({
+        "customer_id": backend.next_id("customers"), "first_name": "Bench", "last_name": "User",
+        "email": EMAIL,
+        "password_hash": bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds)).decode(),
+    })
+    db.set_client(backend)
+    # This measures the pool, not the login throttle in front of it
+    app_module.throttle.enabled = False
+
+    samples, rejected = [], 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            nonlocal rejected
+            r = await client.post("/auth", data={"email": EMAIL, "password": PASSWORD})
+            if r.status_code == 503:
+                rejected += 1
+            else:
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(common.timed(one, samples, start) for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+    return common.summarize(samples, elapsed), rejected
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor")
+    parser.add_argument("--kind", choices=["thread", "process"], default="thread")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    sizes = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    for workers in sizes:
+        hashing.configure(kind=args.kind, workers=workers, queue_limit=args.logins, rounds=args.rounds)
+        stats, _ = asyncio.run(run(args.logins, args.rounds))
+        common.print_row(f"{args.kind} pool, {workers} worker(s)", stats)
+
+    hashing.configure(kind=args.kind, workers=1, queue_limit=4, rounds=args.rounds)
+    stats, rejected = asyncio.run(run(args.logins, args.rounds))
+    common.print_row("1 worker, queue_limit=4", stats)
+    print(f"  rejected with 503: {rejected}/{args.logins}")
+    hashing.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Itinerary write and read cost by payload size, v1 form routes vs v2 JSON.
+
+Drives the app in-process against the mock PostgREST server, through the
+real Supabase client, with 1 KB, 100 KB and 1 MB itineraries:
+
+- v1 form: itinerary_data sent as a form string, json.loads'd in the route,
+  re-encoded by the client, and the response run through jsonable_encoder;
+- v2 pydantic: JSON body validated into a model, orjson response;
+- v2 raw: the body bytes are forwarded to PostgREST untouched (reads relay
+  PostgREST's bytes).
+
+    python bench/bench_payloads.py --requests 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import httpx
+
+from mock_postgrest import MockPostgrest
+from src import db, tokens
+from src.main import app
+
+SIZES = {"1KB": 1_000, "100KB": 100_000, "1MB": 1_000_000}
+
+
+async def measure(requests: int, call) -> float:
+    samples: list[float] = []
+    for _ in range(requests):
+        await common.timed(call, samples)
+    return common.percentile(samples, 50) * 1000
+
+
+async def run(mock: MockPostgrest, requests: int) -> None:
+    db.url = mock.url
+    await db.init_client()
+    # Identity encoding keeps the compression middleware out of these numbers
+    headers = {"Authorization": f"Bearer {tokens.issue_token(1)}", "Accept-Encoding": "identity"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+        for label, size in SIZES.items():
+            data = common.itinerary_of_size(size)
+            encoded = json.dumps(data)
+            mock.configure(delay=0, row={"itinerary_id": 1, "itinerary_name": "Trip", "itinerary_data": data})
+            n = max(5, requests * 1_000 // size) if size > 100_000 else requests
+
+            async def v1_write():
+                r = await client.post("/me/save_itinerary", data={"itinerary_name": "Trip", "itinerary_data": encoded})
+                r.raise_for_status()
+
+            async def v2_write():
+                r = await client.post("/v2/me/itineraries", content=f'{{"itinerary_name":"Trip","itinerary_data":{encoded}}}',
+                                      headers={"Content-Type": "application/json"})
+                r.raise_for_status()
+
+            async def raw_write():
+                r = await client.post("/v2/me/itineraries/raw", params={"itinerary_name": "Trip"}, content=encoded,
+                                      headers={"Content-Type": "application/json"})
+                r.raise_for_status()
+
+            async def v1_read():
+                (await client.get("/me/get_itinerary", params={"itinerary_id": 1})).raise_for_status()
+
+            async def raw_read():
+                (await client.get("/v2/me/itineraries/1")).raise_for_status()
+
+            results = [
+                ("write v1 form", await measure(n, v1_write)),
+                ("write v2 pydantic", await measure(n, v2_write)),
+                ("write v2 raw", await measure(n, raw_write)),
+                ("read v1", await measure(n, v1_read)),
+                ("read v2 raw", await measure(n, raw_read)),
+            ]
+            print(f"{label} (n={n}, {len(encoded) / 1000:.0f} KB): " + "  ".join(f"{name}={ms:.2f}ms" for name, ms in results))
+    await db.close_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.ERROR)
+
+    mock = MockPostgrest(delay=0, handshake=0).start()
+    try:
+        asyncio.run(run(mock, args.requests))
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Per-operation latency: asyncpg straight to Postgres vs the PostgREST path.
+
+Runs each repository operation that src/db.py uses, one call at a time,
+against a real database. It always measures PostgresRepository (--dsn).
+With --postgrest-url it also measures SupabaseRepository over a
+PostgREST server in front of the same database, e.g. a local
+`postgrest` or a Supabase project's /rest/v1. It applies db/migrations
+first, and it deletes its own customer when done.
+
+    python bench/bench_postgres.py --dsn postgresql://postgres@localhost/postgres \
+        --postgrest-url http://localhost:3000 --iterations 200 --size 5000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import asyncpg
+import orjson
+from postgrest import AsyncPostgrestClient
+
+from src import migrations
+from src.postgres_repository import PostgresRepository
+from src.repository import ITINERARY_SUMMARY_COLUMNS, Repository
+from src.supabase_repository import SupabaseRepository
+
+class PostgrestClient:
+    """Just enough of the Supabase client for SupabaseRepository: table() and .postgrest."""
+
+    def __init__(self, url: str, key: str | None):
+        headers = {"Accept": "application/json", "Content-Type": "application/json"}
+        if key:
+            headers.update({"apikey": key, "Authorization": f"Bearer {key}"})
+        self.postgrest = AsyncPostgrestClient(url, headers=headers)
+
+    def table(self, name: str):
+        return self.postgrest.from_(name)
+
+
+async def ensure_schema(dsn: str) -> None:
+    conn = await asyncpg.connect(dsn)
+    try:
+        await migrations.upgrade(conn)
+    finally:
+        await conn.close()
+
+
+async def measure(repo: Repository, iterations: int, size: int) -> Dict[str, List[float]]:
+    rng = random.Random(1)
+    email = f"bench-{rng.getrandbits(48):x}-{time.time_ns()}@example.com"
+    cid = await repo.insert_customer({"first_name": "Bench", "last_name": "User", "email": email, "password_hash": "x"})
+    data = common.itinerary_of_size(size, rng)
+    raw = orjson.dumps(data)
+    try:
+        ids = await repo.insert_itineraries(
+            [{"customer_id": cid, "itinerary_name": f"Trip {i}", "itinerary_data": data} for i in range(50)]
+        )
+        row = {"customer_id": cid, "itinerary_name": "Bench", "itinerary_data": data}
+        created: List[int] = []
+
+        async def insert():
+            created.extend(await repo.insert_itineraries([row]))
+
+        async def insert_raw():
+            created.append(await repo.insert_itinerary_raw(cid, "Bench", raw))
+
+        async def delete():
+            await repo.delete_itineraries(cid, [created.pop()])
+
+        ops: Dict[str, Callable[[], Awaitable[object]]] = {
+            "find_customer": lambda: repo.find_customer(email, ["customer_id", "password_hash"]),
+            "insert_itineraries": insert,
+            "insert_itinerary_raw": insert_raw,
+            "list_itineraries (summary)": lambda: repo.list_itineraries(cid, ITINERARY_SUMMARY_COLUMNS, limit=20),
+            "list_itineraries (full)": lambda: repo.list_itineraries(cid, limit=20),
+            "get_itinerary": lambda: repo.get_itinerary(cid, rng.choice(ids)),
+            "get_itinerary_raw": lambda: repo.get_itinerary_raw(cid, rng.choice(ids)),
+            "delete_itineraries": delete,
+        }
+        results: Dict[str, List[float]] = {}
+        for name, call in ops.items():
+            for _ in range(5):  # warm up: connections, prepared statements
+                if name != "delete_itineraries":
+                    await call()
+            samples: List[float] = []
+            for _ in range(iterations):
+                await common.timed(call, samples)
+            results[name] = samples
+        return results
+    finally:
+        await repo.delete_customer(email)
+
+
+async def run(args: argparse.Namespace) -> None:
+    await ensure_schema(args.dsn)
+    backends: Dict[str, Dict[str, List[float]]] = {}
+
+    pg = await PostgresRepository.connect(args.dsn, min_size=1, max_size=2)
+    try:
+        backends["asyncpg"] = await measure(pg, args.iterations, args.size)
+    finally:
+        await pg.close()
+
+    if args.postgrest_url:
+        client = PostgrestClient(args.postgrest_url, args.postgrest_key)
+        try:
+            backends["PostgREST"] = await measure(SupabaseRepository(client), args.iterations, args.size)
+        finally:
+            await client.postgrest.aclose()
+
+    labels = list(backends)
+    print(f"{args.iterations} calls per operation, {args.size}-byte itineraries; p50 / p95 in ms")
+    print(f"{'operation':<28}" + "".join(f"{label:>22}" for label in labels))
+    for op in backends["asyncpg"]:
+        cells = []
+        for label in labels:
+            samples = backends[label][op]
+            cells.append(f"{common.percentile(samples, 50) * 1000:>10.2f} /{common.percentile(samples, 95) * 1000:>8.2f}")
+        print(f"{op:<28}" + "".join(f"{cell:>22}" for cell in cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="Postgres DSN (default: DATABASE_URL)")
+    parser.add_argument("--postgrest-url", help="PostgREST base URL over the same database")
+    parser.add_argument("--postgrest-key", default=os.environ.get("POSTGREST_KEY"), help="API key sent as apikey/Bearer")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--size", type=int, default=5000, help="itinerary_data size in bytes")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or DATABASE_URL is required")
+    logging.getLogger("src").setLevel(logging.ERROR)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Login throttle cost and payoff.
+
+First times one limiter check on the in-process and shared (fake redis)
+backends. Then floods POST /auth with wrong passwords for one account from
+one IP while a legitimate user logs in from another, with the throttle off
+and on, and reports the bcrypt work done and the legitimate user's latency.
+Last it checks that a client rotating a spoofed X-Forwarded-For, directly
+or through a trusted proxy, still runs out of its per-IP budget (429),
+and that two clients behind the same proxy keep separate budgets; it
+exits non-zero if not.
+
+    python bench/bench_ratelimit.py --attempts 200 --rounds 10
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import bcrypt
+import httpx
+
+from fake_store import FakeRedis
+from fake_supabase import FakeSupabase
+from src import db, hashing, ratelimit
+from src import main as app_module
+from src.main import app
+
+VICTIM, USER, PASSWORD = "victim@example.com", "user@example.com", "bench-password"
+
+
+async def check_cost(bucket: ratelimit.TokenBucket, checks: int) -> float:
+    start = time.perf_counter()
+    for i in range(checks):
+        await bucket.hit(f"10.0.{i % 256}.{i % 7}")
+    return (time.perf_counter() - start) / checks
+
+
+async def flood(attempts: int, rounds: int, throttled: bool) -> None:
+    backend = FakeSupabase()
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()
+    for email in (VICTIM, USER):
+        backend.tables["customers"].append({
+            "customer_id": backend.next_id("customers"), "first_name": "Bench",
+            "last_name": "User", "email": email, "password_hash": password_hash,
+        })
+    db.set_client(backend)
+    hashing.configure(kind="thread", workers=1, queue_limit=attempts + 100, rounds=rounds)
+    app_module.throttle = ratelimit.throttle_from_env()
+    app_module.throttle.enabled = throttled
+
+    attacker = httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=("203.0.113.9", 1)), base_url="http://bench")
+    user = httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=("198.51.100.7", 1)), base_url="http://bench")
+    statuses: dict[int, int] = {}
+    user_samples: list[float] = []
+
+    async def attack():
+        r = await attacker.post("/auth", data={"email": VICTIM, "password": "guess"})
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    async def login():
+        await asyncio.sleep(0.05)
+        r = await user.post("/auth", data={"email": USER, "password": PASSWORD})
+        r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(attack() for _ in range(attempts)),
+        *(common.timed(login, user_samples) for _ in range(5)),
+    )
+    elapsed = time.perf_counter() - start
+    await attacker.aclose()
+    await user.aclose()
+
+    label = "throttle on" if throttled else "throttle off"
+    print(f"{label:<13} wall={elapsed:6.2f}s bcrypt checks={hashing.get_hashing_service().stats()['completed']:<4} "
+          f"backend calls={backend.calls:<4} statuses={dict(sorted(statuses.items()))} "
+          f"user login p50={common.percentile(user_samples, 50) * 1000:.0f}ms")
+
+
+async def spoofing(attempts: int) -> bool:
+    """True if rotating X-Forwarded-For does not escape the per-IP budget."""
+    db.set_client(FakeSupabase())
+    burst = int(ratelimit.throttle_from_env().by_ip.burst)
+    ok = True
+    # 10.0.0.5 stands for the platform's proxy, which appends the address
+    # it was connected from (203.0.113.9) to whatever the client sent
+    cases = (
+        ("through the proxy", ("10.0.0.5", 1), lambda i: f"1.2.3.{i}, 203.0.113.9"),
+        ("direct", ("203.0.113.9", 1), lambda i: f"1.2.3.{i}"),
+    )
+    for label, peer, forwarded_for in cases:
+        app_module.throttle = ratelimit.throttle_from_env()
+        app_module.throttle.enabled = True
+        statuses: dict[int, int] = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=peer), base_url="http://bench") as http:
+            for i in range(attempts):
+                # A fresh email each time, so only the per-IP budget applies
+                r = await http.post("/auth", data={"email": f"guess{i}@example.com", "password": "guess"},
+                                    headers={"X-Forwarded-For": forwarded_for(i)})
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+            # Another client behind the same proxy still has its own budget
+            r = await http.post("/auth", data={"email": "other@example.com", "password": "guess"},
+                                headers={"X-Forwarded-For": "198.51.100.7"})
+        passed = statuses.get(429, 0) >= attempts - burst - 1 and (peer[0] != "10.0.0.5" or r.status_code == 401)
+        ok = ok and passed
+        print(f"spoofed X-Forwarded-For, {label:<17} statuses={dict(sorted(statuses.items()))} "
+              f"other client={r.status_code} {'ok' if passed else 'FAIL'}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor")
+    parser.add_argument("--checks", type=int, default=100_000)
+    args = parser.parse_args()
+    # One warning per failed login would drown the results
+    logging.getLogger("src").setLevel(logging.ERROR)
+
+    memory = ratelimit.TokenBucket("bench", rate_per_minute=60, burst=10)
+    shared = ratelimit.SharedTokenBucket("bench", rate_per_minute=60, burst=10, store=FakeRedis())
+    for bucket in (memory, shared):
+        cost = asyncio.run(check_cost(bucket, args.checks))
+        print(f"{type(bucket).__name__:<18} {cost * 1e6:.2f} us/check")
+
+    asyncio.run(flood(args.attempts, args.rounds, throttled=False))
+    asyncio.run(flood(args.attempts, args.rounds, throttled=True))
+    ok = asyncio.run(spoofing(60))
+    hashing.shutdown()
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
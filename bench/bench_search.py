@@ -0,0 +1,99 @@
+"""
+Finding itineraries: download everything and filter on the client, or search.
+
+"download all" is what the frontend does today: GET
+/me/get_all_itineraries, then a filter on the decoded list. "search"
+sends the same filter to GET /v2/me/itineraries/search and receives
+only the matching rows' default fields. Reports the bytes received and
+the latency of each. Runs in-process on the in-memory repository
+(DB_BACKEND=memory, the default); any other DB_BACKEND runs against that
+database.
+
+    python bench/bench_search.py --itineraries 500 --size 5000 --requests 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import httpx
+
+os.environ.setdefault("DB_BACKEND", "memory")
+
+from src import db, tokens  # noqa: E402
+from src import main as app_module  # noqa: E402
+from src.main import app  # noqa: E402
+
+DESTINATIONS = ["Paris", "Rome", "Lisbon", "Oslo", "Vienna", "Prague", "Madrid", "Porto", "Lyon", "Florence"]
+
+
+async def run(itineraries: int, size: int, requests: int) -> None:
+    repo = await db.get_repository()
+    email = f"search-bench-{time.time_ns()}@example.com"
+    cid = await repo.insert_customer({"first_name": "Bench", "last_name": "User", "email": email, "password_hash": "x"})
+    rng = random.Random(1)
+    rows = []
+    for i in range(itineraries):
+        destination = rng.choice(DESTINATIONS)
+        start = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 21):02d}"
+        data = {**common.itinerary_of_size(size, rng), "destination": destination,
+                "start_date": start, "end_date": start[:-2] + f"{int(start[-2:]) + 7:02d}"}
+        rows.append({"customer_id": cid, "itinerary_name": f"{destination} trip {i}", "itinerary_data": data})
+    for start in range(0, len(rows), 100):
+        await repo.insert_itineraries(rows[start:start + 100])
+
+    app_module.throttle.enabled = False
+    auth = {"Authorization": f"Bearer {tokens.issue_token(cid)}", "Accept-Encoding": "identity"}
+    query = {"destination": "oslo", "date_from": "2025-06-01", "date_to": "2025-08-31"}
+
+    def wanted(item: dict) -> bool:
+        data = item["itinerary_data"]
+        return (data["destination"].lower() == query["destination"]
+                and data["end_date"] >= query["date_from"] and data["start_date"] <= query["date_to"])
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            async def download_all():
+                r = await client.get("/me/get_all_itineraries", headers=auth)
+                r.raise_for_status()
+                received.append((len(r.content), len([i for i in r.json() if wanted(i)])))
+
+            async def search():
+                r = await client.get("/v2/me/itineraries/search", params={**query, "limit": 100}, headers=auth)
+                r.raise_for_status()
+                received.append((len(r.content), len(r.json()["itineraries"])))
+
+            for label, call in (("download all + filter", download_all), ("search", search)):
+                received: list[tuple[int, int]] = []
+                samples: list[float] = []
+                start = time.perf_counter()
+                for _ in range(requests):
+                    await common.timed(call, samples)
+                common.print_row(label, common.summarize(samples, time.perf_counter() - start))
+                print(f"  bytes/request={received[0][0]:,} matches={received[0][1]}")
+    finally:
+        await repo.delete_customer(email)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--itineraries", type=int, default=500, help="itineraries owned by the user")
+    parser.add_argument("--size", type=int, default=5000, help="itinerary_data size in bytes")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.ERROR)
+
+    async def run_and_close() -> None:
+        try:
+            await run(args.itineraries, args.size, args.requests)
+        finally:
+            await db.close_client()
+
+    asyncio.run(run_and_close())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cost of an authenticated read, before and after session tokens.
+
+"password per request" proves identity the old way: POST /auth (customer
+lookup plus bcrypt) and then GET /get_all_itineraries?email=, which
+resolves the email again. "bearer token" sends the token /auth issued
+to GET /me/get_all_itineraries, which checks the signature locally and
+filters on customer_id. The customer_id cache is off, so each email read
+pays for its lookup.
+
+    python bench/bench_session.py --requests 200 --latency 0.002 --rounds 10
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import bcrypt
+import httpx
+
+from fake_supabase import FakeSupabase
+from src import cache, db, hashing, tokens
+from src import main as app_module
+from src.main import app
+
+EMAIL, PASSWORD = "bench@example.com", "bench-password"
+
+
+async def run(requests: int, latency: float, rounds: int) -> None:
+    backend = FakeSupabase(latency=latency)
+    cid = backend.next_id("customers")
+    backend.tables["customers"].append({
+        "customer_id": cid, "first_name": "Bench", "last_name": "User", "email": EMAIL,
+        "password_hash": bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds)).decode(),
+    })
+    for i in range(20):
+        backend.tables["itineraries"].append({
+            "itinerary_id": backend.next_id("itineraries"), "customer_id": cid,
+            "itinerary_name": f"Trip {i}", "itinerary_data": {"day": 1, "city": "Paris"},
+        })
+    db.set_client(backend)
+    db.customer_id_cache = cache.MemoryCache("customer_id", ttl=0)
+    hashing.configure(kind="thread", workers=1, queue_limit=requests, rounds=rounds)
+    app_module.throttle.enabled = False
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        login = await client.post("/auth", data={"email": EMAIL, "password": PASSWORD})
+        token = login.json()["access_token"]
+
+        async def with_password():
+            r = await client.post("/auth", data={"email": EMAIL, "password": PASSWORD})
+            r.raise_for_status()
+            r = await client.get("/get_all_itineraries", params={"email": EMAIL})
+            r.raise_for_status()
+
+        async def email_only():
+            r = await client.get("/get_all_itineraries", params={"email": EMAIL})
+            r.raise_for_status()
+
+        async def with_token():
+            r = await client.get("/me/get_all_itineraries", headers={"Authorization": f"Bearer {token}"})
+            r.raise_for_status()
+
+        for label, call in (("password per request", with_password), ("email only (no auth)", email_only), ("bearer token", with_token)):
+            samples: list[float] = []
+            calls_before = backend.calls
+            start = time.perf_counter()
+            for _ in range(requests):
+                await common.timed(call, samples)
+            stats = common.summarize(samples, time.perf_counter() - start)
+            common.print_row(label, stats)
+            print(f"  backend calls/request={(backend.calls - calls_before) / requests:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.002, help="fake backend round trip, seconds")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor")
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.ERROR)
+
+    token = tokens.issue_token(1)
+    checks = 20_000
+    start = time.perf_counter()
+    for _ in range(checks):
+        tokens.verify_token(token)
+    print(f"verify_token: {(time.perf_counter() - start) / checks * 1e6:.1f} us/check")
+
+    asyncio.run(run(args.requests, args.latency, args.rounds))
+    hashing.shutdown()
+
+
+if __name__ == "__main__":
+    main()
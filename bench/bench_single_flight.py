@@ -0,0 +1,146 @@
+"""
+Bursts of identical reads against a slow backend, with and without single-flight.
+
+Each burst fires --fanout concurrent get_customer_details() and
+get_all_itineraries() calls for each of --users emails at once, as a
+frontend fanning out does, after the customer caches have expired. The
+backend answers in --latency seconds (+/-50%) and serves at most
+--backend-concurrency queries at a time, like a connection pool, so
+duplicate calls queue behind each other. Reports backend queries and
+latency percentiles, then shows a failing and a stalled backend reaching
+every waiter of a shared call.
+
+    python bench/bench_single_flight.py --users 10 --fanout 20 --bursts 10
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import List
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+
+os.environ.setdefault("DB_BACKEND", "memory")
+
+from src import db  # noqa: E402
+from src.memory_repository import MemoryRepository  # noqa: E402
+from src.repository import RepositoryError  # noqa: E402
+
+
+class SlowRepository(MemoryRepository):
+    """A MemoryRepository behind a small pool of slow connections; can fail or stall on demand."""
+
+    def __init__(self, latency: float, concurrency: int, seed: int = 1):
+        super().__init__(latency)
+        self.pool = asyncio.Semaphore(concurrency)
+        self.rng = random.Random(seed)
+        self.failing = False
+        self.stall = 0.0
+
+    async def _round_trip(self) -> None:
+        async with self.pool:
+            self.calls += 1
+            await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5) + self.stall)
+            if self.failing:
+                raise RepositoryError("connection reset by peer")
+
+
+async def seed(repo: SlowRepository, users: int) -> List[str]:
+    latency, repo.latency = repo.latency, 0.0
+    emails = []
+    for u in range(users):
+        email = f"fanout-{u}@example.com"
+        cid = await repo.insert_customer({"first_name": "Fan", "last_name": f"Out{u}", "email": email, "password_hash": "x"})
+        await repo.insert_itineraries([
+            {"customer_id": cid, "itinerary_name": f"Trip {i}", "itinerary_data": {"day": i}} for i in range(5)
+        ])
+        emails.append(email)
+    repo.latency, repo.calls = latency, 0
+    return emails
+
+
+async def expire_caches(emails: List[str]) -> None:
+    for email in emails:
+        await db.customer_details_cache.delete(email)
+        await db.customer_id_cache.delete(email)
+
+
+async def burst(emails: List[str], fanout: int, samples: List[float]) -> list:
+    start = time.perf_counter()
+    calls = [call for email in emails for _ in range(fanout)
+             for call in (lambda e=email: db.get_customer_details(e), lambda e=email: db.get_all_itineraries(e))]
+    results: list = []
+
+    async def one(call):
+        results.append(await call())
+        samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(call) for call in calls))
+    return results
+
+
+async def run(args: argparse.Namespace, enabled: bool) -> None:
+    repo = SlowRepository(args.latency, args.backend_concurrency)
+    db.set_repository(repo)
+    emails = await seed(repo, args.users)
+    for flight in (db.customer_details_flight, db.all_itineraries_flight):
+        flight.enabled, flight.timeout = enabled, args.timeout
+    # Failures should reach every waiter as errors, not open the circuit
+    db.breaker.enabled = False
+
+    samples: List[float] = []
+    start = time.perf_counter()
+    for _ in range(args.bursts):
+        await expire_caches(emails)
+        await burst(emails, args.fanout, samples)
+    elapsed = time.perf_counter() - start
+    stats = common.summarize(samples, elapsed)
+    label = "single-flight" if enabled else "no coalescing"
+    print(f"{label:<15} backend queries={repo.calls:<6} calls={stats['requests']:<6} "
+          f"p50={stats['p50_ms']:>8.1f}ms p95={common.percentile(samples, 95) * 1000:>8.1f}ms "
+          f"p99={stats['p99_ms']:>8.1f}ms max={max(samples) * 1000:>8.1f}ms")
+
+    if enabled:
+        # A failing backend: every waiter of the shared call gets the error
+        await expire_caches(emails)
+        repo.failing, repo.calls = True, 0
+        results = await burst(emails[:1], args.fanout, [])
+        print(f"{'  failing':<15} backend queries={repo.calls:<6} calls={len(results):<6} "
+              f"errors returned={sum(r is None for r in results)}")
+        # A stalled backend: every waiter gives up at the call's deadline
+        repo.failing, repo.stall, repo.calls = False, args.timeout * 2, 0
+        await expire_caches(emails)
+        stalled: List[float] = []
+        results = await burst(emails[:1], args.fanout, stalled)
+        print(f"{'  stalled':<15} backend queries={repo.calls:<6} calls={len(results):<6} "
+              f"errors returned={sum(r is None for r in results)} slowest={max(stalled) * 1000:.0f}ms "
+              f"(timeout {args.timeout * 1000:.0f}ms)")
+        repo.stall = 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10, help="distinct emails per burst")
+    parser.add_argument("--fanout", type=int, default=20, help="identical calls per email and operation in a burst")
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="backend query time in seconds")
+    parser.add_argument("--backend-concurrency", type=int, default=10, help="queries the backend serves at once")
+    parser.add_argument("--timeout", type=float, default=0.5, help="single-flight deadline per call, seconds")
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.CRITICAL)
+
+    print(f"{args.bursts} bursts of {args.users} emails x {args.fanout} duplicates x 2 operations; "
+          f"backend {args.latency * 1000:.0f}ms, {args.backend_concurrency} at a time")
+
+    async def run_both() -> None:
+        await run(args, enabled=False)
+        await run(args, enabled=True)
+        await db.close_client()
+
+    asyncio.run(run_both())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold-start measurements: module import time and time-to-first-request.
+
+Each measurement runs in a fresh interpreter so nothing is cached.
+Time-to-first-request launches `uvicorn src.main:app` and polls until
+/health answers; /ready then shows whether the lifespan's background
+init created the backend client. The last run has no Supabase settings
+at all, to show the app still starts and reports itself not ready.
+
+    python bench/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import common
+import httpx
+
+from mock_postgrest import _free_port
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def import_ms(module: str, env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=common.ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_to_first_request(env: dict) -> tuple[float, int, dict]:
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=common.ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                break
+            except httpx.TransportError:
+                time.sleep(0.005)
+        elapsed = (time.perf_counter() - start) * 1000
+        # Give the background client init a moment before asking /ready
+        time.sleep(1)
+        ready = httpx.get(f"http://127.0.0.1:{port}/ready")
+        return elapsed, ready.status_code, ready.json()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    for module in ("src.db", "src.main", "supabase"):
+        samples = [import_ms(module, env) for _ in range(args.runs)]
+        print(f"import {module:<10} median={statistics.median(samples):7.1f} ms")
+
+    samples = [time_to_first_request(env) for _ in range(args.runs)]
+    print(f"time to first request  median={statistics.median(s[0] for s in samples):7.1f} ms "
+          f"/ready={samples[-1][1]} {samples[-1][2]}")
+
+    bare_env = {k: v for k, v in env.items() if not k.startswith("SUPABASE_")}
+    elapsed, status, body = time_to_first_request(bare_env)
+    print(f"without SUPABASE_* env {elapsed:7.1f} ms /ready={status} {body}")
+
+
+if __name__ == "__main__":
+    main()
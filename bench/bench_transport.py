@@ -0,0 +1,79 @@
+"""
+HTTP transport benchmark against a local mock PostgREST server.
+
+Runs get_customer_details() in concurrent batches through the real
+Supabase/PostgREST client with different transport settings. Reports
+throughput, latency percentiles, TCP connections opened and the error
+rate when the server fails a share of requests with 503.
+
+    python bench/bench_transport.py --requests 1000 --concurrency 10
+"""
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+
+from mock_postgrest import MockPostgrest
+from src import cache, db
+
+
+async def run(mock: MockPostgrest, total: int, concurrency: int, **transport) -> dict:
+    db.url = mock.url
+    await db.close_client()
+    await db.init_client(**transport)
+    # Every call must reach the server, not the details cache
+    db.customer_details_cache = cache.MemoryCache("customer_details", ttl=0)
+    # Injected 503s should count as failures, not open the circuit
+    db.breaker.enabled = False
+
+    samples, failures = [], 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures
+        if await db.get_customer_details("bench@example.com") is None:
+            failures += 1
+
+    async def gated():
+        async with gate:
+            await common.timed(one, samples)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(gated() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await db.close_client()
+    stats = common.summarize(samples, elapsed)
+    stats["connections"] = mock.stats()["connections"]
+    stats["failures"] = failures
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.005, help="mock server latency (s)")
+    parser.add_argument("--handshake", type=float, default=0.03, help="extra latency per new connection (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    mock = MockPostgrest(delay=args.delay, handshake=args.handshake).start()
+    scenarios = [
+        ("no keep-alive", 0.0, {"max_keepalive_connections": 0, "read_retries": 0}),
+        ("pooled keep-alive", 0.0, {}),
+        (f"{args.failure_rate:.0%} 503s, no retries", args.failure_rate, {"read_retries": 0}),
+        (f"{args.failure_rate:.0%} 503s, 2 retries", args.failure_rate, {"read_retries": 2, "retry_backoff": 0.01}),
+    ]
+    try:
+        for label, failure_rate, transport in scenarios:
+            mock.configure(failure_rate=failure_rate)
+            stats = asyncio.run(run(mock, args.requests, args.concurrency, **transport))
+            common.print_row(label, stats)
+            print(f"{'':<28} connections={stats['connections']} failures={stats['failures']}")
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Requests/sec scaling of the gunicorn serving profile from 1 to N workers.
+
+For each worker count it starts `gunicorn -c python:src.serving
+src.main:app` with DB_BACKEND=memory, so every worker answers from its
+own in-process store and the backend costs no I/O: what is measured is
+the app's own CPU per request, which is what more workers spread out.
+--clients load processes keep --concurrency keep-alive connections
+busy for --duration seconds (after --warmup) with one workload: `health`
+(the framework floor), `read` (a bearer-token page of /v2/me/itineraries)
+or `signup` (POST /create_user, a bcrypt hash at --bcrypt-rounds). It
+reports requests/sec, latency percentiles, errors, speedup over one
+worker, the time until every worker answered, and the proportional
+memory (PSS) of the master and workers. The load generator shares the
+machine with the server, so the speedup flattens once workers plus
+client processes exceed the CPUs. --no-preload, --loop, --http and
+--max-requests set WEB_PRELOAD, WEB_LOOP, WEB_HTTP and WEB_MAX_REQUESTS
+to compare those settings; workers are not recycled unless asked, since
+a recycled worker drops its idle keep-alive connections.
+
+    python bench/bench_workers.py --workers 1,2,4 --workload read --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlencode
+
+import common
+import httpx
+
+from mock_postgrest import _free_port
+
+SESSION_SECRET = "bench-workers-secret"
+
+
+def children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def pss_bytes(pids: List[int]) -> int | None:
+    """Proportional set size of the processes: shared pages are split between them, not counted twice."""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith("Pss:"))
+        except (OSError, StopIteration):
+            return None
+    return total
+
+
+def request_for(workload: str, token: str, n: int) -> bytes:
+    if workload == "health":
+        return b"GET /health HTTP/1.1\r\nHost: bench\r\n\r\n"
+    if workload == "read":
+        return f"GET /v2/me/itineraries HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n\r\n".encode()
+    body = urlencode({"firstname": "Bench", "lastname": "Worker", "email": f"worker-{os.getpid()}-{n}@example.com",
+                      "password": "correct horse battery staple"}).encode()
+    return (b"POST /create_user HTTP/1.1\r\nHost: bench\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+            b"Content-Length: %d\r\n\r\n%b" % (len(body), body))
+
+
+async def exchange(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, request: bytes) -> tuple[int, bool]:
+    """Sends one request and reads the response; (status, whether the server keeps the connection open)."""
+    writer.write(request)
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    length = re.search(r"\r\ncontent-length: *(\d+)", head)
+    await reader.readexactly(int(length.group(1)) if length else 0)
+    return int(head.split(" ", 2)[1]), "\r\nconnection: close" not in head
+
+
+def load(args: argparse.Namespace, port: int, connections: int, token: str) -> Dict[str, Any]:
+    """
+    One load process: `connections` keep-alive connections until the
+    deadline, latencies after the warmup only. A bare HTTP/1.1 client on
+    asyncio streams: httpx costs more CPU per request than the app does.
+    """
+
+    async def run() -> Dict[str, Any]:
+        latencies: List[float] = []
+        errors = 0
+        sent = 0
+        start = time.perf_counter()
+        measure_from, stop_at = start + args.warmup, start + args.warmup + args.duration
+
+        async def caller() -> None:
+            nonlocal errors, sent
+            writer = None
+            while True:
+                begin = time.perf_counter()
+                if begin >= stop_at:
+                    break
+                sent += 1
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                    status, keep_alive = await exchange(reader, writer, request_for(args.workload, token, sent))
+                    ok = status in (200, 201)
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    status, keep_alive, ok = 0, False, False
+                if not keep_alive and writer is not None:
+                    # A recycled worker closes its connections (WEB_MAX_REQUESTS)
+                    writer.close()
+                    writer = None
+                if begin >= measure_from:
+                    latencies.append(time.perf_counter() - begin)
+                    errors += not ok
+            if writer is not None:
+                writer.close()
+
+        await asyncio.gather(*(caller() for _ in range(connections)))
+        return {"latencies": latencies, "errors": errors}
+
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    return asyncio.run(run())
+
+
+def start_server(args: argparse.Namespace, workers: int, port: int) -> tuple[subprocess.Popen, float]:
+    env = {
+        **os.environ,
+        "DB_BACKEND": "memory",
+        "SESSION_SECRET": SESSION_SECRET,
+        "RATE_LIMIT_ENABLED": "false",
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "LOG_LEVEL": "WARNING",
+        "WEB_CONCURRENCY": str(workers),
+        "WEB_BIND": f"127.0.0.1:{port}",
+        "WEB_ACCESS_LOG": "false",
+        "WEB_PRELOAD": "false" if args.no_preload else "true",
+        "WEB_LOOP": args.loop,
+        "WEB_HTTP": args.http,
+        "WEB_MAX_REQUESTS": str(args.max_requests),
+    }
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "python:src.serving", "--log-level", "warning", "src.main:app"],
+        cwd=common.ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # Up once every worker has been forked and one of them answers; the
+    # rest boot in parallel with it
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup; run it by hand to see why")
+        if len(children(server.pid)) >= workers:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1)
+                return server, time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+        time.sleep(0.01)
+
+
+def run(args: argparse.Namespace, workers: int, token: str, baseline: float | None) -> float:
+    port = _free_port()
+    server, boot = start_server(args, workers, port)
+    try:
+        per_client = [args.concurrency // args.clients + (i < args.concurrency % args.clients)
+                      for i in range(args.clients)]
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            results = pool.starmap(load, [(args, port, n, token) for n in per_client if n])
+        memory = pss_bytes([server.pid] + children(server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    stats = common.summarize(latencies, args.duration)
+    errors = sum(result["errors"] for result in results)
+    speedup = f"x{stats['rps'] / baseline:.2f}" if baseline else "x1.00"
+    mem = f"{memory / 1e6:.0f} MB" if memory is not None else "n/a"
+    common.print_row(f"{workers} worker(s)", stats)
+    print(f"{'':<28} errors={errors:<5} speedup={speedup:<6} up in {boot * 1000:.0f}ms, PSS {mem}")
+    return stats["rps"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", help="comma-separated worker counts (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--workload", choices=("health", "read", "signup"), default="read")
+    parser.add_argument("--concurrency", type=int, default=64, help="open connections in total")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="load generator processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before that")
+    parser.add_argument("--bcrypt-rounds", type=int, default=8, help="bcrypt cost for the signup workload")
+    parser.add_argument("--no-preload", action="store_true", help="import the app in every worker (WEB_PRELOAD=false)")
+    parser.add_argument("--max-requests", type=int, default=0,
+                        help="WEB_MAX_REQUESTS: recycle workers after this many requests (default: never)")
+    parser.add_argument("--loop", default="auto", help="WEB_LOOP: auto, asyncio or uvloop")
+    parser.add_argument("--http", default="auto", help="WEB_HTTP: auto, h11 or httptools")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(n) for n in args.workers.split(",")]
+    else:
+        counts = sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+
+    # The workers verify tokens with the same secret; the customer has no
+    # itineraries in any worker's store, so `read` returns an empty page
+    os.environ["SESSION_SECRET"] = SESSION_SECRET
+    from src import tokens
+    token = tokens.issue_token(1)
+
+    print(f"{cpus} CPU(s); workload={args.workload}, {args.concurrency} connections from {args.clients} "
+          f"load process(es), {args.duration:g}s each; preload={'off' if args.no_preload else 'on'}, "
+          f"loop={args.loop}, http={args.http}")
+    baseline = None
+    for workers in counts:
+        rps = run(args, workers, token, baseline)
+        baseline = baseline or rps
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Check that itinerary_data shaped like a blob stub round-trips unchanged.
+
+With ITINERARY_STORAGE=blob only the itinerary_blob column (written by
+src/blobs.py) marks a row as blob-backed. This saves documents that look
+like stubs, {"$blob": <hash>} naming another customer's blob, an unknown
+hash and a stub with search keys, through every write path
+(insert_itineraries, insert_itinerary_raw, replace_itinerary_data and
+both patch kinds), in blob storage and inline with blob storage switched
+on afterwards. It reads each back through every read path and expects
+the document as saved, and the other customer's payload untouched.
+Exits non-zero on any mismatch, for CI. Runs on the memory backend; with
+--dsn (or DATABASE_URL) also on Postgres, in a scratch database created
+next to it, migrated with db/migrations and dropped afterwards.
+
+    python bench/check_blob_stubs.py
+    python bench/check_blob_stubs.py --dsn postgresql://postgres@localhost/postgres
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Any, Dict, List
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import asyncpg
+import orjson
+
+from src import migrations
+from src.blobs import BlobCodec, BlobRepository
+from src.json_patch import MERGE_PATCH
+from src.memory_repository import MemoryRepository
+from src.repository import ITINERARY_COLUMNS, ItinerarySearch, Repository
+
+SECRET = {"destination": "Oslo", "start_date": "2025-03-01", "end_date": "2025-03-08", "notes": "victim's own"}
+
+
+def lookalikes(digest: str) -> List[Dict[str, Any]]:
+    return [
+        {"$blob": digest},
+        {"$blob": digest, "destination": "Oslo"},
+        {"$blob": "0" * 64},
+        {"$blob": digest.upper()},
+    ]
+
+
+async def saves(repo: Repository, inner: Repository, cid: int, doc: Dict[str, Any]) -> Dict[str, int]:
+    """One itinerary per write path, each ending with `doc` as its data."""
+    ids = {}
+    ids["insert"] = (await repo.insert_itineraries([
+        {"customer_id": cid, "itinerary_name": "insert", "itinerary_data": doc}
+    ]))[0]
+    ids["insert raw"] = await repo.insert_itinerary_raw(cid, "insert raw", orjson.dumps(doc))
+    ids["inline insert"] = (await inner.insert_itineraries([
+        {"customer_id": cid, "itinerary_name": "inline insert", "itinerary_data": doc}
+    ]))[0]
+    ids["inline insert raw"] = await inner.insert_itinerary_raw(cid, "inline insert raw", orjson.dumps(doc))
+
+    ids["replace"] = (await repo.insert_itineraries([
+        {"customer_id": cid, "itinerary_name": "replace", "itinerary_data": {"a": 1}}
+    ]))[0]
+    await repo.replace_itinerary_data(cid, ids["replace"], 1, doc)
+
+    ids["merge patch"] = (await repo.insert_itineraries([
+        {"customer_id": cid, "itinerary_name": "merge patch", "itinerary_data": {"a": 1}}
+    ]))[0]
+    await repo.patch_itinerary(cid, ids["merge patch"], 1, {"a": None, **doc}, MERGE_PATCH)
+
+    ids["json patch"] = (await repo.insert_itineraries([
+        {"customer_id": cid, "itinerary_name": "json patch", "itinerary_data": {"a": 1}}
+    ]))[0]
+    await repo.patch_itinerary(cid, ids["json patch"], 1, [{"op": "replace", "path": "", "value": doc}], "json-patch")
+    return ids
+
+
+async def reads(repo: Repository, cid: int, email: str, itinerary_id: int) -> Dict[str, Any]:
+    """The itinerary's data as each read path returns it."""
+    listed = {row["itinerary_id"]: row["itinerary_data"] for row in await repo.list_itineraries(cid)}
+    _, by_email = await repo.list_itineraries_by_email(email)
+    found = await repo.search_itineraries(cid, ItinerarySearch(), ("itinerary_id", "itinerary_data"))
+    raw = await repo.get_itinerary_raw(cid, itinerary_id)
+    row = await repo.get_itinerary(cid, itinerary_id)
+    return {
+        "get": row and row["itinerary_data"],
+        "get raw": raw and orjson.loads(raw)["itinerary_data"],
+        "list": listed.get(itinerary_id),
+        "list by email": {r["itinerary_id"]: r["itinerary_data"] for r in by_email}.get(itinerary_id),
+        "search": {r["itinerary_id"]: r["itinerary_data"] for r in found}.get(itinerary_id),
+    }
+
+
+async def check(label: str, inner: Repository) -> int:
+    repo = BlobRepository(inner, BlobCodec("gzip"))
+    victim = await inner.insert_customer({"first_name": "Vic", "last_name": "Tim",
+                                          "email": "victim@example.com", "password_hash": "x"})
+    mallory = await inner.insert_customer({"first_name": "Mal", "last_name": "Lory",
+                                           "email": "mallory@example.com", "password_hash": "x"})
+    secret_id = (await repo.insert_itineraries([
+        {"customer_id": victim, "itinerary_name": "secret", "itinerary_data": SECRET}
+    ]))[0]
+    digest, _, _ = repo.codec.encode(SECRET)
+
+    failures = checked = 0
+    for doc in lookalikes(digest):
+        for path, itinerary_id in (await saves(repo, inner, mallory, doc)).items():
+            for read, got in (await reads(repo, mallory, "mallory@example.com", itinerary_id)).items():
+                checked += 1
+                if got != doc:
+                    failures += 1
+                    print(f"{label:<8} FAIL {path} -> {read}\n{'':<14}saved {doc}\n{'':<14}read  {got}")
+    got = (await repo.get_itinerary(victim, secret_id, ITINERARY_COLUMNS))["itinerary_data"]
+    checked += 1
+    if got != SECRET:
+        failures += 1
+        print(f"{label:<8} FAIL blob-backed itinerary reads {got}")
+    print(f"{label:<8} {checked - failures}/{checked} reads ok")
+    return failures
+
+
+async def on_postgres(dsn: str) -> int:
+    from src.postgres_repository import PostgresRepository
+
+    scratch = f"blob_stub_check_{os.getpid()}"
+    admin = await asyncpg.connect(dsn)
+    await admin.execute(f"CREATE DATABASE {scratch}")
+    try:
+        conn = await asyncpg.connect(dsn, database=scratch)
+        try:
+            await migrations.upgrade(conn)
+        finally:
+            await conn.close()
+        repo = await PostgresRepository.connect(dsn, database=scratch, min_size=1, max_size=2)
+        try:
+            return await check("postgres", repo)
+        finally:
+            await repo.close()
+    finally:
+        await admin.execute(f"DROP DATABASE {scratch}")
+        await admin.close()
+
+
+async def run(args: argparse.Namespace) -> int:
+    failures = await check("memory", MemoryRepository())
+    if not args.dsn:
+        print("postgres skipped (no --dsn or DATABASE_URL)")
+    else:
+        failures += await on_postgres(args.dsn)
+    return int(bool(failures))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"),
+                        help="Postgres DSN allowed to create databases (default: DATABASE_URL); "
+                             "without one only the memory backend is checked")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Agreement check between the two implementations of itinerary patching.
+
+src/json_patch.py (the memory backend, and blob storage) and the SQL
+functions of db/migrations/0006_itinerary_patch.sql (the Postgres and
+Supabase backends) apply RFC 7386 merge patches and RFC 6902 JSON
+Patches independently. bench/patch_vectors.json is the table both must
+satisfy: each vector is a document, a patch and either the expected
+result or the expected error message. Every vector runs against
+src/json_patch.py; with --dsn (or DATABASE_URL) they also run against
+jsonb_merge_patch() and jsonb_json_patch() in a scratch database created
+next to it and migrated with db/migrations, where an error must be
+SQLSTATE PT422 with the same message. Results are compared as JSON
+text, so 1 and 1.0 or a reordered array count as different. Exits
+non-zero on any mismatch, for CI. The scratch database is dropped
+afterwards.
+
+    python bench/check_patch_vectors.py
+    python bench/check_patch_vectors.py --dsn postgresql://postgres@localhost/postgres
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, List
+
+import common
+import asyncpg
+import orjson
+
+from src import migrations
+from src.json_patch import MERGE_PATCH, apply_patch
+from src.repository import PatchError
+
+VECTORS = os.path.join(common.ROOT, "bench", "patch_vectors.json")
+SQL_FUNCTIONS = {MERGE_PATCH: "jsonb_merge_patch", "json-patch": "jsonb_json_patch"}
+PATCH_ERROR_SQLSTATE = "PT422"
+
+# A vector's outcome: ("result", JSON text) or ("error", message)
+Outcome = tuple[str, str]
+
+
+def canonical(value: Any) -> str:
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS).decode()
+
+
+def expected(vector: Dict[str, Any]) -> Outcome:
+    return ("error", vector["error"]) if "error" in vector else ("result", canonical(vector["result"]))
+
+
+async def in_python(vector: Dict[str, Any]) -> Outcome:
+    try:
+        return "result", canonical(apply_patch(vector["doc"], vector["patch"], vector["kind"]))
+    except PatchError as err:
+        return "error", str(err)
+
+
+def in_database(conn: asyncpg.Connection) -> Callable[[Dict[str, Any]], Awaitable[Outcome]]:
+    async def run(vector: Dict[str, Any]) -> Outcome:
+        sql = f"SELECT {SQL_FUNCTIONS[vector['kind']]}($1::jsonb, $2::jsonb)::text"
+        try:
+            result = await conn.fetchval(sql, json.dumps(vector["doc"]), json.dumps(vector["patch"]))
+        except asyncpg.PostgresError as err:
+            if err.sqlstate != PATCH_ERROR_SQLSTATE:
+                return "error", f"SQLSTATE {err.sqlstate}: {err}"
+            return "error", str(err)
+        # jsonb normalizes key order and spacing; numbers keep their form
+        return "result", canonical(orjson.loads(result))
+    return run
+
+
+async def check(label: str, vectors: List[Dict[str, Any]],
+                run: Callable[[Dict[str, Any]], Awaitable[Outcome]]) -> int:
+    failures = 0
+    for vector in vectors:
+        want, got = expected(vector), await run(vector)
+        if got != want:
+            failures += 1
+            print(f"{label:<8} FAIL {vector['name']}\n{'':<14}expected {want[0]} {want[1]}\n"
+                  f"{'':<14}got      {got[0]} {got[1]}")
+    print(f"{label:<8} {len(vectors) - failures}/{len(vectors)} vectors ok")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> int:
+    with open(VECTORS) as f:
+        vectors = json.load(f)
+    failures = await check("python", vectors, in_python)
+    if not args.dsn:
+        print("sql      skipped (no --dsn or DATABASE_URL)")
+        return int(bool(failures))
+
+    scratch = f"patch_check_{os.getpid()}"
+    admin = await asyncpg.connect(args.dsn)
+    await admin.execute(f"CREATE DATABASE {scratch}")
+    try:
+        conn = await asyncpg.connect(args.dsn, database=scratch)
+        try:
+            await migrations.upgrade(conn)
+            failures += await check("sql", vectors, in_database(conn))
+        finally:
+            await conn.close()
+    finally:
+        await admin.execute(f"DROP DATABASE {scratch}")
+        await admin.close()
+    return int(bool(failures))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"),
+                        help="Postgres DSN allowed to create databases (default: DATABASE_URL); "
+                             "without one only src/json_patch.py is checked")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+EXPLAIN-based regression check for the queries in src/postgres_repository.py.
+
+Creates a scratch database next to --dsn and applies db/migrations to it
+(up to --target). It seeds --customers customers with --per-customer
+itineraries each, plus one customer with 2000, and runs ANALYZE. Then it
+EXPLAINs every hot query under both custom and generic plans, since
+asyncpg's prepared statements can switch to generic plans. A query fails
+when its plan sequentially scans a table it should reach through an
+index, skips the index it was written for, or, for a paged list, sorts
+rows that the index already returns in order. Exits non-zero on any failure, for CI. The scratch database is
+dropped afterwards.
+
+    python bench/check_query_plans.py --dsn postgresql://postgres@localhost/postgres
+    python bench/check_query_plans.py --target 1   # the schema before the indexes: fails
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import asyncpg
+import orjson
+
+from src import migrations
+from src.postgres_repository import (
+    DELETE_ITINERARIES, DELETE_ITINERARIES_BY_ID, FIND_CUSTOMER, GET_ITINERARY, LIST_ITINERARIES,
+    LIST_ITINERARIES_BY_EMAIL, search_query,
+)
+from src.repository import SEARCH_DEFAULT_FIELDS, ItinerarySearch
+
+EMAIL = "user1234@example.com"
+CID = 1234
+HEAVY_CUSTOMER_ITINERARIES = 2000
+
+CUSTOMER_INDEX = "itineraries_customer_id_itinerary_id_idx"
+NAME_INDEX = "itineraries_customer_name_trgm_idx"
+DESTINATION_INDEX = "itineraries_customer_destination_trgm_idx"
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    sql: str
+    params: Sequence[Any]
+    no_seq_scan: Tuple[str, ...] = ()  # tables that must be reached through an index
+    no_sort: bool = False  # the order must come from an index
+    index: str | None = None  # the index that must be used, if one is required
+
+
+CHECKS = [
+    PlanCheck("find_customer", FIND_CUSTOMER.format(columns="customer_id, password_hash"), (EMAIL,), ("customers",)),
+    PlanCheck("find_customer (any case)", "SELECT customer_id FROM customers WHERE lower(email) = lower($1)",
+              (EMAIL.upper(),), ("customers",)),
+    PlanCheck("list_itineraries", LIST_ITINERARIES.format(columns="itinerary_id, itinerary_name"), (CID, None, 21),
+              ("itineraries",), no_sort=True, index=CUSTOMER_INDEX),
+    PlanCheck("list_itineraries (cursor)", LIST_ITINERARIES.format(columns="itinerary_id, itinerary_name"),
+              (CID, 2 ** 31 - 1, 21), ("itineraries",), no_sort=True, index=CUSTOMER_INDEX),
+    PlanCheck("list_itineraries (no limit)",
+              LIST_ITINERARIES.format(columns="itinerary_id, itinerary_name, itinerary_data"), (CID, None, None),
+              ("itineraries",), index=CUSTOMER_INDEX),
+    PlanCheck("list_itineraries_by_email",
+              LIST_ITINERARIES_BY_EMAIL.format(columns="i.itinerary_id, i.itinerary_name, i.itinerary_data"),
+              (EMAIL,), ("customers", "itineraries")),
+    PlanCheck("get_itinerary", GET_ITINERARY.format(columns="itinerary_id, itinerary_name, itinerary_data"),
+              (1, CID), ("itineraries",)),
+    # Either customer_id index will do; btree_gin lets the search indexes answer this too
+    PlanCheck("delete_itineraries", DELETE_ITINERARIES, (CID,), ("itineraries",)),
+    PlanCheck("search (name)", *search_query(CID, ItinerarySearch(name="place 1234"), SEARCH_DEFAULT_FIELDS, 21, None),
+              ("itineraries",), index=NAME_INDEX),
+    PlanCheck("search (name prefix)", *search_query(CID, ItinerarySearch(name="tour of place 19", name_prefix=True),
+                                                     SEARCH_DEFAULT_FIELDS, 21, None), ("itineraries",), index=NAME_INDEX),
+    PlanCheck("search (destination, dates)",
+              *search_query(CID, ItinerarySearch(destination="oslo", date_from="2025-03-01", date_to="2025-03-31"),
+                            SEARCH_DEFAULT_FIELDS, 21, None), ("itineraries",), index=DESTINATION_INDEX),
+    PlanCheck("delete_itineraries (by id)", DELETE_ITINERARIES_BY_ID, (CID, [1, 2]), ("itineraries",)),
+]
+
+
+def plan_nodes(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [node]
+    for child in node.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+def describe(node: Dict[str, Any]) -> str:
+    text = node["Node Type"]
+    if "Index Name" in node:
+        text += f" using {node['Index Name']}"
+    if "Relation Name" in node:
+        text += f" on {node['Relation Name']}"
+    return text
+
+
+async def seed(conn: asyncpg.Connection, customers: int, per_customer: int) -> None:
+    await conn.execute("""
+        INSERT INTO customers (first_name, last_name, email, password_hash)
+        SELECT 'Bench', 'User', 'user' || g || '@example.com', 'x' FROM generate_series(1, $1) g
+    """, customers)
+    # One heavy customer (CID) whose rows are the oldest, then the rest
+    # interleaved as rows arrive over time: CID's newest-first page needs
+    # the (customer_id, itinerary_id) index, not a walk down the primary key
+    await conn.execute("""
+        INSERT INTO itineraries (customer_id, itinerary_name, itinerary_data)
+        SELECT $1, (ARRAY['Weekend in', 'Trip to', 'Tour of'])[n % 3 + 1] || ' place ' || n, json_build_object(
+            'destination', (ARRAY['Paris', 'Rome', 'Lisbon', 'Oslo', 'Vienna'])[n % 5 + 1],
+            'start_date', '2025-01-01'::date + n, 'end_date', '2025-01-01'::date + n + 6) FROM generate_series(1, $2) n
+    """, CID, HEAVY_CUSTOMER_ITINERARIES)
+    await conn.execute("""
+        INSERT INTO itineraries (customer_id, itinerary_name, itinerary_data)
+        SELECT c, (ARRAY['Weekend in', 'Trip to', 'Tour of'])[c % 3 + 1] || ' place ' || n, json_build_object(
+            'destination', (ARRAY['Paris', 'Rome', 'Lisbon', 'Oslo', 'Vienna'])[n % 5 + 1],
+            'start_date', '2025-01-01'::date + n, 'end_date', '2025-01-01'::date + n + 6)
+        FROM generate_series(1, $1) c, generate_series(1, $2) n
+        ORDER BY n, c
+    """, customers, per_customer)
+    await conn.execute("VACUUM ANALYZE")
+
+
+def problems_in(check: PlanCheck, nodes: List[Dict[str, Any]]) -> List[str]:
+    problems = []
+    for node in nodes:
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in check.no_seq_scan:
+            problems.append(describe(node))
+        if check.no_sort and node["Node Type"] in ("Sort", "Incremental Sort"):
+            problems.append(describe(node))
+    if check.index and not any(node.get("Index Name") == check.index for node in nodes):
+        problems.append(f"{check.index} unused")
+    return problems
+
+
+async def check(conn: asyncpg.Connection, random_page_cost: float) -> int:
+    failures = 0
+    await conn.execute(f"SET random_page_cost = {float(random_page_cost)}")
+    for mode in ("force_custom_plan", "force_generic_plan"):
+        await conn.execute(f"SET plan_cache_mode = {mode}")
+        print(f"-- {mode}")
+        for c in CHECKS:
+            # EXPLAIN without ANALYZE: the DELETEs are planned, not run
+            plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {c.sql}", *c.params)
+            plan = orjson.loads(plan) if isinstance(plan, str) else plan
+            nodes = plan_nodes(plan[0]["Plan"])
+            problems = problems_in(c, nodes)
+            failures += bool(problems)
+            verdict = f"FAIL ({'; '.join(problems)})" if problems else "ok"
+            print(f"{c.name:<30} {verdict:<6}  {' > '.join(describe(n) for n in nodes)}")
+    return failures
+
+
+async def run(args: argparse.Namespace) -> int:
+    scratch = f"plan_check_{os.getpid()}"
+    admin = await asyncpg.connect(args.dsn)
+    await admin.execute(f"CREATE DATABASE {scratch}")
+    try:
+        conn = await asyncpg.connect(args.dsn, database=scratch)
+        try:
+            await migrations.upgrade(conn, target=args.target)
+            await seed(conn, args.customers, args.per_customer)
+            failures = await check(conn, args.random_page_cost)
+        finally:
+            await conn.close()
+    finally:
+        await admin.execute(f"DROP DATABASE {scratch}")
+        await admin.close()
+    if failures:
+        print(f"{failures} plan regression(s)")
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"),
+                        help="Postgres DSN allowed to create databases (default: DATABASE_URL)")
+    parser.add_argument("--target", type=int, help="apply migrations only up to this version")
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--per-customer", type=int, default=20)
+    parser.add_argument("--random-page-cost", type=float, default=1.1,
+                        help="planner setting of the target database (1.1 suits SSD storage)")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or DATABASE_URL is required")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
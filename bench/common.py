@@ -0,0 +1,93 @@
+"""Shared helpers for the offline benchmarks in this directory."""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# The benchmarks never talk to Supabase; placeholders keep src/db.py importable.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "benchmark-placeholder-key")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float], elapsed: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (ms) for one run."""
+    return {
+        "requests": len(samples),
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000 if samples else 0.0,
+    }
+
+
+def print_row(label: str, stats: Dict[str, float]) -> None:
+    print(
+        f"{label:<28} n={stats['requests']:<6} rps={stats['rps']:>9.1f} "
+        f"p50={stats['p50_ms']:>8.2f}ms p99={stats['p99_ms']:>8.2f}ms"
+    )
+
+
+async def timed(
+    call: Callable[[], Awaitable[object]], samples: List[float], start: float | None = None
+) -> None:
+    """
+    Awaits call() and appends its latency to samples.
+    Pass the burst start time to measure from when the request was issued
+    rather than from when the event loop got round to running it.
+    """
+    start = time.perf_counter() if start is None else start
+    await call()
+    samples.append(time.perf_counter() - start)
+
+
+CITIES = ["Lisbon", "Porto", "Madrid", "Seville", "Paris", "Lyon", "Rome", "Florence", "Vienna", "Prague"]
+WORDS = ("museum tram viewpoint market lunch dinner walk tour castle cathedral harbour park gallery "
+         "bakery river bridge station tickets booked early late quiet busy cheap pricey local").split()
+
+
+def itinerary_of_size(size: int, rng: random.Random | None = None) -> dict:
+    """
+    A plausible itinerary (days of activities) of roughly `size` bytes as
+    JSON. With `rng`, names, notes and prices vary the way user-written
+    data does instead of repeating, which matters for compression ratios.
+    """
+    days, day = [], 0
+    while len(json.dumps({"days": days})) < size:
+        day += 1
+        if rng is None:
+            city = "Lisbon"
+            activities = [
+                {"time": f"{9 + i}:00", "title": f"Stop {i}", "notes": "Tram 28 then walk up to the viewpoint.", "cost": 12.5}
+                for i in range(6)
+            ]
+        else:
+            city = rng.choice(CITIES)
+            activities = [
+                {
+                    "time": f"{rng.randint(7, 22)}:{rng.choice(['00', '15', '30', '45'])}",
+                    "title": " ".join(rng.choices(WORDS, k=rng.randint(1, 3))).title(),
+                    "notes": " ".join(rng.choices(WORDS, k=rng.randint(4, 14))),
+                    "cost": round(rng.uniform(0, 80), 2),
+                    "lat": round(rng.uniform(36, 52), 5),
+                    "lng": round(rng.uniform(-9, 17), 5),
+                }
+                for _ in range(rng.randint(3, 7))
+            ]
+        days.append({"day": day, "city": city, "activities": activities})
+    return {"title": "Trip", "days": days}
@@ -0,0 +1,61 @@
+"""In-memory stand-in for the redis.asyncio client used by src/cache and src/ratelimit."""
+import time
+from typing import Any, Dict
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: Dict[str, tuple[float | None, Any]] = {}
+        self.calls = 0
+
+    async def get(self, key: str) -> Any | None:
+        self.calls += 1
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: Any, ex: int | None = None) -> bool:
+        self.calls += 1
+        self.data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        self.calls += 1
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def register_script(self, script: str):
+        """Runs the Lua scripts of the rate limiter and the shared cache as their Python twins."""
+        from src.cache import INVALIDATE_SCRIPT, SET_IF_GENERATION_SCRIPT
+        from src.ratelimit import GCRA_SCRIPT, gcra
+
+        async def gcra_run(keys, args):
+            now, interval, burst = float(args[0]), float(args[1]), int(args[2])
+            stored = await self.get(keys[0])
+            allowed, new_tat, retry_after = gcra(None if stored is None else float(stored), now, interval, burst)
+            if not allowed:
+                return [0, str(retry_after)]
+            self.calls += 1
+            self.data[keys[0]] = (time.monotonic() + new_tat - now, str(new_tat))
+            return [1, "0"]
+
+        async def set_if_generation(keys, args):
+            if (await self.get(keys[1]) or "0") != str(args[1]):
+                return 0
+            await self.set(keys[0], args[0], ex=int(args[2]))
+            return 1
+
+        async def invalidate(keys, args):
+            generation = int(await self.get(keys[1]) or "0") + 1
+            await self.set(keys[1], str(generation), ex=int(args[0]))
+            await self.delete(keys[0])
+            return 1
+
+        scripts = {GCRA_SCRIPT: gcra_run, SET_IF_GENERATION_SCRIPT: set_if_generation, INVALIDATE_SCRIPT: invalidate}
+        if script not in scripts:
+            raise NotImplementedError("FakeRedis only emulates the rate limiter and shared cache scripts.")
+        return scripts[script]
@@ -0,0 +1,271 @@
+"""
+In-memory stand-in for the async Supabase client.
+
+Implements the subset of the PostgREST query-builder chain that src/db.py
+uses, backed by plain dicts that follow the tables in db/migrations
+(serial ids, unique email, itineraries -> customers ON DELETE CASCADE).
+An optional per-call latency emulates the network round trip; with
+blocking=True it sleeps synchronously, the way the old sync client did.
+`client.postgrest` answers the raw PostgREST requests db._rest() sends
+from the same tables.
+"""
+import asyncio
+import copy
+import json
+import time
+from typing import Any, Dict, List
+
+import httpx
+from postgrest.exceptions import APIError
+from src import metrics
+
+
+UNIQUE_COLUMNS = {"customers": ["email"]}
+PRIMARY_KEYS = {"customers": "customer_id", "itineraries": "itinerary_id"}
+# child table -> (parent table, foreign key column)
+FOREIGN_KEYS = {"itineraries": ("customers", "customer_id")}
+
+
+class FakeResponse:
+    def __init__(self, data: List[Dict[str, Any]], count: int | None = None):
+        self.data = data
+        self.count = count
+
+
+def _split_columns(columns: str) -> List[str]:
+    """Splits a select string on top-level commas."""
+    parts, depth, current = [], 0, ""
+    for ch in columns:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+class FakeQuery:
+    def __init__(self, backend: "FakeSupabase", table: str):
+        self.backend = backend
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.filters: List[tuple] = []
+        self.order_by: tuple | None = None
+        self.max_rows: int | None = None
+
+    # --- actions ---
+    def select(self, columns: str = "*", count: str | None = None) -> "FakeQuery":
+        self.action, self.columns = "select", columns
+        return self
+
+    def insert(self, payload: Any) -> "FakeQuery":
+        self.action, self.payload = "insert", payload
+        return self
+
+    def update(self, payload: Dict[str, Any]) -> "FakeQuery":
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self.action = "delete"
+        return self
+
+    # --- modifiers ---
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(("eq", column, value))
+        return self
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(("lt", column, value))
+        return self
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(("gt", column, value))
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> "FakeQuery":
+        self.filters.append(("in", column, list(values)))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, size: int) -> "FakeQuery":
+        self.max_rows = size
+        return self
+
+    # --- execution ---
+    async def execute(self) -> FakeResponse:
+        start = time.perf_counter()
+        if self.backend.latency:
+            if self.backend.blocking:
+                time.sleep(self.backend.latency)
+            else:
+                await asyncio.sleep(self.backend.latency)
+        self.backend.calls += 1
+        response = getattr(self, f"_run_{self.action}")()
+        # Report to /metrics as the real HTTP transport would
+        if self.backend.record_metrics:
+            metrics.record_round_trip(time.perf_counter() - start, len(json.dumps(self.payload)) if self.payload else 0)
+            metrics.record_received(len(json.dumps(response.data)))
+        return response
+
+    def _row_value(self, row: Dict[str, Any], column: str) -> Any:
+        if "." in column:
+            parent, parent_column = column.split(".", 1)
+            _, fk = FOREIGN_KEYS[self.table]
+            parent_row = self.backend.find(parent, PRIMARY_KEYS[parent], row[fk])
+            return parent_row.get(parent_column) if parent_row else None
+        return row.get(column)
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        for op, column, value in self.filters:
+            actual = self._row_value(row, column)
+            if op == "eq" and actual != value:
+                return False
+            if op == "lt" and not (actual is not None and actual < value):
+                return False
+            if op == "gt" and not (actual is not None and actual > value):
+                return False
+            if op == "in" and actual not in value:
+                return False
+        return True
+
+    def _selected_rows(self) -> List[Dict[str, Any]]:
+        rows = [row for row in self.backend.tables[self.table] if self._matches(row)]
+        if self.order_by:
+            column, desc = self.order_by
+            rows.sort(key=lambda r: r[column], reverse=desc)
+        if self.max_rows is not None:
+            rows = rows[: self.max_rows]
+        return rows
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        if self.columns.strip() == "*":
+            return copy.deepcopy(row)
+        out: Dict[str, Any] = {}
+        for column in _split_columns(self.columns):
+            if "(" in column:
+                name, inner = column.split("(", 1)
+                parent = name.split("!", 1)[0]
+                _, fk = FOREIGN_KEYS[self.table]
+                parent_row = self.backend.find(parent, PRIMARY_KEYS[parent], row[fk]) or {}
+                out[parent] = {c: parent_row.get(c) for c in _split_columns(inner[:-1])}
+            else:
+                out[column] = copy.deepcopy(row.get(column))
+        return out
+
+    def _run_select(self) -> FakeResponse:
+        return FakeResponse([self._project(row) for row in self._selected_rows()])
+
+    def _run_insert(self) -> FakeResponse:
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = []
+        for row in rows:
+            for column in UNIQUE_COLUMNS.get(self.table, []):
+                if self.backend.find(self.table, column, row.get(column)):
+                    raise APIError({
+                        "code": "23505",
+                        "message": f'duplicate key value violates unique constraint "{self.table}_{column}_key"',
+                    })
+            if self.table in FOREIGN_KEYS:
+                parent, fk = FOREIGN_KEYS[self.table]
+                if not self.backend.find(parent, PRIMARY_KEYS[parent], row.get(fk)):
+                    raise APIError({"code": "23503", "message": f"insert on {self.table} violates foreign key"})
+            new_row = copy.deepcopy(row)
+            new_row[PRIMARY_KEYS[self.table]] = self.backend.next_id(self.table)
+            self.backend.tables[self.table].append(new_row)
+            inserted.append(copy.deepcopy(new_row))
+        return FakeResponse(inserted)
+
+    def _run_update(self) -> FakeResponse:
+        updated = []
+        for row in self._selected_rows():
+            row.update(copy.deepcopy(self.payload))
+            updated.append(copy.deepcopy(row))
+        return FakeResponse(updated)
+
+    def _run_delete(self) -> FakeResponse:
+        doomed = self._selected_rows()
+        ids = {id(row) for row in doomed}
+        self.backend.tables[self.table] = [r for r in self.backend.tables[self.table] if id(r) not in ids]
+        for child, (parent, fk) in FOREIGN_KEYS.items():
+            if parent == self.table:
+                parent_ids = {row[PRIMARY_KEYS[parent]] for row in doomed}
+                self.backend.tables[child] = [r for r in self.backend.tables[child] if r[fk] not in parent_ids]
+        return FakeResponse([copy.deepcopy(row) for row in doomed])
+
+
+class FakePostgrest:
+    """The part of postgrest.AsyncPostgrestClient that db._rest() uses."""
+
+    base_url = "http://fake-supabase/rest/v1"
+
+    def __init__(self, backend: "FakeSupabase"):
+        self.backend = backend
+        self.headers: Dict[str, str] = {}
+        self.session = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        query = FakeQuery(self.backend, request.url.path.rsplit("/", 1)[-1])
+        params = dict(request.url.params)
+        columns = params.pop("select", "*")
+        for column, expression in params.items():
+            op, _, value = expression.partition(".")
+            query.filters.append((op, column, int(value) if value.lstrip("-").isdigit() else value))
+        try:
+            if request.method == "POST":
+                response = await query.insert(json.loads(request.content)).execute()
+                query.columns = columns
+                rows = [query._project(row) for row in response.data]
+            else:
+                rows = (await query.select(columns).execute()).data
+        except APIError as err:
+            return httpx.Response(409, json={"code": err.code, "message": err.message})
+
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return httpx.Response(406, json={"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned"})
+            return httpx.Response(200, json=rows[0])
+        return httpx.Response(201 if request.method == "POST" else 200, json=rows)
+
+
+class FakeSupabase:
+    """Drop-in replacement for supabase.AsyncClient in db.set_client()."""
+
+    def __init__(self, latency: float = 0.0, blocking: bool = False, record_metrics: bool = False):
+        self.latency = latency
+        self.blocking = blocking
+        self.record_metrics = record_metrics
+        self.calls = 0
+        self.tables: Dict[str, List[Dict[str, Any]]] = {"customers": [], "itineraries": []}
+        self._ids: Dict[str, int] = {"customers": 0, "itineraries": 0}
+        self._postgrest: FakePostgrest | None = None
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    @property
+    def postgrest(self) -> FakePostgrest:
+        if self._postgrest is None:
+            self._postgrest = FakePostgrest(self)
+        return self._postgrest
+
+    def next_id(self, table: str) -> int:
+        self._ids[table] += 1
+        return self._ids[table]
+
+    def find(self, table: str, column: str, value: Any) -> Dict[str, Any] | None:
+        for row in self.tables[table]:
+            if row.get(column) == value:
+                return row
+        return None
@@ -0,0 +1,150 @@
+"""
+Load test: scripted user journeys against the app.
+
+Each virtual user signs up, logs in, saves itineraries, lists them, reads
+one back, deletes them and finally deletes the account. By default the app
+runs in-process on the in-memory repository (DB_BACKEND=memory), so it
+needs no network or credentials and can run in CI; another DB_BACKEND
+runs the same journeys in-process against that database. --target points it at
+a running server instead; that server needs RATE_LIMIT_ENABLED=false,
+since every journey then comes from one IP. Reports per-step latency
+percentiles and overall throughput, and exits non-zero when the error
+rate exceeds --max-error-rate.
+
+    python bench/loadtest.py --users 200 --concurrency 20 --itineraries 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import common  # noqa: F401  (sets sys.path and placeholder env vars)
+import httpx
+
+os.environ.setdefault("DB_BACKEND", "memory")
+
+from src import db, hashing  # noqa: E402
+from src.main import app  # noqa: E402
+from src.memory_repository import MemoryRepository  # noqa: E402
+
+STEPS = ["signup", "login", "save", "list", "get", "delete_itineraries", "delete_user"]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, step: str, request, expect: int) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[step] += 1
+            return None
+        self.latencies[step].append(time.perf_counter() - start)
+        if response.status_code != expect:
+            self.errors[step] += 1
+            return None
+        return response
+
+
+async def journey(client: httpx.AsyncClient, rec: Recorder, user: int, itineraries: int, rng: random.Random) -> None:
+    email, password = f"load{user}-{rng.getrandbits(32):x}@example.com", "load-test-password"
+    signup = client.post("/create_user", data={"firstname": "Load", "lastname": f"User{user}", "email": email, "password": password})
+    if await rec.call("signup", signup, 201) is None:
+        return
+    login = await rec.call("login", client.post("/auth", data={"email": email, "password": password}), 200)
+    if login is None:
+        return
+    auth = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    saved = []
+    for i in range(itineraries):
+        data = common.itinerary_of_size(rng.choice([1_000, 5_000, 20_000]), rng)
+        r = await rec.call("save", client.post("/v2/me/itineraries", json={"itinerary_name": f"Trip {i}", "itinerary_data": data}, headers=auth), 201)
+        if r is not None:
+            saved.append(r.json()["itinerary_id"])
+
+    await rec.call("list", client.get("/me/list_itineraries", params={"summary": True}, headers=auth), 200)
+    if saved:
+        await rec.call("get", client.get(f"/v2/me/itineraries/{rng.choice(saved)}", headers=auth), 200)
+    await rec.call("delete_itineraries", client.delete("/me/delete_itinerary", headers=auth), 200)
+    await rec.call("delete_user", client.request("DELETE", "/delete_user", data={"email": email}), 200)
+
+
+def client_for(user: int, target: str | None) -> httpx.AsyncClient:
+    if target:
+        return httpx.AsyncClient(base_url=target, timeout=30)
+    # A distinct client address per user, as real traffic would have
+    ip = f"10.{user // 65536 % 256}.{user // 256 % 256}.{user % 256}"
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(ip, 40000)), base_url="http://loadtest")
+
+
+async def run(args: argparse.Namespace) -> int:
+    if not args.target:
+        if os.environ["DB_BACKEND"] == "memory":
+            db.set_repository(MemoryRepository(latency=args.latency))
+        hashing.configure(kind="thread", workers=os.cpu_count() or 1, queue_limit=args.users * 2, rounds=args.bcrypt_rounds)
+
+    rec = Recorder()
+    rng = random.Random(args.seed)
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def gated(user: int) -> None:
+        async with gate:
+            async with client_for(user, args.target) as client:
+                await journey(client, rec, user, args.itineraries, random.Random(rng.random()))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(gated(u) for u in range(args.users)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(v) for v in rec.latencies.values())
+    errors = sum(rec.errors.values())
+    print(f"{args.users} journeys in {elapsed:.2f}s: {total / elapsed:.1f} req/s, {args.users / elapsed:.1f} journeys/s, "
+          f"errors={errors}")
+    print(f"{'step':<20}{'n':>6}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step in STEPS:
+        samples = rec.latencies.get(step, [])
+        print(f"{step:<20}{len(samples):>6}{rec.errors.get(step, 0):>8}"
+              + "".join(f"{common.percentile(samples, p) * 1000:>10.2f}" for p in (50, 95, 99)))
+
+    error_rate = errors / max(1, total)
+    if error_rate > args.max_error_rate:
+        print(f"FAIL: error rate {error_rate:.2%} exceeds {args.max_error_rate:.2%}")
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--itineraries", type=int, default=5, help="itineraries saved per journey")
+    parser.add_argument("--target", help="base URL of a running server; in-process when omitted")
+    parser.add_argument("--latency", type=float, default=0.002, help="in-memory repository round trip, seconds")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--max-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.getLogger("src").setLevel(logging.ERROR)
+
+    async def run_and_close() -> int:
+        try:
+            return await run(args)
+        finally:
+            await db.close_client()
+
+    code = asyncio.run(run_and_close())
+    hashing.shutdown()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Minimal PostgREST look-alike for transport benchmarks.
+
+Serves GET /rest/v1/<table> with a fixed JSON row (settable through
+/_config) and answers POST inserts with the row, or just its id when the
+request selects only that. Both wait an optional delay first. It can fail a fraction of requests with 503, and counts the distinct TCP
+connections it has seen. Connecting over loopback costs next to nothing,
+so the first request on each new connection is held for `handshake`
+seconds to stand in for the TCP + TLS setup of a real remote PostgREST. It runs under uvicorn in a child process so it
+does not compete with the client for the benchmark's event loop and GIL.
+Counters are read and settings changed over HTTP (/_stats, /_config).
+"""
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+def build_app(delay: float, handshake: float) -> Starlette:
+    state = {"delay": delay, "handshake": handshake, "failure_rate": 0.0, "requests": 0, "connections": set()}
+    encoded = {}
+
+    def set_row(row: dict) -> None:
+        # Encoded once here so serving it costs the benchmark's CPU nothing
+        encoded["object"] = json.dumps(row).encode()
+        encoded["array"] = b"[" + encoded["object"] + b"]"
+
+    set_row({"first_name": "Bench", "last_name": "User", "email": "bench@example.com"})
+
+    async def table(request: Request) -> Response:
+        state["requests"] += 1
+        wait = state["delay"]
+        if request.client not in state["connections"]:
+            state["connections"].add(request.client)
+            wait += state["handshake"]
+        if wait:
+            await asyncio.sleep(wait)
+        if state["failure_rate"] and random.random() < state["failure_rate"]:
+            return JSONResponse({"message": "upstream unavailable"}, status_code=503)
+        if request.method == "POST":
+            payload = json.loads(await request.body())
+            rows = payload if isinstance(payload, list) else [payload]
+            if request.query_params.get("select") == "itinerary_id":
+                return JSONResponse([{"itinerary_id": state["requests"]} for _ in rows], status_code=201)
+            return JSONResponse([{**row, "itinerary_id": state["requests"]} for row in rows], status_code=201)
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            return Response(encoded["object"], media_type="application/json")
+        return Response(encoded["array"], media_type="application/json")
+
+    async def stats(request: Request) -> JSONResponse:
+        return JSONResponse({"requests": state["requests"], "connections": len(state["connections"])})
+
+    async def config(request: Request) -> JSONResponse:
+        settings = await request.json()
+        if "row" in settings:
+            set_row(settings.pop("row"))
+        state.update(settings)
+        state["requests"], state["connections"] = 0, set()
+        return JSONResponse({"ok": True})
+
+    return Starlette(routes=[
+        Route("/_stats", stats, methods=["GET"]),
+        Route("/_config", config, methods=["POST"]),
+        Route("/rest/v1/{table}", table, methods=["GET", "POST"]),
+    ])
+
+
+def _serve(port: int, delay: float, handshake: float) -> None:
+    uvicorn.run(build_app(delay, handshake), host="127.0.0.1", port=port,
+                log_level="warning", backlog=4096, lifespan="off", http="httptools")
+
+
+class MockPostgrest:
+    def __init__(self, delay: float = 0.005, handshake: float = 0.03):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process = multiprocessing.Process(target=_serve, args=(self.port, delay, handshake), daemon=True)
+
+    def start(self) -> "MockPostgrest":
+        self._process.start()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(f"{self.url}/_stats")
+                return self
+            except httpx.TransportError:
+                time.sleep(0.05)
+        raise RuntimeError("mock PostgREST server did not start")
+
+    def configure(self, **settings) -> None:
+        """Changes delay/handshake/failure_rate/row and resets the counters."""
+        httpx.post(f"{self.url}/_config", json=settings).raise_for_status()
+
+    def stats(self) -> dict:
+        return httpx.get(f"{self.url}/_stats").json()
+
+    def stop(self) -> None:
+        self._process.terminate()
+        self._process.join()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
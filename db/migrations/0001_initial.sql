@@ -0,0 +1,17 @@
+-- Baseline: the schema of db/db.config. IF NOT EXISTS lets databases
+-- created from db.config adopt the migration history as they are.
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id SERIAL PRIMARY KEY,
+    first_name VARCHAR(255) NOT NULL,
+    last_name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL UNIQUE,
+    password_hash VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS itineraries (
+    itinerary_id SERIAL PRIMARY KEY,
+    customer_id INT NOT NULL,
+    itinerary_name VARCHAR(255) NOT NULL,
+    itinerary_data JSON,
+    FOREIGN KEY (customer_id) REFERENCES customers(customer_id) ON DELETE CASCADE
+);
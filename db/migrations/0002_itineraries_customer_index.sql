@@ -0,0 +1,5 @@
+-- Every itinerary query filters on customer_id and returns rows newest
+-- first: one index serves the filter, the ORDER BY itinerary_id DESC and
+-- the keyset cursor, and the ON DELETE CASCADE from customers.
+CREATE INDEX IF NOT EXISTS itineraries_customer_id_itinerary_id_idx
+    ON itineraries (customer_id, itinerary_id DESC);
@@ -0,0 +1,4 @@
+-- Binary JSON: parsed once on write instead of on every read, and
+-- indexable with GIN. Rewrites the table under an exclusive lock.
+ALTER TABLE itineraries
+    ALTER COLUMN itinerary_data TYPE JSONB USING itinerary_data::jsonb;
@@ -0,0 +1,4 @@
+-- Emails differing only in case belong to the same person. Fails if the
+-- table already holds such duplicates; merge or rename them first.
+CREATE UNIQUE INDEX IF NOT EXISTS customers_email_lower_key
+    ON customers (lower(email));
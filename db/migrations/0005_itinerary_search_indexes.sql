@@ -0,0 +1,12 @@
+-- Search filters itinerary_name and itinerary_data->>'destination' with
+-- ILIKE, always within one customer. Trigram GIN indexes answer ILIKE
+-- for substrings, prefixes and case-insensitive equality; btree_gin
+-- lets customer_id lead them so a lookup stays inside one customer.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+CREATE INDEX IF NOT EXISTS itineraries_customer_name_trgm_idx
+    ON itineraries USING gin (customer_id, itinerary_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS itineraries_customer_destination_trgm_idx
+    ON itineraries USING gin (customer_id, (itinerary_data->>'destination') gin_trgm_ops);
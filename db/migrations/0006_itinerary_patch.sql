@@ -0,0 +1,235 @@
+-- PATCH /v2/me/itineraries/{id}: optimistic concurrency and in-database
+-- patching. Every patch bumps version, and a patch only applies to the
+-- version the client read. The patch is applied here, so only the delta
+-- crosses the network:
+--   jsonb_merge_patch  RFC 7386 JSON Merge Patch
+--   jsonb_json_patch   RFC 6902 JSON Patch, on the json_pointer_* helpers
+--   patch_itinerary    version check, patch and bump under a row lock;
+--                      also PostgREST's /rpc/patch_itinerary
+-- A patch that cannot apply raises SQLSTATE PT422, which PostgREST turns
+-- into HTTP 422. src/json_patch.py does the same for the memory backend.
+ALTER TABLE itineraries ADD COLUMN IF NOT EXISTS version INT NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION jsonb_merge_patch(target jsonb, patch jsonb) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    result jsonb;
+    k text;
+    v jsonb;
+BEGIN
+    IF jsonb_typeof(patch) IS DISTINCT FROM 'object' THEN
+        RETURN patch;
+    END IF;
+    result := CASE WHEN jsonb_typeof(target) = 'object' THEN target ELSE '{}'::jsonb END;
+    FOR k, v IN SELECT key, value FROM jsonb_each(patch) LOOP
+        IF jsonb_typeof(v) = 'null' THEN
+            result := result - k;
+        ELSE
+            result := jsonb_set(result, ARRAY[k], jsonb_merge_patch(result -> k, v));
+        END IF;
+    END LOOP;
+    RETURN result;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION json_pointer_path(pointer text) RETURNS text[]
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF pointer = '' THEN
+        RETURN '{}';
+    END IF;
+    IF pointer IS NULL OR left(pointer, 1) <> '/' THEN
+        RAISE EXCEPTION 'Invalid JSON pointer "%"', pointer USING ERRCODE = 'PT422';
+    END IF;
+    -- string_to_array('', '/') is empty, but "/" names the key ""
+    IF pointer = '/' THEN
+        RETURN ARRAY[''];
+    END IF;
+    RETURN ARRAY(
+        SELECT replace(replace(token, '~1', '/'), '~0', '~')
+        FROM unnest(string_to_array(substr(pointer, 2), '/')) WITH ORDINALITY AS t(token, n)
+        ORDER BY n
+    );
+END
+$$;
+
+-- The array index `token` names, if it is one no greater than upper_bound
+CREATE OR REPLACE FUNCTION json_pointer_index(token text, upper_bound int) RETURNS int
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF token ~ '^(0|[1-9][0-9]{0,8})$' THEN
+        IF token::int <= upper_bound THEN
+            RETURN token::int;
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION json_pointer_get(doc jsonb, path text[], pointer text) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    node jsonb := doc;
+    token text;
+BEGIN
+    FOREACH token IN ARRAY path LOOP
+        -- A missing key or index gives SQL NULL; JSON null is 'null'
+        CASE jsonb_typeof(node)
+            WHEN 'object' THEN node := node -> token;
+            WHEN 'array' THEN node := node -> json_pointer_index(token, jsonb_array_length(node) - 1);
+            ELSE node := NULL;
+        END CASE;
+        IF node IS NULL THEN
+            RAISE EXCEPTION 'Path "%" does not exist', pointer USING ERRCODE = 'PT422';
+        END IF;
+    END LOOP;
+    RETURN node;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION json_pointer_add(doc jsonb, path text[], pointer text, value jsonb) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    depth int := cardinality(path);
+    parent jsonb;
+    index int;
+BEGIN
+    IF depth = 0 THEN
+        RETURN value;
+    END IF;
+    parent := json_pointer_get(doc, path[1:depth - 1], pointer);
+    CASE jsonb_typeof(parent)
+        WHEN 'object' THEN
+            RETURN jsonb_set(doc, path, value);
+        WHEN 'array' THEN
+            IF path[depth] = '-' THEN
+                index := jsonb_array_length(parent);
+            ELSE
+                index := json_pointer_index(path[depth], jsonb_array_length(parent));
+            END IF;
+            IF index IS NULL THEN
+                RAISE EXCEPTION 'Invalid array index in "%"', pointer USING ERRCODE = 'PT422';
+            END IF;
+            parent := coalesce((SELECT jsonb_agg(e ORDER BY n) FROM jsonb_array_elements(parent) WITH ORDINALITY AS t(e, n)
+                                WHERE n <= index), '[]')
+                || jsonb_build_array(value)
+                || coalesce((SELECT jsonb_agg(e ORDER BY n) FROM jsonb_array_elements(parent) WITH ORDINALITY AS t(e, n)
+                             WHERE n > index), '[]');
+            IF depth = 1 THEN
+                RETURN parent;
+            END IF;
+            RETURN jsonb_set(doc, path[1:depth - 1], parent);
+        ELSE
+            RAISE EXCEPTION 'Path "%" does not exist', pointer USING ERRCODE = 'PT422';
+    END CASE;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION json_pointer_remove(doc jsonb, path text[], pointer text) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+BEGIN
+    IF cardinality(path) = 0 THEN
+        RAISE EXCEPTION 'Cannot remove the whole document' USING ERRCODE = 'PT422';
+    END IF;
+    PERFORM json_pointer_get(doc, path, pointer);
+    RETURN doc #- path;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION jsonb_json_patch(doc jsonb, operations jsonb) RETURNS jsonb
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    operation jsonb;
+    op text;
+    path text[];
+    from_path text[];
+    value jsonb;
+BEGIN
+    IF jsonb_typeof(operations) IS DISTINCT FROM 'array' THEN
+        RAISE EXCEPTION 'A JSON Patch must be an array of operations' USING ERRCODE = 'PT422';
+    END IF;
+    FOR operation IN SELECT jsonb_array_elements(operations) LOOP
+        op := operation ->> 'op';
+        IF op IS NULL OR op NOT IN ('add', 'remove', 'replace', 'move', 'copy', 'test') THEN
+            RAISE EXCEPTION 'Unknown operation "%"', coalesce(op, '') USING ERRCODE = 'PT422';
+        END IF;
+        IF jsonb_typeof(operation -> 'path') IS DISTINCT FROM 'string' THEN
+            RAISE EXCEPTION 'Operation "%" needs a "path"', op USING ERRCODE = 'PT422';
+        END IF;
+        path := json_pointer_path(operation ->> 'path');
+
+        IF op IN ('add', 'replace', 'test') THEN
+            IF NOT operation ? 'value' THEN
+                RAISE EXCEPTION 'Operation "%" needs a "value"', op USING ERRCODE = 'PT422';
+            END IF;
+            value := operation -> 'value';
+        ELSIF op IN ('move', 'copy') THEN
+            IF jsonb_typeof(operation -> 'from') IS DISTINCT FROM 'string' THEN
+                RAISE EXCEPTION 'Operation "%" needs a "from"', op USING ERRCODE = 'PT422';
+            END IF;
+            from_path := json_pointer_path(operation ->> 'from');
+            value := json_pointer_get(doc, from_path, operation ->> 'from');
+        END IF;
+
+        CASE op
+            WHEN 'add', 'copy' THEN
+                doc := json_pointer_add(doc, path, operation ->> 'path', value);
+            WHEN 'remove' THEN
+                doc := json_pointer_remove(doc, path, operation ->> 'path');
+            WHEN 'replace' THEN
+                PERFORM json_pointer_get(doc, path, operation ->> 'path');
+                doc := CASE WHEN cardinality(path) = 0 THEN value ELSE jsonb_set(doc, path, value, false) END;
+            WHEN 'move' THEN
+                IF cardinality(path) > cardinality(from_path) AND path[1:cardinality(from_path)] = from_path THEN
+                    RAISE EXCEPTION 'Cannot move "%" into itself', operation ->> 'from' USING ERRCODE = 'PT422';
+                END IF;
+                doc := json_pointer_add(json_pointer_remove(doc, from_path, operation ->> 'from'),
+                                        path, operation ->> 'path', value);
+            WHEN 'test' THEN
+                IF json_pointer_get(doc, path, operation ->> 'path') <> value THEN
+                    RAISE EXCEPTION 'Test failed at "%"', operation ->> 'path' USING ERRCODE = 'PT422';
+                END IF;
+        END CASE;
+    END LOOP;
+    RETURN doc;
+END
+$$;
+
+-- No row when the itinerary is not the customer's; applied is false when
+-- the stored version is not p_expected_version, and current_version is
+-- the version after the call either way
+CREATE OR REPLACE FUNCTION patch_itinerary(
+    p_customer_id int, p_itinerary_id int, p_expected_version int, p_patch jsonb, p_kind text
+) RETURNS TABLE (current_version int, applied boolean)
+LANGUAGE plpgsql AS $$
+DECLARE
+    patched jsonb;
+BEGIN
+    IF p_kind IS NULL OR p_kind NOT IN ('merge', 'json-patch') THEN
+        RAISE EXCEPTION 'Unknown patch kind "%"', coalesce(p_kind, '') USING ERRCODE = 'PT422';
+    END IF;
+    -- The row lock queues concurrent patches; each sees its predecessor's version
+    SELECT i.version, i.itinerary_data INTO current_version, patched
+    FROM itineraries i
+    WHERE i.itinerary_id = p_itinerary_id AND i.customer_id = p_customer_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    applied := current_version = p_expected_version;
+    IF applied THEN
+        IF p_kind = 'merge' THEN
+            patched := jsonb_merge_patch(patched, p_patch);
+        ELSE
+            patched := jsonb_json_patch(patched, p_patch);
+        END IF;
+        IF jsonb_typeof(patched) IS DISTINCT FROM 'object' THEN
+            RAISE EXCEPTION 'itinerary_data must remain a JSON object' USING ERRCODE = 'PT422';
+        END IF;
+        UPDATE itineraries i SET itinerary_data = patched, version = i.version + 1
+        WHERE i.itinerary_id = p_itinerary_id
+        RETURNING i.version INTO current_version;
+    END IF;
+    RETURN NEXT;
+END
+$$;
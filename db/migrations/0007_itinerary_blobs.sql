@@ -0,0 +1,20 @@
+-- Content-addressed itinerary payloads, used when ITINERARY_STORAGE=blob
+-- (src/blobs.py). Each distinct itinerary_data is stored once, compressed,
+-- under the sha256 of its canonical JSON; the itinerary row keeps a small
+-- stub naming it ('$blob') plus the keys search filters on, so the
+-- indexes of 0005 keep working. Blobs are immutable and never deleted
+-- with their itineraries; a blob no stub names can be purged with
+--   DELETE FROM itinerary_blobs b WHERE NOT EXISTS (
+--       SELECT 1 FROM itineraries i WHERE i.itinerary_data->>'$blob' = b.hash)
+-- while no itinerary is being written.
+CREATE TABLE IF NOT EXISTS itinerary_blobs (
+    hash TEXT PRIMARY KEY CHECK (hash ~ '^[0-9a-f]{64}$'),
+    encoding TEXT NOT NULL CHECK (encoding IN ('zstd', 'gzip', 'identity')),
+    -- Already compressed: keep TOAST from compressing it again
+    data BYTEA NOT NULL,
+    raw_size INT NOT NULL
+);
+ALTER TABLE itinerary_blobs ALTER COLUMN data SET STORAGE EXTERNAL;
+
+CREATE INDEX IF NOT EXISTS itineraries_blob_idx
+    ON itineraries ((itinerary_data->>'$blob')) WHERE itinerary_data ? '$blob';
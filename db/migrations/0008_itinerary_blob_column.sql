@@ -0,0 +1,23 @@
+-- Marks blob-backed itineraries out of band. Under 0007 a row was a stub
+-- when itinerary_data merely looked like one, so a customer who saved
+-- {"$blob": "<hash>"} had it read back as whichever payload that hash
+-- named. Now src/blobs.py writes the hash to itinerary_blob, a column the
+-- API never reads or writes, and the stub in itinerary_data keeps only
+-- the keys search filters on; itinerary_data is plain JSON whatever its
+-- shape. Rows stubbed under 0007 are not converted, since their shape is
+-- the very thing that cannot be trusted; they read as the JSON they hold
+-- until an operator who has checked them runs
+--   UPDATE itineraries SET itinerary_blob = itinerary_data->>'$blob',
+--       itinerary_data = itinerary_data - '$blob'
+--   WHERE itinerary_data->>'$blob' IN (SELECT hash FROM itinerary_blobs);
+-- The foreign key keeps a named blob from being purged; a blob no
+-- row names can be purged with
+--   DELETE FROM itinerary_blobs b WHERE NOT EXISTS (
+--       SELECT 1 FROM itineraries i WHERE i.itinerary_blob = b.hash)
+-- while no itinerary is being written.
+ALTER TABLE itineraries
+    ADD COLUMN IF NOT EXISTS itinerary_blob TEXT REFERENCES itinerary_blobs (hash);
+
+DROP INDEX IF EXISTS itineraries_blob_idx;
+CREATE INDEX IF NOT EXISTS itineraries_itinerary_blob_idx
+    ON itineraries (itinerary_blob) WHERE itinerary_blob IS NOT NULL;
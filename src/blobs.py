@@ -0,0 +1,275 @@
+import hashlib
+import inspect
+import logging
+import os
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import orjson
+
+from .json_patch import apply_patch
+from .repository import (
+    BLOB_COLUMN, ITINERARY_COLUMNS, ITINERARY_VERSIONED_COLUMNS, SEARCH_DEFAULT_FIELDS, Blob, ItinerarySearch,
+    PatchError, PatchOutcome, Repository, RepositoryError,
+)
+
+logger = logging.getLogger(__name__)
+
+# With ITINERARY_STORAGE=blob an itinerary row's BLOB_COLUMN holds the
+# sha256 of the payload's canonical JSON and its itinerary_data is a stub:
+# whichever of STUB_KEYS the payload has, so search filters and projects
+# them without the payload. The payload itself is stored once per distinct
+# content, compressed, in itinerary_blobs (db/migrations/0007 and 0008).
+# Only the column marks a row as blob-backed; itinerary_data is never
+# inspected for it, so any JSON a customer saves reads back as saved.
+STUB_KEYS = ("destination", "start_date", "end_date")
+ENCODINGS = ("zstd", "gzip", "identity")
+
+
+def decompress(blob: Blob) -> bytes:
+    """The JSON bytes a blob holds."""
+    if blob.encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(blob.data, max_output_size=blob.raw_size)
+    if blob.encoding == "gzip":
+        return zlib.decompress(blob.data, 31)
+    if blob.encoding == "identity":
+        return bytes(blob.data)
+    raise RepositoryError(f'unknown blob encoding "{blob.encoding}"', "XX001")
+
+
+class BlobCodec:
+    """
+    Turns payloads into blobs: canonical JSON (sorted keys, so copies
+    differing only in key order share a blob), hashed with sha256 and
+    compressed with `encoding`. A payload compression does not shrink is
+    kept as is ("identity").
+    """
+
+    def __init__(self, encoding: str = "zstd", level: int | None = None):
+        if encoding == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                logger.warning("zstd blobs need the 'zstandard' package; compressing with gzip.")
+                encoding, level = "gzip", None
+        if encoding not in ENCODINGS:
+            raise ValueError(f'Unknown blob encoding "{encoding}"; expected one of {", ".join(ENCODINGS)}.')
+        self.encoding = encoding
+        self.level = level if level is not None else {"zstd": 3, "gzip": 6}.get(encoding, 0)
+
+    def _compress(self, raw: bytes) -> bytes:
+        if self.encoding == "zstd":
+            import zstandard
+            return zstandard.ZstdCompressor(level=self.level).compress(raw)
+        if self.encoding == "gzip":
+            z = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            return z.compress(raw) + z.flush()
+        return raw
+
+    def encode(self, payload: Any) -> Tuple[str, Dict[str, Any], bytes]:
+        """The hash, stub and canonical JSON of `payload`; hashing only, nothing is compressed yet."""
+        raw = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        stub = {key: payload[key] for key in STUB_KEYS if key in payload} if isinstance(payload, dict) else {}
+        return hashlib.sha256(raw).hexdigest(), stub, raw
+
+    def blob(self, digest: str, raw: bytes) -> Blob:
+        data = self._compress(raw)
+        if len(data) >= len(raw):
+            return Blob(digest, "identity", raw, len(raw))
+        return Blob(digest, self.encoding, data, len(raw))
+
+
+class BlobRepository(Repository):
+    """
+    Stores `inner`'s itinerary payloads as content-addressed blobs. Writes
+    store each distinct payload of a batch once (a blob already stored is
+    left alone) and the row gets its stub, with the blob's hash in
+    BLOB_COLUMN. Reads fetch and decompress
+    payloads only when the caller asked for itinerary_data: listings of
+    names and default searches never touch a blob. Blobs are immutable, so
+    decompressed payloads are kept in an LRU of `cache_bytes` and a hot
+    read costs one query. Rows written inline before are read as they are.
+    Patches are applied here, since the database cannot see inside a blob.
+    """
+
+    def __init__(self, inner: Repository, codec: BlobCodec, cache_bytes: int = 16 * 1024 * 1024):
+        self.inner = inner
+        self.codec = codec
+        self.cache_bytes = cache_bytes
+        self.cache_size = 0
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        # Everything not overridden below goes straight to `inner`
+        for name, member in vars(Repository).items():
+            if inspect.iscoroutinefunction(member) and getattr(type(self), name) is member:
+                setattr(self, name, getattr(inner, name))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    def _remember(self, digest: str, raw: bytes) -> None:
+        if len(raw) > self.cache_bytes or digest in self._cache:
+            return
+        self._cache[digest] = raw
+        self.cache_size += len(raw)
+        while self.cache_size > self.cache_bytes:
+            self.cache_size -= len(self._cache.popitem(last=False)[1])
+
+    async def _store(self, payloads: Sequence[Any]) -> List[Tuple[str | None, Any]]:
+        """Stores the payloads' blobs; returns their (hash, stub) pairs ((None, None) for None)."""
+        stored: List[Tuple[str | None, Any]] = []
+        blobs: Dict[str, Blob] = {}
+        for payload in payloads:
+            if payload is None:
+                stored.append((None, None))
+                continue
+            digest, stub, raw = self.codec.encode(payload)
+            if digest not in blobs:
+                blobs[digest] = self.codec.blob(digest, raw)
+            stored.append((digest, stub))
+        if blobs:
+            await self.inner.insert_blobs(list(blobs.values()))
+        return stored
+
+    async def _payloads(self, digests: Iterable[str]) -> Dict[str, bytes]:
+        """JSON bytes by hash, from the cache or one get_blobs() query."""
+        found, missing = {}, []
+        for digest in set(digests):
+            raw = self._cache.get(digest)
+            if raw is None:
+                missing.append(digest)
+            else:
+                self._cache.move_to_end(digest)
+                found[digest] = raw
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            blobs = await self.inner.get_blobs(missing)
+            for digest in missing:
+                if digest not in blobs:
+                    raise RepositoryError(f"itinerary blob {digest} is missing", "XX001")
+                found[digest] = decompress(blobs[digest])
+                self._remember(digest, found[digest])
+        return found
+
+    async def _resolve(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replaces the itinerary_data of rows with a BLOB_COLUMN by their
+        payloads and drops the column; rows with the same payload share one
+        object.
+        """
+        digests = [row.pop(BLOB_COLUMN) for row in rows]
+        if any(digest is not None for digest in digests):
+            raw = await self._payloads(digest for digest in digests if digest is not None)
+            decoded = {digest: orjson.loads(payload) for digest, payload in raw.items()}
+            for row, digest in zip(rows, digests):
+                if digest is not None:
+                    row["itinerary_data"] = decoded[digest]
+        return rows
+
+    # --- itineraries ---
+    async def insert_itineraries(self, rows: List[Dict[str, Any]]) -> List[int]:
+        stored = await self._store([row.get("itinerary_data") for row in rows])
+        return await self.inner.insert_itineraries([
+            {**row, "itinerary_data": stub, BLOB_COLUMN: digest} if "itinerary_data" in row else row
+            for row, (digest, stub) in zip(rows, stored)
+        ])
+
+    async def list_itineraries(
+        self, customer_id: int, columns: Sequence[str] = ITINERARY_COLUMNS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        if "itinerary_data" not in columns:
+            return await self.inner.list_itineraries(customer_id, columns, limit, before_id)
+        rows = await self.inner.list_itineraries(customer_id, (*columns, BLOB_COLUMN), limit, before_id)
+        return await self._resolve(rows)
+
+    async def list_itineraries_by_email(
+        self, email: str, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> tuple[int | None, List[Dict[str, Any]]]:
+        customer_id, rows = await self.inner.list_itineraries_by_email(email, (*columns, BLOB_COLUMN))
+        return customer_id, await self._resolve(rows)
+
+    async def get_itinerary(
+        self, customer_id: int, itinerary_id: int, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> Dict[str, Any] | None:
+        row = await self.inner.get_itinerary(customer_id, itinerary_id, (*columns, BLOB_COLUMN))
+        return None if row is None else (await self._resolve([row]))[0]
+
+    async def search_itineraries(
+        self, customer_id: int, search: ItinerarySearch, fields: Sequence[str] = SEARCH_DEFAULT_FIELDS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        if "itinerary_data" not in fields:
+            return await self.inner.search_itineraries(customer_id, search, fields, limit, before_id)
+        rows = await self.inner.search_itineraries(customer_id, search, (*fields, BLOB_COLUMN), limit, before_id)
+        return await self._resolve(rows)
+
+    async def patch_itinerary(
+        self, customer_id: int, itinerary_id: int, expected_version: int, patch: Any, kind: str
+    ) -> PatchOutcome:
+        row = await self.inner.get_itinerary(customer_id, itinerary_id, (*ITINERARY_VERSIONED_COLUMNS, BLOB_COLUMN))
+        if row is None:
+            return PatchOutcome(None, False)
+        if row["version"] != expected_version:
+            return PatchOutcome(row["version"], False)
+        current = (await self._resolve([row]))[0]["itinerary_data"]
+        patched = apply_patch(current, patch, kind)
+        if not isinstance(patched, dict):
+            raise PatchError("itinerary_data must remain a JSON object")
+        # replace_itinerary_data() checks the version again, so a patch
+        # that landed since the read above wins and this one reports stale
+        return await self.replace_itinerary_data(customer_id, itinerary_id, expected_version, patched)
+
+    async def replace_itinerary_data(
+        self, customer_id: int, itinerary_id: int, expected_version: int, itinerary_data: Any,
+        itinerary_blob: str | None = None,
+    ) -> PatchOutcome:
+        # The hash is always the one computed here, never the caller's
+        digest, stub = (await self._store([itinerary_data]))[0]
+        return await self.inner.replace_itinerary_data(customer_id, itinerary_id, expected_version, stub, digest)
+
+    # --- raw JSON passthrough ---
+    async def insert_itinerary_raw(
+        self, customer_id: int, itinerary_name: str, itinerary_data: bytes, itinerary_blob: str | None = None
+    ) -> int:
+        try:
+            payload = orjson.loads(itinerary_data)
+        except orjson.JSONDecodeError:
+            raise RepositoryError("invalid input syntax for type json", "22P02")
+        digest, stub = (await self._store([payload]))[0]
+        return await self.inner.insert_itinerary_raw(customer_id, itinerary_name, orjson.dumps(stub), digest)
+
+    async def get_itinerary_raw(self, customer_id: int, itinerary_id: int) -> bytes | None:
+        row = await self.inner.get_itinerary(customer_id, itinerary_id, (*ITINERARY_VERSIONED_COLUMNS, BLOB_COLUMN))
+        if row is None:
+            return None
+        digest = row.pop(BLOB_COLUMN)
+        if digest is None:
+            return orjson.dumps(row)
+        # The blob's JSON is spliced in as it is, without decoding it
+        payload = (await self._payloads([digest]))[digest]
+        return b'{"itinerary_id":%d,"itinerary_name":%b,"itinerary_data":%b,"version":%d}' % (
+            row["itinerary_id"], orjson.dumps(row["itinerary_name"]), payload, row["version"]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache), "cached_bytes": self.cache_size}
+
+
+def blob_storage_from_env(repository: Repository) -> Repository:
+    """
+    `repository` itself with ITINERARY_STORAGE=inline (the default), or
+    wrapped in a BlobRepository configured by the ITINERARY_BLOB_* settings.
+    """
+    storage = os.environ.get("ITINERARY_STORAGE", "inline")
+    if storage == "inline":
+        return repository
+    if storage != "blob":
+        raise ValueError(f'Unknown ITINERARY_STORAGE "{storage}"; expected inline or blob.')
+    level = os.environ.get("ITINERARY_BLOB_LEVEL")
+    codec = BlobCodec(os.environ.get("ITINERARY_BLOB_ENCODING", "zstd"), None if level is None else int(level))
+    return BlobRepository(repository, codec, int(os.environ.get("ITINERARY_BLOB_CACHE_BYTES", str(16 * 1024 * 1024))))
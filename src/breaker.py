@@ -0,0 +1,165 @@
+import functools
+import inspect
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+import httpx
+
+from .repository import Repository, RepositoryError
+
+logger = logging.getLogger(__name__)
+
+# Error codes meaning the backend, not the query, failed: SQLSTATE classes
+# 08 (connection), 53 (insufficient resources) and 57P (shutdown), 57014
+# (statement timeout), and PostgREST's "cannot reach the database" errors
+OUTAGE_CODE_PREFIXES = ("08", "53", "57P", "57014", "PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+class BackendUnavailable(RepositoryError):
+    """The backend is failing or the circuit is open; callers should answer 503 with Retry-After."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_outage(err: Exception) -> bool:
+    """True for failures of the backend itself; constraint violations and the like prove it is up."""
+    if isinstance(err, RepositoryError):
+        if err.code is None:
+            return True
+        code = str(err.code)
+        # PostgREST reports a gateway's non-JSON error page by its HTTP status
+        return (len(code) == 3 and code.startswith("5")) or code.startswith(OUTAGE_CODE_PREFIXES)
+    return isinstance(err, (httpx.TransportError, OSError, TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Fails backend calls fast while the backend is down, instead of letting
+    every request wait out its own timeout.
+
+    closed: calls go through. `failure_threshold` outage failures in a row
+    (calls slower than `slow_call` seconds count too, when set) open it.
+    open: calls raise BackendUnavailable at once for `reset_timeout` seconds.
+    half-open: then up to `half_open_probes` calls at a time go through as
+    probes while the rest keep failing fast. A probe that succeeds closes
+    the circuit; one that fails opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 5.0,
+                 half_open_probes: int = 1, slow_call: float = 0.0, enabled: bool = True,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.slow_call = slow_call
+        self.enabled = enabled
+        self.clock = clock
+        self.failures = 0  # outage failures in a row
+        self.opened = 0  # times the circuit opened
+        self.rejected = 0  # calls failed fast
+        self._opened_at: float | None = None
+        self._probes = 0  # probes in flight
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "open" if self.clock() - self._opened_at < self.reset_timeout else "half_open"
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def _open(self) -> None:
+        self._opened_at = self.clock()
+        self.opened += 1
+        logger.warning("Circuit %s opened after %s failure(s); failing fast for %gs.",
+                       self.name, self.failures, self.reset_timeout)
+
+    def _admit(self) -> bool:
+        """Lets a call through or raises BackendUnavailable; returns whether the call is a probe."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and self._probes < self.half_open_probes:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        raise BackendUnavailable(f"Circuit {self.name} is {state}; backend calls are failing fast.", self.retry_after())
+
+    def _record(self, failed: bool, probe: bool) -> None:
+        if not failed:
+            if self._opened_at is not None and probe:
+                logger.info("Circuit %s closed: probe succeeded.", self.name)
+                self._opened_at = None
+            self.failures = 0
+            return
+        self.failures += 1
+        if probe or (self._opened_at is None and self.failures >= self.failure_threshold):
+            self._open()
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        if not self.enabled:
+            return await fn(*args, **kwargs)
+        probe = self._admit()
+        start = self.clock()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as err:
+            failed = is_outage(err)
+            self._record(failed, probe)
+            if failed:
+                raise BackendUnavailable(f"Backend call failed: {err}", self.retry_after()) from err
+            raise
+        finally:
+            if probe:
+                self._probes -= 1
+        self._record(bool(self.slow_call) and self.clock() - start > self.slow_call, probe)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after(),
+        }
+
+
+class GuardedRepository(Repository):
+    """Routes every query method of `inner` through a CircuitBreaker."""
+
+    def __init__(self, inner: Repository, breaker: CircuitBreaker):
+        self.inner = inner
+        self.breaker = breaker
+        # Instance attributes shadow the base class's query methods
+        for name, member in vars(Repository).items():
+            if name != "close" and inspect.iscoroutinefunction(member):
+                setattr(self, name, functools.partial(breaker.call, getattr(inner, name)))
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything else (a pool, counters...) is the inner repository's
+        return getattr(self.inner, name)
+
+
+def breaker_from_env(name: str) -> CircuitBreaker:
+    """Builds a breaker from the BREAKER_* environment variables."""
+    return CircuitBreaker(
+        name,
+        failure_threshold=int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5")),
+        reset_timeout=float(os.environ.get("BREAKER_RESET_TIMEOUT", "5")),
+        half_open_probes=int(os.environ.get("BREAKER_HALF_OPEN_PROBES", "1")),
+        slow_call=float(os.environ.get("BREAKER_SLOW_CALL_SECONDS", "0")),
+        enabled=os.environ.get("BREAKER_ENABLED", "true").lower() in ("1", "true", "yes"),
+    )
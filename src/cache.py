@@ -0,0 +1,201 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class Cache:
+    """
+    Async key/value cache with hit/miss counters. Subclasses store the data.
+
+    Every delete() bumps the key's generation. A caller filling the cache
+    from the database reads generation(key) before its query and passes it
+    to set(), which then stores nothing if the key was invalidated in the
+    meantime: a read that started before a write cannot cache what the
+    write replaced.
+    """
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0  # set() calls skipped because the key was invalidated
+
+    async def _get(self, key: str) -> Any | None:
+        raise NotImplementedError
+
+    async def generation(self, key: str) -> Any:
+        """The key's generation, to pass to set() after reading the value from the database."""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, generation: Any = None) -> None:
+        """Stores the value; with `generation`, only if the key has not been invalidated since."""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Drops the entry and bumps the key's generation."""
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Any | None:
+        """Returns the cached value, or None on a miss."""
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "dropped": self.dropped,
+        }
+
+
+class MemoryCache(Cache):
+    """In-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 10_000):
+        super().__init__(name, ttl)
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        # Generations of the most recently invalidated keys, numbered from one
+        # counter; a key with none has the highest generation forgotten, so
+        # forgetting one can only make set() skip, never store stale data
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._invalidations = 0
+        self._forgotten = 0
+
+    async def _get(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def generation(self, key: str) -> int:
+        return self._generations.get(key, self._forgotten)
+
+    async def set(self, key: str, value: Any, generation: Any = None) -> None:
+        if generation is not None and self._generations.get(key, self._forgotten) != generation:
+            self.dropped += 1
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+        self._invalidations += 1
+        self._generations[key] = self._invalidations
+        self._generations.move_to_end(key)
+        while len(self._generations) > self.maxsize:
+            self._forgotten = self._generations.popitem(last=False)[1]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "size": len(self._data), "maxsize": self.maxsize}
+
+
+# Both run atomically in the store. KEYS: the entry, its generation.
+SET_IF_GENERATION_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[2] then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[1])
+return 1
+"""
+# How long a generation outlives its last bump; far longer than any query
+GENERATION_TTL_SECONDS = 3600
+
+
+class SharedCache(Cache):
+    """
+    Cache kept in a shared store so every worker sees the same entries and
+    invalidations. `store` needs async get(key), set(key, value, ex=seconds)
+    and register_script(), as redis.asyncio.Redis provides. Without an
+    explicit store, the module-wide one (see set_shared_store) is used.
+    """
+
+    def __init__(self, name: str, ttl: float, store: Any = None):
+        super().__init__(name, ttl)
+        self._store = store
+
+    @property
+    def store(self) -> Any:
+        return self._store if self._store is not None else _get_shared_store()
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.name}-generation:{key}"
+
+    async def _get(self, key: str) -> Any | None:
+        raw = await self.store.get(self._key(key))
+        return None if raw is None else json.loads(raw)
+
+    async def generation(self, key: str) -> str:
+        raw = await self.store.get(self._generation_key(key))
+        if raw is None:
+            return "0"
+        return raw.decode() if isinstance(raw, bytes) else str(raw)
+
+    async def set(self, key: str, value: Any, generation: Any = None) -> None:
+        ex = max(1, int(self.ttl))
+        if generation is None:
+            await self.store.set(self._key(key), json.dumps(value), ex=ex)
+            return
+        stored = await self.store.register_script(SET_IF_GENERATION_SCRIPT)(
+            keys=[self._key(key), self._generation_key(key)], args=[json.dumps(value), generation, ex],
+        )
+        if not int(stored):
+            self.dropped += 1
+
+    async def delete(self, key: str) -> None:
+        await self.store.register_script(INVALIDATE_SCRIPT)(
+            keys=[self._key(key), self._generation_key(key)], args=[GENERATION_TTL_SECONDS],
+        )
+
+
+_shared_store: Any = None
+
+
+def _get_shared_store() -> Any:
+    global _shared_store
+    if _shared_store is None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as err:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package.") from err
+        _shared_store = redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    return _shared_store
+
+
+def set_shared_store(store: Any) -> None:
+    """Uses `store` for shared caches, e.g. a local fake in tests or benchmarks."""
+    global _shared_store
+    _shared_store = store
+
+
+def make_cache(name: str, ttl: float, maxsize: int) -> Cache:
+    """Builds a cache on the backend picked by CACHE_BACKEND (memory or redis)."""
+    if os.environ.get("CACHE_BACKEND", "memory") == "redis":
+        return SharedCache(name, ttl)
+    return MemoryCache(name, ttl, maxsize)
@@ -0,0 +1,174 @@
+import logging
+import os
+import zlib
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Parses Accept-Encoding into {coding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        import brotli
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing JSON/NDJSON/text responses with brotli or
+    gzip, whichever the client accepts and comes first in `encodings`.
+    Complete bodies under `minimum_size` bytes are sent as is. Streamed
+    bodies are compressed chunk by chunk and flushed after each one, so
+    NDJSON consumers still see lines as they are produced. ETags on
+    compressed responses become weak, since the bytes differ from the
+    identity representation they were computed on.
+    """
+
+    def __init__(self, app: Any, encodings: Tuple[str, ...] = ("br", "gzip"), minimum_size: int = 1024,
+                 gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        if "br" in encodings:
+            try:
+                import brotli  # noqa: F401
+            except ImportError:
+                logger.warning("Brotli compression needs the 'brotli' package; offering gzip only.")
+                encodings = tuple(e for e in encodings if e != "br")
+        self.encodings = encodings
+
+    def _choose(self, scope: Dict[str, Any]) -> str | None:
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accepted = _accepted(value.decode("latin-1"))
+                for encoding in self.encodings:
+                    if accepted.get(encoding, accepted.get("*", 0)) > 0:
+                        return encoding
+        return None
+
+    def _compressor(self, encoding: str) -> Any:
+        return _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.gzip_level)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose(scope)
+        start_message: Dict[str, Any] | None = None
+        compressor: Any = None
+        passthrough = False
+
+        async def send_compressed(message: Dict[str, Any]) -> None:
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if not content_type.startswith(COMPRESSIBLE_TYPES) or b"content-encoding" in headers:
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Wait for the first body chunk to decide
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers: List[Tuple[bytes, bytes]] = [
+                    (k, v) for k, v in start_message.get("headers", []) if k.lower() != b"vary"
+                ]
+                vary = [v for k, v in start_message.get("headers", []) if k.lower() == b"vary"]
+                headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+                if encoding is None or (not more_body and len(body) < self.minimum_size):
+                    start_message["headers"] = headers
+                    await send(start_message)
+                    start_message = None
+                    passthrough = True
+                    await send(message)
+                    return
+
+                compressor = self._compressor(encoding)
+                rewritten = []
+                for k, v in headers:
+                    if k.lower() == b"content-length":
+                        continue
+                    if k.lower() == b"etag" and not v.startswith(b"W/"):
+                        v = b"W/" + v
+                    rewritten.append((k, v))
+                rewritten.append((b"content-encoding", encoding.encode()))
+                if not more_body:
+                    compressed = compressor.compress(body) + compressor.finish()
+                    rewritten.append((b"content-length", str(len(compressed)).encode()))
+                    start_message["headers"] = rewritten
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                start_message["headers"] = rewritten
+                await send(start_message)
+                start_message = None
+
+            if more_body:
+                chunk = compressor.compress(body) + compressor.flush()
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.compress(body) + compressor.finish()})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def compression_from_env() -> Dict[str, Any]:
+    """Middleware options from COMPRESSION_* settings; COMPRESSION_ENCODINGS="" turns it off."""
+    encodings = os.environ.get("COMPRESSION_ENCODINGS", "br,gzip")
+    return {
+        "encodings": tuple(e.strip() for e in encodings.split(",") if e.strip()),
+        "minimum_size": int(os.environ.get("COMPRESSION_MIN_SIZE", "1024")),
+        "gzip_level": int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6")),
+        "brotli_quality": int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4")),
+    }
@@ -0,0 +1,40 @@
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag derived from the response body bytes."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match covers `etag`."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def conditional_response(request: Request, body: bytes, media_type: str = "application/json") -> Response:
+    """
+    Tags already-serialized `body` with a content-hash ETag and answers
+    304 Not Modified with no body when the client already holds it.
+    """
+    etag = etag_for(body)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def conditional_json(request: Request, data: Any) -> Response:
+    """conditional_response() for data that still needs serializing."""
+    return conditional_response(request, JSONResponse(jsonable_encoder(data)).body)
@@ -1,300 +1,906 @@
-import bcrypt
-import json
+import asyncio
+import collections
+import httpx
+import importlib
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from postgrest.exceptions import APIError 
-from typing import Dict, Any, List
+from pydantic import ValidationError
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Any, List, Sequence
+import logging
+from .blobs import blob_storage_from_env
+from .breaker import BackendUnavailable, GuardedRepository, breaker_from_env
+from .cache import make_cache
+from .hashing import HashingOverloaded, get_hashing_service
+from .log import mask_email
+from .memory_repository import MemoryRepository
+from .metrics import instrumented
+from .schemas import ItineraryIn
+from .singleflight import single_flight_from_env
+from .repository import (
+    ITINERARY_COLUMNS, ITINERARY_SUMMARY_COLUMNS, SEARCH_DEFAULT_FIELDS, ItinerarySearch, PatchError, PatchOutcome,
+    Repository, RepositoryError,
+)
+from .supabase_repository import SupabaseRepository
+from .transport import build_http_client
 
+if TYPE_CHECKING:
+    from supabase import AsyncClient
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-url: str = os.environ.get("SUPABASE_URL") 
-key: str = os.environ.get("SUPABASE_KEY")
 
-if not url or not key:
-    raise EnvironmentError("SUPABASE_URL or SUPABASE_KEY environment variables not set.")
+# Importing this module does no I/O and needs no configuration. Every
+# query goes through a Repository (src/repository.py), picked by
+# DB_BACKEND: "supabase" (default), "postgres" (asyncpg straight to the
+# database, see src/postgres_repository.py) or "memory" (in-process, for
+# offline runs). The Supabase client is created by init_client(), which the
+# FastAPI lifespan starts at startup; scripts that skip the lifespan get
+# it on first use. set_repository() swaps in any other implementation,
+# and set_client() anything exposing the Supabase table()/.../execute()
+# chain, e.g. a local stand-in for tests or benchmarks.
+# get_repository() hands out the repository behind `breaker`
+# (src/breaker.py): once the backend keeps failing, calls raise
+# BackendUnavailable at once, which propagates to main.py as a 503.
+# With ITINERARY_STORAGE=blob, itinerary payloads go through
+# src/blobs.py's content-addressed storage on the way.
+url: str | None = None
+key: str | None = None
+supabase: "AsyncClient | None" = None
+_http_client: httpx.AsyncClient | None = None
+_client_lock = asyncio.Lock()
+_init_error: str | None = None
+_repository: Repository | None = None
+_guarded: GuardedRepository | None = None
+_guarded_backend: Repository | None = None
+breaker = breaker_from_env("backend")
 
-try:
-    supabase: Client = create_client(url, key)
-    print("Supabase client initialized.")
-except Exception as e:
-    print(f"Error initializing Supabase client: {e}")
-    # In a real app, you might want to exit or fail startup here
-    supabase = None 
 
+async def init_client(**transport_overrides: Any) -> "AsyncClient":
+    """Creates the Supabase client on a pooled keep-alive HTTP transport."""
+    global supabase, _http_client, _init_error, url, key
+    async with _client_lock:
+        if supabase is None:
+            try:
+                load_dotenv()
+                url = url or os.environ.get("SUPABASE_URL")
+                key = key or os.environ.get("SUPABASE_KEY")
+                if not url or not key:
+                    raise EnvironmentError("SUPABASE_URL or SUPABASE_KEY environment variables not set.")
 
+                # Deferred, and off the event loop: the supabase package is slow to import
+                supabase_module = await asyncio.to_thread(importlib.import_module, "supabase")
 
+                _http_client = build_http_client(**transport_overrides)
+                supabase = await supabase_module.acreate_client(
+                    url, key, supabase_module.AsyncClientOptions(httpx_client=_http_client)
+                )
+                _init_error = None
+                logger.info("Supabase client initialized.")
+            except Exception as e:
+                _init_error = str(e)
+                if _http_client is not None:
+                    await _http_client.aclose()
+                    _http_client = None
+                logger.error("Error initializing Supabase client: %s", e)
+                raise
+    return supabase
 
-def password_hash_function(pwd: str) -> str:
-   """Hashes a plaintext password using bcrypt."""
-   salt = bcrypt.gensalt()
-   hashed_bytes = bcrypt.hashpw(pwd.encode('utf-8'), salt)
-   return hashed_bytes.decode('utf-8')
 
+def backend_state() -> Dict[str, Any]:
+    """Reports whether the backend is ready, for the readiness probe."""
+    if _repository is not None:
+        return {"state": "ready", "backend": type(_repository).__name__}
+    if supabase is not None:
+        return {"state": "ready", "backend": type(supabase).__name__}
+    if _client_lock.locked():
+        return {"state": "initializing"}
+    if _init_error is not None:
+        return {"state": "error", "error": _init_error}
+    return {"state": "uninitialized"}
 
 
-def check_user_credentials(email: str, password: str) -> int | None:
+async def init_postgres() -> Repository:
+    """Connects the asyncpg pool for DB_BACKEND=postgres."""
+    global _repository, _init_error
+    async with _client_lock:
+        if _repository is None:
+            try:
+                load_dotenv()
+                try:
+                    from .postgres_repository import postgres_repository_from_env
+                except ImportError as err:
+                    raise RuntimeError("DB_BACKEND=postgres requires the 'asyncpg' package.") from err
+                _repository = await postgres_repository_from_env()
+                _init_error = None
+                logger.info("Postgres pool initialized.")
+            except Exception as e:
+                _init_error = str(e)
+                logger.error("Error initializing Postgres pool: %s", e)
+                raise
+    return _repository
+
+
+async def close_client() -> None:
+    """Drops the client (and the repository over it) and closes its pooled connections."""
+    global supabase, _http_client, _repository
+    async with _client_lock:
+        supabase = None
+        if _repository is not None and not isinstance(_repository, MemoryRepository):
+            await _repository.close()
+            _repository = None
+        if _http_client is not None:
+            await _http_client.aclose()
+            _http_client = None
+
+
+async def get_client() -> "AsyncClient":
+    """Returns the shared async Supabase client, creating it on first use."""
+    if supabase is None:
+        return await init_client()
+    return supabase
+
+
+def set_client(client: Any) -> None:
+    """Replaces the backend client used by every data-access function."""
+    global supabase, _repository
+    supabase = client
+    _repository = SupabaseRepository(client)
+
+
+async def _backend_repository() -> Repository:
+    global _repository
+    if _repository is None:
+        backend = os.environ.get("DB_BACKEND", "supabase")
+        if backend == "memory":
+            _repository = MemoryRepository()
+        elif backend == "postgres":
+            return await init_postgres()
+        else:
+            _repository = SupabaseRepository(await get_client())
+    return _repository
+
+
+async def get_repository() -> Repository:
+    """
+    Returns the repository every data-access function queries, behind the
+    circuit breaker and the configured itinerary storage, creating it on
+    first use.
+    """
+    global _guarded, _guarded_backend
+    repository = await _backend_repository()
+    if _guarded is None or _guarded_backend is not repository:
+        _guarded = GuardedRepository(blob_storage_from_env(repository), breaker)
+        _guarded_backend = repository
+    return _guarded
+
+
+def set_repository(repository: Repository) -> None:
+    """Replaces the repository used by every data-access function."""
+    global _repository
+    _repository = repository
+
+
+# email -> customer_id, so itinerary writes skip the customers lookup.
+# Invalidated by update_customer_field (email changes) and delete_user.
+customer_id_cache = make_cache(
+    "customer_id",
+    ttl=float(os.environ.get("CUSTOMER_ID_CACHE_TTL", "300")),
+    maxsize=int(os.environ.get("CUSTOMER_ID_CACHE_SIZE", "10000")),
+)
+
+# email -> get_customer_details() result. Written through on every customer
+# write: create_user, update_customer_field and delete_user drop the entry.
+customer_details_cache = make_cache(
+    "customer_details",
+    ttl=float(os.environ.get("CUSTOMER_DETAILS_CACHE_TTL", "60")),
+    maxsize=int(os.environ.get("CUSTOMER_DETAILS_CACHE_SIZE", "10000")),
+)
+
+# Concurrent identical reads share one backend call (src/singleflight.py),
+# keyed by email. Writes through the email-keyed functions forget the key,
+# so callers arriving after a write never join a call that started before
+# it. customer_id-keyed writes cannot, so a get_all_itineraries() joining
+# an earlier call may miss them; it is no older than a call of its own
+# started at that moment would have been.
+customer_details_flight = single_flight_from_env("customer_details")
+all_itineraries_flight = single_flight_from_env("all_itineraries")
+
+
+async def resolve_customer_id(repo: Repository, email: str) -> int | None:
+    """Maps an email to its customer_id, using the cache before the database."""
+    cid = await customer_id_cache.get(email)
+    if cid is not None:
+        return cid
+
+    # Read before the query: an email change or delete committed while it
+    # runs bumps the generation, and the old mapping is not cached
+    generation = await customer_id_cache.generation(email)
+    row = await repo.find_customer(email, ["customer_id"])
+    if row is None:
+        return None
+
+    cid = row['customer_id']
+    await customer_id_cache.set(email, cid, generation)
+    return cid
+
+
+
+
+async def password_hash_function(pwd: str) -> str:
+   """Hashes a plaintext password using bcrypt on the hashing pool."""
+   return await get_hashing_service().hash_password(pwd)
+
+
+
+@instrumented
+async def check_user_credentials(email: str, password: str) -> int | None:
     """
-    Fetches user hash and verifies password. 
+    Fetches user hash and verifies password.
     Returns customer_id on success, None otherwise.
     """
     try:
+        repo = await get_repository()
+
+        user_data = await repo.find_customer(email, ["customer_id", "password_hash"])
+
+        if user_data is None:
+            logger.info("Auth: No user found with email %s.", mask_email(email))
+            return None
 
-        response = (
-            supabase.table("customers")
-            .select("customer_id, password_hash") 
-            .eq("email", email)
-            .limit(1)
-            .execute()
-        )
-        
-        if not response.data:
-            print(f"Auth Error: No user found with email '{email}'.")
-            return None 
-
-        user_data = response.data[0]
         customer_id, stored_hash = user_data['customer_id'], user_data['password_hash']
-        
 
-        if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
-            print(f"Auth Success: User '{email}' verified. ID: {customer_id}")
-            return customer_id 
+
+        if await get_hashing_service().check_password(password, stored_hash):
+            logger.info("Auth: User %s verified. ID: %s", mask_email(email), customer_id, extra={"sample": True})
+            return customer_id
         else:
-            print(f"Auth Error: Invalid password for user '{email}'.")
+            logger.warning("Auth: Invalid password for user %s.", mask_email(email))
             return None
 
-    except APIError as err:
-        print(f"Supabase API Error during auth: {err.message}")
+    except (HashingOverloaded, BackendUnavailable):
+        raise
+    except RepositoryError as err:
+        logger.error("Database error during auth: %s", err.message)
         return None
-    except Exception as err:
-        print(f"Unexpected Error during auth: {err}")
+    except Exception:
+        logger.exception("Unexpected error during auth")
         return None
 
-def create_user(firstname: str, lastname: str, email: str, password: str) -> bool:
+@instrumented
+async def create_user(firstname: str, lastname: str, email: str, password: str) -> bool:
     """Creates a new user record."""
-    password_hash = password_hash_function(password)
+    password_hash = await password_hash_function(password)
     try:
-        response = (
-            supabase.table("customers")
-            .insert({
-                "first_name": firstname, 
-                "last_name": lastname, 
-                "email": email, 
-                "password_hash": password_hash
-            })
-            .execute()
-        )
-        print(f"User '{email}' created successfully. ID: {response.data[0]['customer_id']}")
+        repo = await get_repository()
+        customer_id = await repo.insert_customer({
+            "first_name": firstname,
+            "last_name": lastname,
+            "email": email,
+            "password_hash": password_hash
+        })
+        await customer_details_cache.delete(email)
+        customer_details_flight.forget(email)
+        logger.info("User %s created successfully. ID: %s", mask_email(email), customer_id, extra={"sample": True})
         return True
-    
-    except APIError as err:
-        print(f"Supabase API Error creating user: {err.message}")
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error creating user: %s", err.message)
 
         return False
-    except Exception as err:
-        print(f"Unexpected Error creating user: {err}")
+    except Exception:
+        logger.exception("Unexpected error creating user")
         return False
 
-def update_customer_field(identifier_value: str, field_to_update: str, new_value: Any) -> bool:
+@instrumented
+async def update_customer_field(identifier_value: str, field_to_update: str, new_value: Any) -> bool:
     """Updates a single field for a user identified by email."""
     allowed_update_fields = ['first_name', 'last_name', 'email', 'password_hash']
     if field_to_update not in allowed_update_fields:
-        print(f"Error: Updating the field '{field_to_update}' is not allowed.")
+        logger.warning("Updating the field %s is not allowed.", field_to_update)
         return False
-        
+
     try:
-        update_data = {field_to_update: new_value}
-        
-        response = (
-            supabase.table("customers")
-            .update(update_data)
-            .eq("email", identifier_value)
-            .execute()
-        )
-        
-        if response.count is not None and response.count > 0:
-            print(f"Success: Updated '{field_to_update}' for user {identifier_value}.")
-            return True
-        elif response.data:
-            # Fallback check for update response structure
-            print(f"Success: Updated '{field_to_update}' for user {identifier_value}.")
+        repo = await get_repository()
+        updated = await repo.update_customer(identifier_value, {field_to_update: new_value})
+        if field_to_update == 'email':
+            await customer_id_cache.delete(identifier_value)
+            await customer_details_cache.delete(new_value)
+            customer_details_flight.forget(new_value)
+            all_itineraries_flight.forget(identifier_value)
+            all_itineraries_flight.forget(new_value)
+        await customer_details_cache.delete(identifier_value)
+        customer_details_flight.forget(identifier_value)
+
+        if updated > 0:
+            logger.info("Updated %s for user %s.", field_to_update, mask_email(identifier_value), extra={"sample": True})
             return True
         else:
-            print(f"Notice: No user found with email {identifier_value}. Nothing updated.")
+            logger.info("No user found with email %s. Nothing updated.", mask_email(identifier_value))
             return False
 
-    except APIError as err:
-        print(f"Supabase API Error updating field: {err.message}")
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error updating field: %s", err.message)
         return False
-    except Exception as err:
-        print(f"Unexpected Error updating field: {err}")
+    except Exception:
+        logger.exception("Unexpected error updating field")
         return False
 
-def get_customer_details(email: str) -> Dict[str, Any] | None:
-    """Fetches a customer's non-sensitive details."""
+async def _fetch_customer_details(email: str) -> Dict[str, Any] | None:
+    repo = await get_repository()
+    # A customer write committed while the query runs evicts the entry and
+    # bumps this generation, so the row read before it is not cached
+    generation = await customer_details_cache.generation(email)
+    customer_data = await repo.find_customer(email, ["first_name", "last_name", "email"])
+    if customer_data is not None:
+        await customer_details_cache.set(email, customer_data, generation)
+    return customer_data
+
+@instrumented
+async def get_customer_details(email: str) -> Dict[str, Any] | None:
+    """
+    Fetches a customer's non-sensitive details, served from cache when
+    possible. Concurrent misses for the same email share one query.
+    """
     try:
-        response = (
-            supabase.table("customers")
-            .select("first_name, last_name, email")
-            .eq("email", email)
-            .limit(1)
-            .execute()
-        )
-        
-        if response.data:
-            customer_data = response.data[0]
-            print("Customer Found:", customer_data)
+        customer_data = await customer_details_cache.get(email)
+        if customer_data is not None:
+            return customer_data
+
+        customer_data = await customer_details_flight.do(email, lambda: _fetch_customer_details(email))
+
+        if customer_data is not None:
+            logger.info("Customer found: %s", mask_email(email), extra={"sample": True})
             return customer_data
         else:
-            print("No customer found with that email.")
+            logger.info("No customer found for %s.", mask_email(email))
             return None
-        
-    except APIError as err:
-        print(f"Supabase API Error getting details: {err.message}")
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error getting details: %s", err.message)
+        return None
+    except TimeoutError as err:
+        logger.error("Timed out getting details: %s", err)
         return None
-    except Exception as err:
-        print(f"Unexpected Error getting details: {err}")
+    except Exception:
+        logger.exception("Unexpected error getting details")
         return None
 
-def delete_user(email: str) -> bool:
+@instrumented
+async def delete_user(email: str) -> bool:
     """Deletes a user record."""
     try:
-        response = (
-            supabase.table("customers")
-            .delete()
-            .eq("email", email)
-            .execute()
-        )
-        
-        if response.count is not None and response.count > 0:
-            print(f"Successfully deleted user with email '{email}'.")
+        repo = await get_repository()
+        deleted = await repo.delete_customer(email)
+        await customer_id_cache.delete(email)
+        await customer_details_cache.delete(email)
+        customer_details_flight.forget(email)
+        all_itineraries_flight.forget(email)
+
+        if deleted > 0:
+            logger.info("Successfully deleted user with email %s.", mask_email(email), extra={"sample": True})
             return True
         else:
-            print(f"No user found with email '{email}'. Nothing deleted.")
+            logger.info("No user found with email %s. Nothing deleted.", mask_email(email))
             return False
-            
-    except APIError as err:
-        print(f"Supabase API Error deleting user: {err.message}")
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error deleting user: %s", err.message)
         return False
-    except Exception as err:
-        print(f"Unexpected Error deleting user: {err}")
+    except Exception:
+        logger.exception("Unexpected error deleting user")
         return False
 
 # --- Itinerary Functions ---
 
-def save_itinerary(email: str, itinerary_name: str, itinerary_data: Dict[str, Any]) -> bool:
+@instrumented
+async def save_itinerary(email: str, itinerary_name: str, itinerary_data: Dict[str, Any]) -> bool:
     """Saves a new itinerary linked to a customer's email."""
     try:
+        repo = await get_repository()
         # 1. Get customer_id
-        response_id = (
-            supabase.table("customers")
-            .select("customer_id")
-            .eq("email", email)
-            .limit(1)
-            .execute()
-        )
-        
-        if not response_id.data:
-            print(f"Error: No user found with email '{email}'. Cannot save itinerary.")
+        cid = await resolve_customer_id(repo, email)
+
+        if cid is None:
+            logger.info("No user found with email %s. Cannot save itinerary.", mask_email(email))
             return False
-            
-        cid = response_id.data[0]['customer_id']
-        
+
         # 2. Insert itinerary data
-        response_itinerary = (
-            supabase.table("itineraries")
-            .insert({
-                "customer_id": cid, 
-                "itinerary_name": itinerary_name, 
-                "itinerary_data": itinerary_data # Supabase handles dict -> JSONB
-            })
-            .execute()
-        )
-        
-        new_itinerary_id = response_itinerary.data[0]['itinerary_id']
-        print(f"Success: Saved itinerary '{itinerary_name}' (ID: {new_itinerary_id}) for user {email}.")
+        new_itinerary_id, = await repo.insert_itineraries([{
+            "customer_id": cid,
+            "itinerary_name": itinerary_name,
+            "itinerary_data": itinerary_data
+        }])
+        all_itineraries_flight.forget(email)
+
+        logger.info("Saved itinerary %s (ID: %s) for user %s.", itinerary_name, new_itinerary_id, mask_email(email), extra={"sample": True})
         return True
-            
-    except APIError as err:
-        print(f"Supabase API Error saving itinerary: {err.message}")
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error saving itinerary: %s", err.message)
         return False
-    except Exception as err:
-        print(f"Unexpected Error saving itinerary: {err}")
+    except Exception:
+        logger.exception("Unexpected error saving itinerary")
         return False
 
-def delete_itinerary(email: str) -> bool:
+@instrumented
+async def delete_itinerary(email: str) -> bool:
     """Deletes ALL itineraries associated with a user's email."""
     try:
+        repo = await get_repository()
         # 1. Get customer_id
-        sql_get_id = (
-            supabase.table("customers")
-            .select("customer_id")
-            .eq("email", email)
-            .limit(1)
-            .execute()
-        )
-        
-        if not sql_get_id.data:
-            print(f"Error: No user found with email '{email}'. Cannot delete itineraries.")
-            return False 
-        
-        customer_id = sql_get_id.data[0]['customer_id']
+        customer_id = await resolve_customer_id(repo, email)
+
+        if customer_id is None:
+            logger.info("No user found with email %s. Cannot delete itineraries.", mask_email(email))
+            return False
 
         # 2. Delete itineraries by customer_id
-        response_delete = (
-            supabase.table("itineraries")
-            .delete()
-            .eq("customer_id", customer_id)
-            .execute()
-        )
-
-        deleted_count = response_delete.count if response_delete.count is not None else len(response_delete.data)
-        
-        print(f"Success: Deleted {deleted_count} itinerary/itineraries for user '{email}'.")
+        deleted_ids = await repo.delete_itineraries(customer_id)
+        all_itineraries_flight.forget(email)
+
+        logger.info("Deleted %s itinerary/itineraries for user %s.", len(deleted_ids), mask_email(email), extra={"sample": True})
         return True
 
-    except APIError as err:
-        print(f"Supabase API Error deleting itineraries: {err.message}")
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error deleting itineraries: %s", err.message)
         return False
-    except Exception as err:
-        print(f"Unexpected Error deleting itineraries: {err}")
+    except Exception:
+        logger.exception("Unexpected error deleting itineraries")
         return False
 
 
-def get_all_itineraries(email: str) -> List[Dict[str, Any]] | None:
-    """Fetches all itineraries for a given user email using a join."""
+BULK_INSERT_CHUNK_SIZE = int(os.environ.get("BULK_INSERT_CHUNK_SIZE", "500"))
+
+
+def _validation_detail(err: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in err.errors()
+    )
+
+
+@instrumented
+async def save_itineraries(email: str, itineraries: List[Any]) -> List[Dict[str, Any]] | None:
+    """
+    Saves many itineraries for one user: resolves the customer once, then
+    inserts valid items in bulk (BULK_INSERT_CHUNK_SIZE rows per request).
+    Returns one result per input item, or None if the user does not exist.
+    """
+    results: List[Dict[str, Any]] = [{} for _ in itineraries]
+    rows, row_indexes = [], []
+    for index, item in enumerate(itineraries):
+        # The table's own constraints, checked per item: a row the database
+        # rejects would fail the whole chunk it is inserted with
+        if not isinstance(item, dict):
+            results[index] = {"index": index, "status": "error", "detail": "each itinerary must be a JSON object"}
+            continue
+        try:
+            itinerary = ItineraryIn.model_validate(item)
+        except ValidationError as err:
+            results[index] = {"index": index, "status": "error", "detail": _validation_detail(err)}
+            continue
+        rows.append({"itinerary_name": itinerary.itinerary_name, "itinerary_data": itinerary.itinerary_data})
+        row_indexes.append(index)
+
+    try:
+        repo = await get_repository()
+        cid = await resolve_customer_id(repo, email)
+        if cid is None:
+            logger.info("No user found with email %s. Cannot save itineraries.", mask_email(email))
+            return None
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error saving itineraries: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error saving itineraries")
+        return None
+
+    chunks = collections.deque(
+        (rows[start:start + BULK_INSERT_CHUNK_SIZE], row_indexes[start:start + BULK_INSERT_CHUNK_SIZE])
+        for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE)
+    )
+    while chunks:
+        chunk, chunk_indexes = chunks.popleft()
+        try:
+            new_ids = await repo.insert_itineraries([{"customer_id": cid, **row} for row in chunk])
+            for position, index in enumerate(chunk_indexes):
+                if position < len(new_ids):
+                    results[index] = {"index": index, "status": "created", "itinerary_id": new_ids[position]}
+                else:
+                    results[index] = {"index": index, "status": "error", "detail": "not saved"}
+        except BackendUnavailable:
+            # An outage fails the whole request (503), not just this chunk;
+            # chunks saved before it stay saved
+            all_itineraries_flight.forget(email)
+            raise
+        except RepositoryError as err:
+            if len(chunk) > 1:
+                # A row the checks above let through (say, a \u0000 that jsonb
+                # refuses) failed the chunk, which saved nothing: insert its
+                # rows one at a time so only that row reports the error
+                logger.warning("Bulk insert of %s itineraries failed (%s); retrying row by row.", len(chunk), err.message)
+                chunks.extendleft(reversed([([row], [index]) for row, index in zip(chunk, chunk_indexes)]))
+                continue
+            logger.error("Database error bulk-saving itineraries: %s", err.message)
+            results[chunk_indexes[0]] = {"index": chunk_indexes[0], "status": "error", "detail": err.message}
+        except Exception:
+            logger.exception("Unexpected error bulk-saving itineraries")
+            for index in chunk_indexes:
+                results[index] = {"index": index, "status": "error", "detail": "internal error"}
+
+    all_itineraries_flight.forget(email)
+    created = sum(1 for r in results if r["status"] == "created")
+    logger.info("Saved %s/%s itineraries for user %s.", created, len(itineraries), mask_email(email), extra={"sample": True})
+    return results
+
+
+@instrumented
+async def delete_itineraries_by_id(email: str, itinerary_ids: List[int]) -> List[int] | None:
+    """Deletes the listed itineraries owned by the user; returns the ids actually deleted."""
+    try:
+        repo = await get_repository()
+        customer_id = await resolve_customer_id(repo, email)
+        if customer_id is None:
+            logger.info("No user found with email %s. Cannot delete itineraries.", mask_email(email))
+            return None
+        if not itinerary_ids:
+            return []
+
+        deleted_ids = await repo.delete_itineraries(customer_id, itinerary_ids)
+        all_itineraries_flight.forget(email)
+        logger.info("Deleted %s itinerary/itineraries for user %s.", len(deleted_ids), mask_email(email), extra={"sample": True})
+        return deleted_ids
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error deleting itineraries: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error deleting itineraries")
+        return None
+
+
+async def _fetch_all_itineraries(email: str) -> List[Dict[str, Any]]:
+    repo = await get_repository()
+    cid = await customer_id_cache.get(email)
+    if cid is not None:
+        return await repo.list_itineraries(cid)
+    generation = await customer_id_cache.generation(email)
+    cid, itineraries_list = await repo.list_itineraries_by_email(email)
+    if cid is not None:
+        await customer_id_cache.set(email, cid, generation)
+    return itineraries_list
+
+
+@instrumented
+async def get_all_itineraries(email: str) -> List[Dict[str, Any]] | None:
+    """
+    Fetches all itineraries for a given user email. Filters on customer_id
+    directly when it is cached, otherwise joins through customers.
+    Concurrent calls for the same email share one query.
+    """
     try:
-        # Supabase API does the join via foreign key relationship in the 'select' string
-        sql_query = (
-            supabase.table("itineraries")
-            .select("itinerary_id, itinerary_name, itinerary_data, customers!inner(email)")
-            .eq("customers.email", email)
-            .order("itinerary_id", desc=True)
-            .execute()
-        )
-        
-        # The result includes the nested 'customers' field. We extract the core itinerary data.
-        itineraries_list = []
-        for item in sql_query.data:
-            # Clean the data to match the original function's output structure
-            clean_item = {
-                'itinerary_id': item['itinerary_id'],
-                'itinerary_name': item['itinerary_name'],
-                'itinerary_data': item['itinerary_data'],
-            }
-            itineraries_list.append(clean_item)
-        
+        itineraries_list = await all_itineraries_flight.do(email, lambda: _fetch_all_itineraries(email))
+
         if itineraries_list:
-            print(f"Found {len(itineraries_list)} itineraries for user '{email}'.")
+            logger.info("Found %s itineraries for user %s.", len(itineraries_list), mask_email(email), extra={"sample": True})
         else:
-            print(f"No itineraries found for user '{email}'.")
-            
+            logger.info("No itineraries found for user %s.", mask_email(email))
+
         return itineraries_list
 
-    except APIError as err:
-        print(f"Supabase API Error getting all itineraries: {err.message}")
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error getting all itineraries: %s", err.message)
+        return None
+    except TimeoutError as err:
+        logger.error("Timed out getting all itineraries: %s", err)
+        return None
+    except Exception:
+        logger.exception("Unexpected error getting all itineraries")
+        return None
+
+
+async def _itinerary_page(
+    repo: Repository, customer_id: int, limit: int, cursor: int | None, summary: bool
+) -> tuple[List[Dict[str, Any]], int | None]:
+    columns = ITINERARY_SUMMARY_COLUMNS if summary else ITINERARY_COLUMNS
+    # One extra row tells us whether another page follows
+    rows = await repo.list_itineraries(customer_id, columns, limit=limit + 1, before_id=cursor)
+
+    page = rows[:limit]
+    next_cursor = page[-1]['itinerary_id'] if len(rows) > limit else None
+    return page, next_cursor
+
+
+@instrumented
+async def list_itineraries(
+    email: str, limit: int = 20, cursor: int | None = None, summary: bool = False
+) -> tuple[List[Dict[str, Any]], int | None] | None:
+    """
+    Returns one page of a user's itineraries, newest first, plus the cursor
+    for the next page (None on the last page). Keyset pagination on
+    itinerary_id: pass the previous page's cursor to continue after it.
+    summary=True returns only id and name, without the itinerary_data JSON.
+    """
+    try:
+        repo = await get_repository()
+        customer_id = await resolve_customer_id(repo, email)
+        if customer_id is None:
+            logger.info("No user found with email %s. No itineraries to list.", mask_email(email))
+            return [], None
+
+        page, next_cursor = await _itinerary_page(repo, customer_id, limit, cursor, summary)
+        logger.info("Listed %s itineraries for user %s.", len(page), mask_email(email), extra={"sample": True})
+        return page, next_cursor
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error listing itineraries: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error listing itineraries")
+        return None
+
+
+@instrumented
+async def get_itinerary(email: str, itinerary_id: int) -> Dict[str, Any] | None:
+    """Fetches a single itinerary by id, only if it belongs to the given user."""
+    try:
+        repo = await get_repository()
+        customer_id = await resolve_customer_id(repo, email)
+        if customer_id is None:
+            logger.info("No user found with email %s. Cannot fetch itinerary.", mask_email(email))
+            return None
+
+        itinerary = await repo.get_itinerary(customer_id, itinerary_id)
+        if itinerary is not None:
+            return itinerary
+        logger.info("No itinerary %s found for user %s.", itinerary_id, mask_email(email))
+        return None
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error getting itinerary: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error getting itinerary")
+        return None
+
+
+async def iter_itinerary_pages(email: str, chunk_size: int = 200) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Yields a user's itineraries page by page (newest first), so callers can
+    stream them without holding the whole result set in memory.
+    Raises RuntimeError if a page cannot be fetched.
+    """
+    cursor = None
+    while True:
+        result = await list_itineraries(email, limit=chunk_size, cursor=cursor)
+        if result is None:
+            raise RuntimeError(f"Could not fetch itineraries page after cursor {cursor} for user '{email}'.")
+        page, cursor = result
+        if page:
+            yield page
+        if cursor is None:
+            return
+
+
+# --- customer_id-keyed functions, for callers holding a session token ---
+# These skip the email -> customer_id lookup (and the customers join) entirely.
+
+@instrumented
+async def save_itinerary_for_customer(customer_id: int, itinerary_name: str, itinerary_data: Dict[str, Any]) -> int | None:
+    """Saves a new itinerary for a customer_id; returns its itinerary_id."""
+    try:
+        repo = await get_repository()
+        new_itinerary_id, = await repo.insert_itineraries([{
+            "customer_id": customer_id,
+            "itinerary_name": itinerary_name,
+            "itinerary_data": itinerary_data
+        }])
+        logger.info("Saved itinerary %s (ID: %s) for customer %s.", itinerary_name, new_itinerary_id, customer_id, extra={"sample": True})
+        return new_itinerary_id
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error saving itinerary: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error saving itinerary")
+        return None
+
+
+@instrumented
+async def delete_itineraries_for_customer(customer_id: int) -> int | None:
+    """Deletes all of a customer's itineraries; returns how many were removed."""
+    try:
+        repo = await get_repository()
+        deleted_count = len(await repo.delete_itineraries(customer_id))
+        logger.info("Deleted %s itinerary/itineraries for customer %s.", deleted_count, customer_id, extra={"sample": True})
+        return deleted_count
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error deleting itineraries: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error deleting itineraries")
+        return None
+
+
+@instrumented
+async def get_all_itineraries_for_customer(customer_id: int) -> List[Dict[str, Any]] | None:
+    """Fetches all of a customer's itineraries, newest first."""
+    try:
+        repo = await get_repository()
+        itineraries_list = await repo.list_itineraries(customer_id)
+        logger.info("Found %s itineraries for customer %s.", len(itineraries_list), customer_id, extra={"sample": True})
+        return itineraries_list
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error getting all itineraries: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error getting all itineraries")
+        return None
+
+
+@instrumented
+async def list_itineraries_for_customer(
+    customer_id: int, limit: int = 20, cursor: int | None = None, summary: bool = False
+) -> tuple[List[Dict[str, Any]], int | None] | None:
+    """Same paging as list_itineraries(), keyed on customer_id."""
+    try:
+        repo = await get_repository()
+        return await _itinerary_page(repo, customer_id, limit, cursor, summary)
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error listing itineraries: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error listing itineraries")
+        return None
+
+
+@instrumented
+async def search_itineraries_for_customer(
+    customer_id: int, search: ItinerarySearch, fields: Sequence[str] = SEARCH_DEFAULT_FIELDS,
+    limit: int = 20, cursor: int | None = None
+) -> tuple[List[Dict[str, Any]], int | None] | None:
+    """
+    One page of the customer's itineraries matching `search`, newest first,
+    with only `fields` in each row, plus the cursor for the next page.
+    Filtering and projection happen in the database.
+    """
+    if "itinerary_id" not in fields:
+        # The cursor is the last row's id
+        fields = ("itinerary_id", *fields)
+    try:
+        repo = await get_repository()
+        rows = await repo.search_itineraries(customer_id, search, fields, limit=limit + 1, before_id=cursor)
+        page = rows[:limit]
+        next_cursor = page[-1]['itinerary_id'] if len(rows) > limit else None
+        logger.info("Search matched %s itineraries for customer %s.", len(page), customer_id, extra={"sample": True})
+        return page, next_cursor
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error searching itineraries: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error searching itineraries")
+        return None
+
+
+@instrumented
+async def get_itinerary_for_customer(customer_id: int, itinerary_id: int) -> Dict[str, Any] | None:
+    """Fetches a single itinerary by id, only if it belongs to the customer."""
+    try:
+        repo = await get_repository()
+        return await repo.get_itinerary(customer_id, itinerary_id)
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error getting itinerary: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error getting itinerary")
+        return None
+
+
+@instrumented
+async def patch_itinerary_for_customer(
+    customer_id: int, itinerary_id: int, expected_version: int, patch: Any, kind: str
+) -> PatchOutcome | None:
+    """
+    Applies a merge patch or JSON Patch (see src/json_patch.py) to one of
+    the customer's itineraries if it is still at expected_version. The
+    backend applies it, so only the patch travels. PatchError propagates
+    to the caller: it is the client's mistake, not a database failure.
+    """
+    try:
+        repo = await get_repository()
+        outcome = await repo.patch_itinerary(customer_id, itinerary_id, expected_version, patch, kind)
+        if outcome.applied:
+            logger.info("Patched itinerary %s to version %s for customer %s.", itinerary_id, outcome.version, customer_id, extra={"sample": True})
+        return outcome
+
+    except PatchError:
+        raise
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error patching itinerary: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error patching itinerary")
+        return None
+
+
+# --- Raw JSON passthrough: itinerary_data travels as the bytes the caller
+# sent / the backend returned, never decoded into Python objects and re-encoded ---
+
+@instrumented
+async def save_itinerary_raw_for_customer(customer_id: int, itinerary_name: str, itinerary_data: bytes) -> int | None:
+    """
+    Saves an itinerary whose data is already-encoded JSON (validated by the
+    caller); the bytes are handed to the backend unchanged.
+    """
+    try:
+        repo = await get_repository()
+        new_itinerary_id = await repo.insert_itinerary_raw(customer_id, itinerary_name, itinerary_data)
+        logger.info("Saved itinerary %s (ID: %s) for customer %s.", itinerary_name, new_itinerary_id, customer_id, extra={"sample": True})
+        return new_itinerary_id
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error saving itinerary: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error saving itinerary")
+        return None
+
+
+@instrumented
+async def get_itinerary_raw_for_customer(customer_id: int, itinerary_id: int) -> bytes | None:
+    """Returns one of a customer's itineraries as the JSON object bytes the backend sent."""
+    try:
+        repo = await get_repository()
+        return await repo.get_itinerary_raw(customer_id, itinerary_id)
+
+    except BackendUnavailable:
+        raise
+    except RepositoryError as err:
+        logger.error("Database error getting itinerary: %s", err.message)
+        return None
+    except Exception:
+        logger.exception("Unexpected error getting itinerary")
         return None
-    except Exception as err:
-        print(f"Unexpected Error getting all itineraries: {err}")
-        return None
\ No newline at end of file
@@ -0,0 +1,153 @@
+import asyncio
+import bcrypt
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hash pool is saturated and its wait queue is full."""
+
+
+def _hashpw(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password: bytes, stored_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, stored_hash)
+
+
+class HashingService:
+    """
+    Runs bcrypt off the event loop on a bounded thread or process pool.
+    At most `workers` hashes run at once and at most `queue_limit` wait
+    behind them; anything beyond that is rejected with HashingOverloaded.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int | None = None,
+                 queue_limit: int = 64, rounds: int = 12):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown hash pool kind '{kind}'.")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.rounds = rounds
+        self._executor: Executor | None = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0  # hashes that raised (e.g. a malformed stored hash)
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HashingOverloaded(
+                f"Hash pool saturated ({self.in_flight} in flight, limit {self.workers + self.queue_limit})."
+            )
+        self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            job = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        # The slot is held until the pool is done with the job, not until
+        # the caller stops waiting: cancelling the caller (a client that
+        # went away, a timeout) only cancels a job that has not started,
+        # and one already running keeps its worker busy until it ends
+        job.add_done_callback(lambda job: self._call_on(loop, self._finished, job, time.perf_counter() - start))
+        return await asyncio.wrap_future(job)
+
+    @staticmethod
+    def _call_on(loop: asyncio.AbstractEventLoop, callback: Callable[..., None], *args: Any) -> None:
+        # Done-callbacks run on a pool thread; the counters belong to the loop
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            pass  # the loop has closed, and its counters with it
+
+    def _finished(self, job: Future, elapsed: float) -> None:
+        self.in_flight -= 1
+        if job.cancelled():
+            return
+        if job.exception() is not None:
+            self.failed += 1
+            return
+        self.completed += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+
+    async def hash_password(self, password: str) -> str:
+        """Hashes a plaintext password with the configured cost factor."""
+        hashed = await self._submit(_hashpw, password.encode('utf-8'), self.rounds)
+        return hashed.decode('utf-8')
+
+    async def check_password(self, password: str, stored_hash: str) -> bool:
+        """Verifies a plaintext password against a stored bcrypt hash."""
+        return await self._submit(_checkpw, password.encode('utf-8'), stored_hash.encode('utf-8'))
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool saturation and per-hash latency counters."""
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "rounds": self.rounds,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "saturation": min(1.0, self.in_flight / self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_latency_ms": (self.total_seconds / self.completed * 1000) if self.completed else 0.0,
+            "max_latency_ms": self.max_seconds * 1000,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_service: HashingService | None = None
+
+
+def configure(**options: Any) -> HashingService:
+    """Replaces the shared service, e.g. to change pool size or bcrypt cost."""
+    global _service
+    if _service is not None:
+        _service.shutdown()
+    _service = HashingService(**options)
+    return _service
+
+
+def get_hashing_service() -> HashingService:
+    """Returns the shared service, built from BCRYPT_* environment variables."""
+    if _service is None:
+        pool_size = os.environ.get("BCRYPT_POOL_SIZE")
+        configure(
+            kind=os.environ.get("BCRYPT_POOL_KIND", "thread"),
+            workers=int(pool_size) if pool_size else None,
+            queue_limit=int(os.environ.get("BCRYPT_QUEUE_LIMIT", "64")),
+            rounds=int(os.environ.get("BCRYPT_ROUNDS", "12")),
+        )
+    return _service
+
+
+def shutdown() -> None:
+    global _service
+    if _service is not None:
+        _service.shutdown()
+        _service = None
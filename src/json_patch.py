@@ -0,0 +1,149 @@
+import copy
+import json
+import re
+from typing import Any, List
+
+from .repository import PatchError
+
+# RFC 7386 (JSON Merge Patch) and RFC 6902 (JSON Patch) over decoded JSON.
+# The database backends run the same logic as SQL functions
+# (db/migrations/0006_itinerary_patch.sql); the two must agree on results
+# and on which patches fail, which bench/check_patch_vectors.py checks
+# against the shared vectors in bench/patch_vectors.json.
+MERGE_PATCH = "merge"
+JSON_PATCH = "json-patch"
+# Content-Type of a PATCH body -> patch kind
+PATCH_MEDIA_TYPES = {"application/merge-patch+json": MERGE_PATCH, "application/json-patch+json": JSON_PATCH}
+OPERATIONS = ("add", "remove", "replace", "move", "copy", "test")
+# Array indexes are unsigned decimals without leading zeros
+_ARRAY_INDEX = re.compile(r"^(0|[1-9][0-9]*)$")
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """RFC 7386: objects merge key by key, null deletes a key, anything else replaces."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def check_operations(operations: Any) -> None:
+    """Raises PatchError unless `operations` is a well-formed RFC 6902 document."""
+    if not isinstance(operations, list):
+        raise PatchError("A JSON Patch must be an array of operations")
+    for operation in operations:
+        op = operation.get("op") if isinstance(operation, dict) else None
+        if op not in OPERATIONS:
+            # As the SQL functions read it (operation ->> 'op'): JSON text, or nothing for null
+            shown = op if isinstance(op, str) else "" if op is None else json.dumps(op)
+            raise PatchError(f'Unknown operation "{shown}"')
+        if not isinstance(operation.get("path"), str):
+            raise PatchError(f'Operation "{op}" needs a "path"')
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f'Operation "{op}" needs a "value"')
+        if op in ("move", "copy") and not isinstance(operation.get("from"), str):
+            raise PatchError(f'Operation "{op}" needs a "from"')
+
+
+def _path(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f'Invalid JSON pointer "{pointer}"')
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(token: str, upper_bound: int) -> int | None:
+    return int(token) if _ARRAY_INDEX.match(token) and int(token) <= upper_bound else None
+
+
+def _get(doc: Any, path: List[str], pointer: str) -> Any:
+    node = doc
+    for token in path:
+        if isinstance(node, dict) and token in node:
+            node = node[token]
+        elif isinstance(node, list) and _index(token, len(node) - 1) is not None:
+            node = node[int(token)]
+        else:
+            raise PatchError(f'Path "{pointer}" does not exist')
+    return node
+
+
+def _add(doc: Any, path: List[str], pointer: str, value: Any) -> Any:
+    if not path:
+        return value
+    parent = _get(doc, path[:-1], pointer)
+    if isinstance(parent, dict):
+        parent[path[-1]] = value
+    elif isinstance(parent, list):
+        index = len(parent) if path[-1] == "-" else _index(path[-1], len(parent))
+        if index is None:
+            raise PatchError(f'Invalid array index in "{pointer}"')
+        parent.insert(index, value)
+    else:
+        raise PatchError(f'Path "{pointer}" does not exist')
+    return doc
+
+
+def _remove(doc: Any, path: List[str], pointer: str) -> Any:
+    if not path:
+        raise PatchError("Cannot remove the whole document")
+    _get(doc, path, pointer)
+    parent = _get(doc, path[:-1], pointer)
+    del parent[path[-1] if isinstance(parent, dict) else int(path[-1])]
+    return doc
+
+
+def _equal(a: Any, b: Any) -> bool:
+    # JSON equality: true is not 1, and 1 is 1.0
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+def json_patch(doc: Any, operations: Any) -> Any:
+    """RFC 6902: applies the operations in order; any failure rejects the whole patch."""
+    check_operations(operations)
+    doc = copy.deepcopy(doc)
+    for operation in operations:
+        op, pointer = operation["op"], operation["path"]
+        path = _path(pointer)
+        value = copy.deepcopy(operation.get("value"))
+        if op in ("move", "copy"):
+            from_path = _path(operation["from"])
+            value = copy.deepcopy(_get(doc, from_path, operation["from"]))
+
+        if op in ("add", "copy"):
+            doc = _add(doc, path, pointer, value)
+        elif op == "remove":
+            doc = _remove(doc, path, pointer)
+        elif op == "replace":
+            _get(doc, path, pointer)
+            doc = _add(_remove(doc, path, pointer), path, pointer, value) if path else value
+        elif op == "move":
+            if len(path) > len(from_path) and path[:len(from_path)] == from_path:
+                raise PatchError(f'Cannot move "{operation["from"]}" into itself')
+            doc = _add(_remove(doc, from_path, operation["from"]), path, pointer, value)
+        elif not _equal(_get(doc, path, pointer), value):
+            raise PatchError(f'Test failed at "{pointer}"')
+    return doc
+
+
+def apply_patch(doc: Any, patch: Any, kind: str) -> Any:
+    """Applies a MERGE_PATCH or JSON_PATCH document to a copy of `doc`."""
+    if kind == MERGE_PATCH:
+        return merge_patch(doc, patch)
+    if kind == JSON_PATCH:
+        return json_patch(doc, patch)
+    raise PatchError(f'Unknown patch kind "{kind}"')
@@ -1,11 +1,76 @@
-from fastapi import FastAPI, Form, HTTPException, status
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from fastapi import Depends, FastAPI, Form, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from .db import create_user, update_customer_field, get_customer_details, check_user_credentials, delete_user, save_itinerary, delete_itinerary, get_all_itineraries
+from .db import create_user, update_customer_field, get_customer_details, check_user_credentials, delete_user, save_itinerary, save_itineraries, delete_itinerary, delete_itineraries_by_id, get_all_itineraries, list_itineraries, get_itinerary, iter_itinerary_pages
+from .db import save_itinerary_for_customer, delete_itineraries_for_customer, get_all_itineraries_for_customer, list_itineraries_for_customer, get_itinerary_for_customer
+from .db import save_itinerary_raw_for_customer, get_itinerary_raw_for_customer, search_itineraries_for_customer, patch_itinerary_for_customer
+from . import db, hashing, metrics
+from .log import RequestIdMiddleware, configure_logging, shutdown_logging
+from .breaker import BackendUnavailable
+from .json_patch import JSON_PATCH, PATCH_MEDIA_TYPES, check_operations
+from .compression import CompressionMiddleware, compression_from_env
+from .conditional import conditional_json, conditional_response
+from .metrics import MetricsMiddleware
+from .profiler import profiler_from_env
+from .repository import SEARCH_DEFAULT_FIELDS, SEARCH_FIELDS, ItinerarySearch, PatchError
+from .schemas import ItineraryIn
+from .ratelimit import RateLimited, throttle_from_env, trusted_proxies_from_env
+from .stale import StaleIfErrorMiddleware, stale_responses_from_env
+from .tokens import SESSION_TTL_SECONDS, current_customer_id, issue_token
 import json
+import math
+import logging
+import os
+import orjson
 from typing import Optional
 
 
-app = FastAPI(title="Web dev backend API")
+logger = logging.getLogger(__name__)
+# Sampling profiler for slow requests; None unless PROFILE_SLOW_REQUEST_MS is set
+profiler = profiler_from_env()
+# Per-IP and per-email budgets for endpoints that run bcrypt
+throttle = throttle_from_env()
+# Proxies whose X-Forwarded-For entries are believed when picking the client IP
+trusted_proxies = trusted_proxies_from_env()
+# Last good answers of read endpoints, served while the backend is failing
+stale_responses = stale_responses_from_env()
+
+
+async def _init_backend():
+    if os.environ.get("MIGRATE_ON_STARTUP", "false").lower() in ("1", "true", "yes"):
+        try:
+            from . import migrations
+            await migrations.upgrade_from_env()
+        except Exception:
+            logger.exception("Schema migration failed at startup.")
+    try:
+        await db.get_repository()
+    except Exception:
+        logger.warning("Backend not ready at startup; will retry on first use.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the backend client in the background so the server starts
+    # accepting connections (and passing /health) straight away. Requests
+    # that arrive before it is done wait for it in db.get_repository().
+    configure_logging()
+    if profiler is not None:
+        profiler.start()
+    init_task = asyncio.create_task(_init_backend())
+    yield
+    init_task.cancel()
+    if profiler is not None:
+        profiler.stop()
+    await db.close_client()
+    hashing.shutdown()
+    shutdown_logging()
+
+
+app = FastAPI(title="Web dev backend API", lifespan=lifespan)
 
 
 origins = [
@@ -14,13 +79,51 @@ origins = [
     "https://cis525-frontend.onrender.com",
 ]
 
+# Inside compression, so stale bodies are kept uncompressed and compressed on the way out
+app.add_middleware(StaleIfErrorMiddleware, responses=stale_responses)
+app.add_middleware(CompressionMiddleware, **compression_from_env())
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(MetricsMiddleware, profiler=profiler)
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.exception_handler(hashing.HashingOverloaded)
+async def hashing_overloaded_handler(request: Request, exc: hashing.HashingOverloaded):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry shortly."},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(BackendUnavailable)
+async def backend_unavailable_handler(request: Request, exc: BackendUnavailable):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Backend unavailable, please retry shortly."},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many attempts, please retry later."},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+def _client_ip(request: Request) -> str:
+    peer = request.client.host if request.client else None
+    return trusted_proxies.client_ip(peer, ",".join(request.headers.getlist("x-forwarded-for")))
 
     
 @app.get("/", status_code=status.HTTP_200_OK)
@@ -28,14 +131,75 @@ async def root():
     return {"message": "CRUD is working"}
 
 
+@app.get("/health", status_code=status.HTTP_200_OK)
+async def Health():
+    return {"status": "alive"}
+
+
+@app.get("/ready", status_code=status.HTTP_200_OK)
+async def Ready():
+    state = db.backend_state()
+    if state["state"] != "ready":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=state)
+    return state
+
+
+# circuit_breaker_state gauge values
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+@app.get("/metrics", status_code=status.HTTP_200_OK, include_in_schema=False)
+async def Metrics():
+    hash_stats = hashing.get_hashing_service().stats()
+    cache_stats = db.customer_id_cache.stats()
+    gauges = {
+        "bcrypt_pool_in_flight": hash_stats["in_flight"],
+        "bcrypt_pool_queued": hash_stats["queued"],
+        "bcrypt_pool_saturation": hash_stats["saturation"],
+        "bcrypt_hashes_completed": hash_stats["completed"],
+        "bcrypt_hashes_failed": hash_stats["failed"],
+        "bcrypt_hashes_rejected": hash_stats["rejected"],
+        "bcrypt_hash_avg_latency_seconds": hash_stats["avg_latency_ms"] / 1000,
+        "customer_id_cache_hits": cache_stats["hits"],
+        "customer_id_cache_misses": cache_stats["misses"],
+        "customer_details_cache_hits": db.customer_details_cache.hits,
+        "customer_details_cache_misses": db.customer_details_cache.misses,
+    }
+    for name, counts in throttle.stats().items():
+        gauges[f"rate_limit_{name}_allowed"] = counts["allowed"]
+        gauges[f"rate_limit_{name}_rejected"] = counts["rejected"]
+    for flight in (db.customer_details_flight, db.all_itineraries_flight):
+        for stat, value in flight.stats().items():
+            gauges[f"single_flight_{flight.name}_{stat}"] = value
+    breaker_stats = db.breaker.stats()
+    gauges["circuit_breaker_state"] = CIRCUIT_STATES[breaker_stats["state"]]
+    gauges["circuit_breaker_opened"] = breaker_stats["opened"]
+    gauges["circuit_breaker_rejected"] = breaker_stats["rejected"]
+    for stat, value in stale_responses.stats().items():
+        gauges[f"stale_responses_{stat}"] = value
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/hashing_stats", status_code=status.HTTP_200_OK)
+async def HashingStats():
+    return hashing.get_hashing_service().stats()
+
+
+@app.get("/cache_stats", status_code=status.HTTP_200_OK)
+async def CacheStats():
+    return {"customer_id": db.customer_id_cache.stats(), "customer_details": db.customer_details_cache.stats()}
+
+
 @app.post("/create_user", status_code=status.HTTP_201_CREATED)
 async def CreateUser(
+    request: Request,
     firstname: str = Form(),
     lastname: str = Form(),
     email: str = Form(),
     password: str = Form()
 ):
-    success = create_user(
+    await throttle.check(_client_ip(request))
+    success = await create_user(
         firstname=firstname,
         lastname=lastname,
         email=email,
@@ -57,7 +221,7 @@ async def UpdateCustomerField(
     field_to_update: str = Form(),
     new_value: str = Form()
 ):
-    success = update_customer_field( 
+    success = await update_customer_field( 
         identifier_value=identifier_value,
         field_to_update=field_to_update,
         new_value=new_value
@@ -73,13 +237,13 @@ async def UpdateCustomerField(
 
 
 @app.get("/get_customer_details", status_code=status.HTTP_200_OK)
-async def GetCustomerDetails(email: str):
+async def GetCustomerDetails(request: Request, email: str):
 
-    details = get_customer_details(
+    details = await get_customer_details(
         email=email
     )
     if details:
-        return details
+        return conditional_json(request, details)
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
@@ -88,8 +252,10 @@ async def GetCustomerDetails(email: str):
 
 
 @app.post("/auth", status_code=status.HTTP_200_OK) 
-async def AuthUser(email: str = Form(), password: str = Form()):
-    customer_id = check_user_credentials(
+async def AuthUser(request: Request, email: str = Form(), password: str = Form()):
+    # Rejected attempts never reach the database or the bcrypt pool
+    await throttle.check(_client_ip(request), email)
+    customer_id = await check_user_credentials(
         email=email,
         password=password
     )
@@ -100,12 +266,18 @@ async def AuthUser(email: str = Form(), password: str = Form()):
             detail="Invalid email or password"
         )
         
-    return {"customer_id": customer_id, "message": "Authentication successful"}
+    return {
+        "customer_id": customer_id,
+        "access_token": issue_token(customer_id),
+        "token_type": "bearer",
+        "expires_in": SESSION_TTL_SECONDS,
+        "message": "Authentication successful"
+    }
 
 
 @app.delete("/delete_user", status_code=status.HTTP_200_OK) 
 async def DeleteUser(email: str = Form()):
-    success = delete_user(
+    success = await delete_user(
         email=email
     )
     if success:
@@ -131,7 +303,7 @@ async def SaveItinerary(
             detail="Invalid JSON format for itinerary_data"
         )
 
-    success = save_itinerary(
+    success = await save_itinerary(
         email=email,
         itinerary_name=itinerary_name,
         itinerary_data=itinerary_data_dict
@@ -147,7 +319,7 @@ async def SaveItinerary(
 
 @app.delete("/delete_itinerary", status_code=status.HTTP_200_OK) 
 async def DeleteItinerary(email: str = Form()):
-    success = delete_itinerary(
+    success = await delete_itinerary(
         email=email
     )
     if success:
@@ -159,15 +331,439 @@ async def DeleteItinerary(email: str = Form()):
         )
 
 
+@app.post("/save_itineraries", status_code=status.HTTP_201_CREATED) 
+async def SaveItineraries(
+    email: str = Form(),
+    itineraries: str = Form()
+):
+    try:
+        itineraries_list = json.loads(itineraries)
+    except json.JSONDecodeError:
+        itineraries_list = None
+    if not isinstance(itineraries_list, list) or not itineraries_list:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="itineraries must be a non-empty JSON array"
+        )
+
+    results = await save_itineraries(
+        email=email,
+        itineraries=itineraries_list
+    )
+    if results is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail=f"Failed to save itineraries. Check if user '{email}' exists."
+        )
+    created = sum(1 for r in results if r["status"] == "created")
+    # 201 when every item was saved, 207 when only some were, 400 when none
+    # were; the body has a result per item either way
+    if created == len(results):
+        code = status.HTTP_201_CREATED
+    else:
+        code = status.HTTP_207_MULTI_STATUS if created else status.HTTP_400_BAD_REQUEST
+    return JSONResponse({"created": created, "failed": len(results) - created, "results": results}, status_code=code)
+
+
+@app.delete("/delete_itineraries", status_code=status.HTTP_200_OK) 
+async def DeleteItineraries(
+    email: str = Form(),
+    itinerary_ids: str = Form()
+):
+    try:
+        ids = json.loads(itinerary_ids)
+    except json.JSONDecodeError:
+        ids = None
+    # bool is an int subclass, so true/false are rejected by name; the cap
+    # keeps one request to one bounded ANY($2) array, like a bulk save chunk
+    if (
+        not isinstance(ids, list)
+        or len(ids) > db.BULK_INSERT_CHUNK_SIZE
+        or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail=f"itinerary_ids must be a JSON array of at most {db.BULK_INSERT_CHUNK_SIZE} integers"
+        )
+
+    deleted = await delete_itineraries_by_id(
+        email=email,
+        itinerary_ids=ids
+    )
+    if deleted is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail=f"Itinerary deletion failed. User '{email}' not found."
+        )
+    deleted_set = set(deleted)
+    return {"deleted": deleted, "not_found": [i for i in ids if i not in deleted_set]}
+
+
 @app.get("/get_all_itineraries", status_code=status.HTTP_200_OK)
-async def GetAllItineraries(email: str):
-    data = get_all_itineraries(
+async def GetAllItineraries(request: Request, email: str):
+    data = await get_all_itineraries(
         email=email
     )
     if data is not None:
-        return data
+        return conditional_json(request, data)
     else:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Could not retrieve itineraries due to an internal database error."
-        )
\ No newline at end of file
+        )
+
+
+@app.get("/list_itineraries", status_code=status.HTTP_200_OK)
+async def ListItineraries(
+    request: Request,
+    email: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = None,
+    summary: bool = False
+):
+    result = await list_itineraries(
+        email=email,
+        limit=limit,
+        cursor=cursor,
+        summary=summary
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Could not retrieve itineraries due to an internal database error."
+        )
+    itineraries, next_cursor = result
+    return conditional_json(request, {"itineraries": itineraries, "next_cursor": next_cursor})
+
+
+@app.get("/get_itinerary", status_code=status.HTTP_200_OK)
+async def GetItinerary(request: Request, email: str, itinerary_id: int):
+    data = await get_itinerary(
+        email=email,
+        itinerary_id=itinerary_id
+    )
+    if data is not None:
+        return conditional_json(request, data)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail=f"Itinerary {itinerary_id} not found for user '{email}'."
+        )
+
+
+@app.get("/export_itineraries", status_code=status.HTTP_200_OK)
+async def ExportItineraries(email: str, chunk_size: int = Query(200, ge=1, le=1000)):
+    pages = iter_itinerary_pages(email=email, chunk_size=chunk_size)
+    # Fetch the first page up front so a backend failure still gets a 500
+    # instead of an empty 200 stream.
+    try:
+        first_page = await anext(pages, [])
+    except RuntimeError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Could not retrieve itineraries due to an internal database error."
+        )
+
+    async def ndjson_lines():
+        page = first_page
+        while page:
+            yield "".join(json.dumps(item) + "\n" for item in page)
+            page = await anext(pages, [])
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+# --- Session-authenticated routes: identity comes from the bearer token
+# issued by /auth, so no email lookup is needed ---
+
+@app.post("/me/save_itinerary", status_code=status.HTTP_201_CREATED)
+async def SaveMyItinerary(
+    customer_id: int = Depends(current_customer_id),
+    itinerary_name: str = Form(),
+    itinerary_data: str = Form()
+):
+    try:
+        itinerary_data_dict = json.loads(itinerary_data)
+    except json.JSONDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Invalid JSON format for itinerary_data"
+        )
+
+    itinerary_id = await save_itinerary_for_customer(
+        customer_id=customer_id,
+        itinerary_name=itinerary_name,
+        itinerary_data=itinerary_data_dict
+    )
+    if itinerary_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Failed to save itinerary."
+        )
+    return {"itinerary_id": itinerary_id, "message": f"Itinerary '{itinerary_name}' saved successfully."}
+
+
+@app.delete("/me/delete_itinerary", status_code=status.HTTP_200_OK)
+async def DeleteMyItineraries(customer_id: int = Depends(current_customer_id)):
+    deleted = await delete_itineraries_for_customer(
+        customer_id=customer_id
+    )
+    if deleted is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Itinerary deletion failed due to an internal database error."
+        )
+    return {"deleted": deleted}
+
+
+@app.get("/me/get_all_itineraries", status_code=status.HTTP_200_OK)
+async def GetMyItineraries(request: Request, customer_id: int = Depends(current_customer_id)):
+    data = await get_all_itineraries_for_customer(
+        customer_id=customer_id
+    )
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Could not retrieve itineraries due to an internal database error."
+        )
+    return conditional_json(request, data)
+
+
+@app.get("/me/list_itineraries", status_code=status.HTTP_200_OK)
+async def ListMyItineraries(
+    request: Request,
+    customer_id: int = Depends(current_customer_id),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = None,
+    summary: bool = False
+):
+    result = await list_itineraries_for_customer(
+        customer_id=customer_id,
+        limit=limit,
+        cursor=cursor,
+        summary=summary
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Could not retrieve itineraries due to an internal database error."
+        )
+    itineraries, next_cursor = result
+    return conditional_json(request, {"itineraries": itineraries, "next_cursor": next_cursor})
+
+
+@app.get("/me/get_itinerary", status_code=status.HTTP_200_OK)
+async def GetMyItinerary(request: Request, itinerary_id: int, customer_id: int = Depends(current_customer_id)):
+    data = await get_itinerary_for_customer(
+        customer_id=customer_id,
+        itinerary_id=itinerary_id
+    )
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail=f"Itinerary {itinerary_id} not found."
+        )
+    return conditional_json(request, data)
+
+
+
+# --- v2: JSON bodies in, orjson out. Responses are built directly rather
+# than returned as dicts, which would send them through jsonable_encoder ---
+
+@app.post("/v2/me/itineraries", status_code=status.HTTP_201_CREATED, response_class=ORJSONResponse)
+async def CreateMyItineraryV2(itinerary: ItineraryIn, customer_id: int = Depends(current_customer_id)):
+    itinerary_id = await save_itinerary_for_customer(
+        customer_id=customer_id,
+        itinerary_name=itinerary.itinerary_name,
+        itinerary_data=itinerary.itinerary_data
+    )
+    if itinerary_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Failed to save itinerary."
+        )
+    return ORJSONResponse({"itinerary_id": itinerary_id}, status_code=status.HTTP_201_CREATED)
+
+
+@app.post("/v2/me/itineraries/raw", status_code=status.HTTP_201_CREATED, response_class=ORJSONResponse)
+async def CreateMyItineraryRawV2(
+    request: Request,
+    itinerary_name: str = Query(min_length=1),
+    customer_id: int = Depends(current_customer_id)
+):
+    """The request body is the itinerary_data object itself, forwarded to the backend as is."""
+    body = await request.body()
+    try:
+        # Only validates: the parsed object is dropped and the bytes sent on
+        valid = isinstance(orjson.loads(body), dict)
+    except orjson.JSONDecodeError:
+        valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Request body must be a JSON object"
+        )
+
+    itinerary_id = await save_itinerary_raw_for_customer(
+        customer_id=customer_id,
+        itinerary_name=itinerary_name,
+        itinerary_data=body
+    )
+    if itinerary_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Failed to save itinerary."
+        )
+    return ORJSONResponse({"itinerary_id": itinerary_id}, status_code=status.HTTP_201_CREATED)
+
+
+@app.get("/v2/me/itineraries", status_code=status.HTTP_200_OK, response_class=ORJSONResponse)
+async def ListMyItinerariesV2(
+    request: Request,
+    customer_id: int = Depends(current_customer_id),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = None,
+    summary: bool = False
+):
+    result = await list_itineraries_for_customer(
+        customer_id=customer_id,
+        limit=limit,
+        cursor=cursor,
+        summary=summary
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Could not retrieve itineraries due to an internal database error."
+        )
+    itineraries, next_cursor = result
+    return conditional_response(request, orjson.dumps({"itineraries": itineraries, "next_cursor": next_cursor}))
+
+
+# Declared before /v2/me/itineraries/{itinerary_id}, which would otherwise match "search"
+@app.get("/v2/me/itineraries/search", status_code=status.HTTP_200_OK, response_class=ORJSONResponse)
+async def SearchMyItinerariesV2(
+    request: Request,
+    customer_id: int = Depends(current_customer_id),
+    name: Optional[str] = Query(None, min_length=1, max_length=255),
+    match: str = Query("contains", pattern="^(contains|prefix)$"),
+    destination: Optional[str] = Query(None, min_length=1, max_length=255),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = None
+):
+    """
+    Filters by itinerary_name (substring or prefix, any case), by
+    itinerary_data's destination (any case) and by trips overlapping
+    [date_from, date_to] (itinerary_data's start_date/end_date). `fields`
+    is a comma-separated subset of SEARCH_FIELDS.
+    """
+    selected = SEARCH_DEFAULT_FIELDS if fields is None else tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in selected if f not in SEARCH_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail=f"fields must be a comma-separated subset of: {', '.join(SEARCH_FIELDS)}"
+        )
+
+    search = ItinerarySearch(
+        name=name,
+        name_prefix=match == "prefix",
+        destination=destination,
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=date_to.isoformat() if date_to else None
+    )
+    result = await search_itineraries_for_customer(
+        customer_id=customer_id,
+        search=search,
+        fields=selected,
+        limit=limit,
+        cursor=cursor
+    )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Could not search itineraries due to an internal database error."
+        )
+    itineraries, next_cursor = result
+    return conditional_response(request, orjson.dumps({"itineraries": itineraries, "next_cursor": next_cursor}))
+
+
+@app.get("/v2/me/itineraries/{itinerary_id}", status_code=status.HTTP_200_OK)
+async def GetMyItineraryV2(request: Request, itinerary_id: int, customer_id: int = Depends(current_customer_id)):
+    """Relays the backend's JSON bytes without decoding them."""
+    body = await get_itinerary_raw_for_customer(
+        customer_id=customer_id,
+        itinerary_id=itinerary_id
+    )
+    if body is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail=f"Itinerary {itinerary_id} not found."
+        )
+    return conditional_response(request, body)
+
+
+@app.patch("/v2/me/itineraries/{itinerary_id}", status_code=status.HTTP_200_OK, response_class=ORJSONResponse)
+async def PatchMyItineraryV2(
+    request: Request,
+    itinerary_id: int,
+    version: int = Query(ge=1),
+    customer_id: int = Depends(current_customer_id)
+):
+    """
+    Changes itinerary_data with a JSON Merge Patch (RFC 7386,
+    application/merge-patch+json) or a JSON Patch (RFC 6902,
+    application/json-patch+json) body. `version` is the version the client
+    last read (GET /v2/me/itineraries/{id}); a stale one gets 409 and
+    nothing changes. Returns the new version.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    kind = PATCH_MEDIA_TYPES.get(content_type)
+    if kind is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, 
+            detail=f"Content-Type must be one of: {', '.join(PATCH_MEDIA_TYPES)}",
+            headers={"Accept-Patch": ", ".join(PATCH_MEDIA_TYPES)}
+        )
+    try:
+        patch = orjson.loads(await request.body())
+        if kind == JSON_PATCH:
+            check_operations(patch)
+    except (orjson.JSONDecodeError, PatchError) as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail=f"Malformed patch document: {err}"
+        )
+
+    try:
+        outcome = await patch_itinerary_for_customer(
+            customer_id=customer_id,
+            itinerary_id=itinerary_id,
+            expected_version=version,
+            patch=patch,
+            kind=kind
+        )
+    except PatchError as err:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, 
+            detail=f"Patch does not apply: {err}"
+        )
+    if outcome is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Could not patch itinerary due to an internal database error."
+        )
+    if outcome.version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, 
+            detail=f"Itinerary {itinerary_id} not found."
+        )
+    if not outcome.applied:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, 
+            detail=f"Itinerary {itinerary_id} is at version {outcome.version}, not {version}; re-read it and retry."
+        )
+    return ORJSONResponse({"itinerary_id": itinerary_id, "version": outcome.version})
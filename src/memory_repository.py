@@ -0,0 +1,335 @@
+import asyncio
+import bisect
+from typing import Any, Dict, List, Sequence
+
+import orjson
+
+from .json_patch import apply_patch
+from .repository import (
+    BLOB_COLUMN, CUSTOMER_COLUMNS, ITINERARY_COLUMNS, ITINERARY_VERSIONED_COLUMNS, SEARCH_DEFAULT_FIELDS, SEARCH_FIELDS,
+    Blob, ItinerarySearch, PatchError, PatchOutcome, Repository, RepositoryError,
+)
+
+VARCHAR_LIMIT = 255
+
+
+def _check_varchar(row: Dict[str, Any], columns: Sequence[str]) -> None:
+    for column in columns:
+        if column not in row:
+            continue
+        value = row[column]
+        if value is None:
+            raise RepositoryError(f'null value in column "{column}" violates not-null constraint', "23502")
+        if len(str(value)) > VARCHAR_LIMIT:
+            raise RepositoryError(f"value too long for type character varying({VARCHAR_LIMIT})", "22001")
+
+
+def _check_columns(columns: Sequence[str], known: Sequence[str]) -> None:
+    for column in columns:
+        if column not in known:
+            raise RepositoryError(f'column "{column}" does not exist', "42703")
+
+
+def _json_text(value: Any) -> str:
+    # What ->> returns: strings as they are, anything else as JSON text
+    return value if isinstance(value, str) else orjson.dumps(value).decode()
+
+
+def _matches(search: ItinerarySearch, name: str, keys: Dict[str, str | None]) -> bool:
+    """search_itineraries()'s filters, with ILIKE's case folding."""
+    if search.name:
+        needle, name = search.name.lower(), name.lower()
+        if not (name.startswith(needle) if search.name_prefix else needle in name):
+            return False
+    if search.destination and (keys["destination"] is None or keys["destination"].lower() != search.destination.lower()):
+        return False
+    if search.date_from and (keys["end_date"] is None or keys["end_date"] < search.date_from):
+        return False
+    if search.date_to and (keys["start_date"] is None or keys["start_date"] > search.date_to):
+        return False
+    return True
+
+
+class MemoryRepository(Repository):
+    """
+    In-process repository following the schema of db/migrations: serial ids
+    that are never reused, NOT NULL and VARCHAR(255) checks, emails unique
+    regardless of case, itineraries
+    -> customers foreign key with ON DELETE CASCADE, itinerary_blob ->
+    itinerary_blobs foreign key, and itinerary_data
+    kept as encoded JSON text, so callers never share objects with the
+    store. Each statement is atomic. `latency` adds a sleep per call to
+    stand in for the network round trip.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._customers: Dict[int, Dict[str, Any]] = {}
+        self._customer_by_email: Dict[str, int] = {}
+        # lower(email) -> customer_id, the customers_email_lower_key index
+        self._customer_by_folded_email: Dict[str, int] = {}
+        self._itineraries: Dict[int, Dict[str, Any]] = {}
+        # customer_id -> that customer's itinerary ids, ascending
+        self._itinerary_ids: Dict[int, List[int]] = {}
+        self._sequences = {"customers": 0, "itineraries": 0}
+        self._blobs: Dict[str, Blob] = {}
+
+    async def _round_trip(self) -> None:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _nextval(self, table: str) -> int:
+        self._sequences[table] += 1
+        return self._sequences[table]
+
+    def _itinerary_out(self, row: Dict[str, Any], columns: Sequence[str]) -> Dict[str, Any]:
+        out = {}
+        for column in columns:
+            value = row[column]
+            if column == "itinerary_data":
+                value = None if value is None else orjson.loads(value)
+            out[column] = value
+        return out
+
+    def _store_itinerary(
+        self, itinerary_id: int, customer_id: int, itinerary_name: str, encoded: bytes | None, blob: str | None
+    ) -> None:
+        self._itineraries[itinerary_id] = {
+            "itinerary_id": itinerary_id,
+            "customer_id": customer_id,
+            "itinerary_name": itinerary_name,
+            "itinerary_data": encoded,
+            BLOB_COLUMN: blob,
+            "version": 1,
+        }
+        # Serial ids only grow, so appending keeps the list sorted
+        self._itinerary_ids.setdefault(customer_id, []).append(itinerary_id)
+
+    def _check_blob(self, digest: str | None) -> None:
+        if digest is not None and digest not in self._blobs:
+            raise RepositoryError(
+                'insert or update on table "itineraries" violates foreign key constraint "itineraries_itinerary_blob_fkey"',
+                "23503",
+            )
+
+    def _check_itinerary(self, row: Dict[str, Any]) -> None:
+        _check_columns(list(row), ITINERARY_COLUMNS + ("customer_id", BLOB_COLUMN))
+        if row.get("customer_id") is None:
+            raise RepositoryError('null value in column "customer_id" violates not-null constraint', "23502")
+        if row["customer_id"] not in self._customers:
+            raise RepositoryError(
+                'insert or update on table "itineraries" violates foreign key constraint "itineraries_customer_id_fkey"', "23503"
+            )
+        if "itinerary_name" not in row:
+            raise RepositoryError('null value in column "itinerary_name" violates not-null constraint', "23502")
+        _check_varchar(row, ["itinerary_name"])
+        self._check_blob(row.get(BLOB_COLUMN))
+
+    def _check_email_free(self, email: str, owner: int | None = None) -> None:
+        if email in self._customer_by_email and self._customer_by_email[email] != owner:
+            raise RepositoryError('duplicate key value violates unique constraint "customers_email_key"', "23505")
+        if self._customer_by_folded_email.get(email.lower(), owner) != owner:
+            raise RepositoryError('duplicate key value violates unique constraint "customers_email_lower_key"', "23505")
+
+    # --- customers ---
+    async def find_customer(self, email: str, columns: Sequence[str]) -> Dict[str, Any] | None:
+        await self._round_trip()
+        _check_columns(columns, CUSTOMER_COLUMNS)
+        cid = self._customer_by_email.get(email)
+        if cid is None:
+            return None
+        row = self._customers[cid]
+        return {column: row[column] for column in columns}
+
+    async def insert_customer(self, row: Dict[str, Any]) -> int:
+        await self._round_trip()
+        _check_columns(list(row), CUSTOMER_COLUMNS)
+        for column in CUSTOMER_COLUMNS[1:]:
+            if row.get(column) is None:
+                raise RepositoryError(f'null value in column "{column}" violates not-null constraint', "23502")
+        _check_varchar(row, CUSTOMER_COLUMNS[1:])
+        cid = self._nextval("customers")
+        self._check_email_free(row["email"])
+        self._customers[cid] = {**{c: row[c] for c in CUSTOMER_COLUMNS[1:]}, "customer_id": cid}
+        self._customer_by_email[row["email"]] = cid
+        self._customer_by_folded_email[row["email"].lower()] = cid
+        return cid
+
+    async def update_customer(self, email: str, fields: Dict[str, Any]) -> int:
+        await self._round_trip()
+        _check_columns(list(fields), CUSTOMER_COLUMNS[1:])
+        _check_varchar(fields, CUSTOMER_COLUMNS[1:])
+        cid = self._customer_by_email.get(email)
+        if cid is None:
+            return 0
+        new_email = fields.get("email", email)
+        if new_email != email:
+            self._check_email_free(new_email, cid)
+        self._customers[cid].update(fields)
+        if new_email != email:
+            del self._customer_by_email[email]
+            del self._customer_by_folded_email[email.lower()]
+            self._customer_by_email[new_email] = cid
+            self._customer_by_folded_email[new_email.lower()] = cid
+        return 1
+
+    async def delete_customer(self, email: str) -> int:
+        await self._round_trip()
+        cid = self._customer_by_email.pop(email, None)
+        if cid is None:
+            return 0
+        del self._customers[cid]
+        del self._customer_by_folded_email[email.lower()]
+        for itinerary_id in self._itinerary_ids.pop(cid, []):
+            del self._itineraries[itinerary_id]
+        return 1
+
+    # --- itineraries ---
+    async def insert_itineraries(self, rows: List[Dict[str, Any]]) -> List[int]:
+        await self._round_trip()
+        # Validate every row first: one bad row fails the whole statement
+        for row in rows:
+            self._check_itinerary(row)
+        encoded = [None if row.get("itinerary_data") is None else orjson.dumps(row["itinerary_data"]) for row in rows]
+        ids = []
+        for row, data in zip(rows, encoded):
+            itinerary_id = self._nextval("itineraries")
+            self._store_itinerary(itinerary_id, row["customer_id"], row["itinerary_name"], data, row.get(BLOB_COLUMN))
+            ids.append(itinerary_id)
+        return ids
+
+    async def delete_itineraries(self, customer_id: int, itinerary_ids: List[int] | None = None) -> List[int]:
+        await self._round_trip()
+        owned = self._itinerary_ids.get(customer_id, [])
+        if itinerary_ids is None:
+            doomed = list(owned)
+        else:
+            wanted = set(itinerary_ids)
+            doomed = [i for i in owned if i in wanted]
+        doomed_set = set(doomed)
+        self._itinerary_ids[customer_id] = [i for i in owned if i not in doomed_set]
+        for itinerary_id in doomed:
+            del self._itineraries[itinerary_id]
+        return doomed
+
+    async def list_itineraries(
+        self, customer_id: int, columns: Sequence[str] = ITINERARY_COLUMNS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        await self._round_trip()
+        _check_columns(columns, ITINERARY_COLUMNS + ("customer_id", BLOB_COLUMN))
+        ids = self._itinerary_ids.get(customer_id, [])
+        end = len(ids) if before_id is None else bisect.bisect_left(ids, before_id)
+        start = 0 if limit is None else max(0, end - limit)
+        return [self._itinerary_out(self._itineraries[i], columns) for i in reversed(ids[start:end])]
+
+    async def list_itineraries_by_email(
+        self, email: str, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> tuple[int | None, List[Dict[str, Any]]]:
+        _check_columns(columns, ITINERARY_COLUMNS + (BLOB_COLUMN,))
+        cid = self._customer_by_email.get(email)
+        if cid is None:
+            await self._round_trip()
+            return None, []
+        rows = await self.list_itineraries(cid, columns)
+        # Like the join, the customer_id only comes back alongside a row
+        return (cid if rows else None), rows
+
+    async def get_itinerary(
+        self, customer_id: int, itinerary_id: int, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> Dict[str, Any] | None:
+        await self._round_trip()
+        _check_columns(columns, ITINERARY_VERSIONED_COLUMNS + (BLOB_COLUMN,))
+        row = self._itineraries.get(itinerary_id)
+        if row is None or row["customer_id"] != customer_id:
+            return None
+        return self._itinerary_out(row, columns)
+
+    async def search_itineraries(
+        self, customer_id: int, search: ItinerarySearch, fields: Sequence[str] = SEARCH_DEFAULT_FIELDS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        await self._round_trip()
+        _check_columns(fields, SEARCH_FIELDS + (BLOB_COLUMN,))
+        ids = self._itinerary_ids.get(customer_id, [])
+        end = len(ids) if before_id is None else bisect.bisect_left(ids, before_id)
+        page = []
+        for itinerary_id in reversed(ids[:end]):
+            if limit is not None and len(page) == limit:
+                break
+            row = self._itinerary_out(self._itineraries[itinerary_id], ITINERARY_COLUMNS + (BLOB_COLUMN,))
+            # ->> yields text only for keys present; JSON null is SQL NULL
+            data = row["itinerary_data"] if isinstance(row["itinerary_data"], dict) else {}
+            keys = {key: None if data.get(key) is None else _json_text(data[key])
+                    for key in ("destination", "start_date", "end_date")}
+            if not _matches(search, row["itinerary_name"], keys):
+                continue
+            page.append({field: row[field] if field in row else keys[field] for field in fields})
+        return page
+
+    async def patch_itinerary(
+        self, customer_id: int, itinerary_id: int, expected_version: int, patch: Any, kind: str
+    ) -> PatchOutcome:
+        await self._round_trip()
+        row = self._itineraries.get(itinerary_id)
+        if row is None or row["customer_id"] != customer_id:
+            return PatchOutcome(None, False)
+        if row["version"] != expected_version:
+            return PatchOutcome(row["version"], False)
+        current = None if row["itinerary_data"] is None else orjson.loads(row["itinerary_data"])
+        patched = apply_patch(current, patch, kind)
+        if not isinstance(patched, dict):
+            raise PatchError("itinerary_data must remain a JSON object")
+        row["itinerary_data"] = orjson.dumps(patched)
+        row["version"] += 1
+        return PatchOutcome(row["version"], True)
+
+    async def replace_itinerary_data(
+        self, customer_id: int, itinerary_id: int, expected_version: int, itinerary_data: Any,
+        itinerary_blob: str | None = None,
+    ) -> PatchOutcome:
+        await self._round_trip()
+        row = self._itineraries.get(itinerary_id)
+        if row is None or row["customer_id"] != customer_id:
+            return PatchOutcome(None, False)
+        if row["version"] != expected_version:
+            return PatchOutcome(row["version"], False)
+        self._check_blob(itinerary_blob)
+        row["itinerary_data"] = None if itinerary_data is None else orjson.dumps(itinerary_data)
+        row[BLOB_COLUMN] = itinerary_blob
+        row["version"] += 1
+        return PatchOutcome(row["version"], True)
+
+    # --- content-addressed payloads ---
+    async def insert_blobs(self, blobs: List[Blob]) -> None:
+        await self._round_trip()
+        for blob in blobs:
+            # ON CONFLICT (hash) DO NOTHING
+            self._blobs.setdefault(blob.hash, Blob(blob.hash, blob.encoding, bytes(blob.data), blob.raw_size))
+
+    async def get_blobs(self, hashes: Sequence[str]) -> Dict[str, Blob]:
+        await self._round_trip()
+        return {h: self._blobs[h] for h in hashes if h in self._blobs}
+
+    # --- raw JSON passthrough ---
+    async def insert_itinerary_raw(
+        self, customer_id: int, itinerary_name: str, itinerary_data: bytes, itinerary_blob: str | None = None
+    ) -> int:
+        await self._round_trip()
+        self._check_itinerary({"customer_id": customer_id, "itinerary_name": itinerary_name, BLOB_COLUMN: itinerary_blob})
+        try:
+            orjson.loads(itinerary_data)
+        except orjson.JSONDecodeError:
+            raise RepositoryError("invalid input syntax for type json", "22P02")
+        itinerary_id = self._nextval("itineraries")
+        self._store_itinerary(itinerary_id, customer_id, itinerary_name, bytes(itinerary_data), itinerary_blob)
+        return itinerary_id
+
+    async def get_itinerary_raw(self, customer_id: int, itinerary_id: int) -> bytes | None:
+        await self._round_trip()
+        row = self._itineraries.get(itinerary_id)
+        if row is None or row["customer_id"] != customer_id:
+            return None
+        return orjson.dumps(self._itinerary_out(row, ITINERARY_VERSIONED_COLUMNS))
@@ -0,0 +1,159 @@
+import bisect
+import contextvars
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+# Upper bounds in seconds; +Inf is implied.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Prometheus-style histogram with one series per label set."""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            # One slot per bucket, then +Inf, then sum
+            series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(key, le=le)} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(key)} {cumulative:g}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._series: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(key)} {value:g}" for key, value in self._series.items())
+        return lines
+
+
+def _labels(key: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+http_request_seconds = Histogram("http_request_duration_seconds", "Request latency by route.")
+db_call_seconds = Histogram("db_call_duration_seconds", "Latency of each db.py operation, end to end.")
+db_backend_seconds = Histogram("db_backend_duration_seconds", "Time spent waiting on backend round trips, per operation.")
+db_round_trips = Counter("db_round_trips_total", "Backend round trips, per db.py operation.")
+db_payload_bytes = Counter(
+    "db_payload_bytes_total",
+    "Bytes exchanged with the PostgREST backend, per operation and direction (not counted with DB_BACKEND=postgres).",
+)
+db_calls = Counter("db_calls_total", "db.py operation calls.")
+
+REGISTRY = [http_request_seconds, db_call_seconds, db_backend_seconds, db_round_trips, db_payload_bytes, db_calls]
+
+# The db.py operation running in this task, for transport-level accounting.
+_current_op: contextvars.ContextVar[str] = contextvars.ContextVar("db_operation", default="other")
+
+
+def instrumented(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Times a db.py operation and attributes its backend round trips to it."""
+    op = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        token = _current_op.set(op)
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            db_call_seconds.observe(time.perf_counter() - start, op=op)
+            db_calls.inc(op=op)
+            _current_op.reset(token)
+
+    return wrapper
+
+
+def record_round_trip(seconds: float, sent_bytes: int = 0) -> None:
+    """Called by the backend transport once per request it sends, or per asyncpg query."""
+    op = _current_op.get()
+    db_round_trips.inc(op=op)
+    db_backend_seconds.observe(seconds, op=op)
+    if sent_bytes:
+        db_payload_bytes.inc(sent_bytes, op=op, direction="sent")
+
+
+def record_received(received_bytes: int) -> None:
+    """Called by the backend transport once a response body has been read."""
+    if received_bytes:
+        db_payload_bytes.inc(received_bytes, op=_current_op.get(), direction="received")
+
+
+def render(extra_gauges: Dict[str, float] | None = None) -> str:
+    """Prometheus text exposition of every metric, plus any extra gauges."""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for name, value in (extra_gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency. Routes are labelled by
+    their path template, so unmatched paths share one "unmatched" series.
+    Requests slower than the profiler threshold get their hot stacks logged.
+    """
+
+    def __init__(self, app: Any, profiler: Any = None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            http_request_seconds.observe(elapsed, route=path, method=scope["method"], status=str(status_code))
+            if self.profiler is not None:
+                self.profiler.request_finished(f"{scope['method']} {path}", start, elapsed)
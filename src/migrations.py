@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sys
+from typing import Dict, List, NamedTuple
+
+import asyncpg
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Migrations are the numbered files in db/migrations (NNNN_name.sql),
+# applied in order, each in its own transaction, and recorded in
+# schema_migrations with a checksum; editing an applied file is an error.
+# An advisory lock makes concurrent runners (several workers migrating at
+# startup) wait for each other. Run with MIGRATE_ON_STARTUP or:
+#   python -m src.migrations upgrade|status [--dsn DSN] [--target VERSION]
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "migrations")
+FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+# pg_advisory_lock key shared by every runner against the same database
+LOCK_KEY = 0x5C4E_3A11
+
+
+class MigrationError(Exception):
+    """The migration files and the database's history disagree."""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+
+def discover(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Reads the migration files, ordered by version."""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = FILENAME.match(filename)
+        if match is None:
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError(f"Duplicate migration versions in {directory}.")
+    return migrations
+
+
+async def applied(conn: asyncpg.Connection) -> Dict[int, str]:
+    """version -> checksum of the migrations recorded in the database."""
+    if await conn.fetchval("SELECT to_regclass('schema_migrations')") is None:
+        return {}
+    rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+    return {row['version']: row['checksum'] for row in rows}
+
+
+async def upgrade(conn: asyncpg.Connection, migrations: List[Migration] | None = None,
+                  target: int | None = None) -> List[Migration]:
+    """Applies the pending migrations up to `target` (all by default); returns those applied."""
+    migrations = discover() if migrations is None else migrations
+    await conn.execute("SELECT pg_advisory_lock($1)", LOCK_KEY)
+    try:
+        await conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        done = await applied(conn)
+        for m in migrations:
+            if m.version in done and done[m.version] != m.checksum:
+                raise MigrationError(f"Migration {m.version:04d}_{m.name} was edited after being applied.")
+
+        newly_applied = []
+        for m in migrations:
+            if m.version in done or (target is not None and m.version > target):
+                continue
+            async with conn.transaction():
+                await conn.execute(m.sql)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+                    m.version, m.name, m.checksum,
+                )
+            logger.info("Applied migration %04d_%s.", m.version, m.name)
+            newly_applied.append(m)
+        return newly_applied
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", LOCK_KEY)
+
+
+async def upgrade_from_env(target: int | None = None) -> List[Migration]:
+    """Migrates the database at DATABASE_URL."""
+    load_dotenv()
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        raise EnvironmentError("DATABASE_URL environment variable not set.")
+    conn = await asyncpg.connect(dsn)
+    try:
+        return await upgrade(conn, target=target)
+    finally:
+        await conn.close()
+
+
+async def _cli(args: argparse.Namespace) -> int:
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        if args.command == "upgrade":
+            done = await upgrade(conn, target=args.target)
+            print(f"Applied {len(done)} migration(s)." if done else "Already up to date.")
+        else:
+            done = await applied(conn)
+            for m in discover():
+                state = "pending"
+                if m.version in done:
+                    state = "applied" if done[m.version] == m.checksum else "EDITED"
+                print(f"{m.version:04d}_{m.name:<40} {state}")
+    except MigrationError as err:
+        print(err, file=sys.stderr)
+        return 1
+    finally:
+        await conn.close()
+    return 0
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Apply or list the db/migrations schema migrations.")
+    parser.add_argument("command", choices=["upgrade", "status"])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="Postgres DSN (default: DATABASE_URL)")
+    parser.add_argument("--target", type=int, help="stop after this version")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or DATABASE_URL is required")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(asyncio.run(_cli(args)))
+
+
+if __name__ == "__main__":
+    main()
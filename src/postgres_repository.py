@@ -0,0 +1,341 @@
+import asyncio
+import functools
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+import asyncpg
+import orjson
+
+from . import metrics
+from .repository import (
+    BLOB_COLUMN, CUSTOMER_COLUMNS, ITINERARY_COLUMNS, ITINERARY_VERSIONED_COLUMNS, PATCH_ERROR_SQLSTATE, SEARCH_DEFAULT_FIELDS, SEARCH_FIELDS, Blob,
+    ItinerarySearch, PatchError, PatchOutcome, Repository, RepositoryError, like_pattern,
+)
+
+ITINERARY_WRITE_COLUMNS = ("customer_id", "itinerary_name", "itinerary_data", BLOB_COLUMN)
+
+INSERT_ITINERARIES = """
+    INSERT INTO itineraries (customer_id, itinerary_name, itinerary_data, itinerary_blob)
+    SELECT * FROM unnest($1::int[], $2::varchar[], $3::json[], $4::text[])
+    RETURNING itinerary_id
+"""
+INSERT_ITINERARY_RAW = """
+    INSERT INTO itineraries (customer_id, itinerary_name, itinerary_data, itinerary_blob)
+    VALUES ($1, $2, $3::text::json, $4)
+    RETURNING itinerary_id
+"""
+# {columns} is a validated column list
+FIND_CUSTOMER = "SELECT {columns} FROM customers WHERE email = $1"
+# Always the same parameters, so the text (and its prepared statement)
+# only varies with the column list
+LIST_ITINERARIES = """
+    SELECT {columns} FROM itineraries
+    WHERE customer_id = $1 AND ($2::int IS NULL OR itinerary_id < $2)
+    ORDER BY itinerary_id DESC LIMIT $3
+"""
+SEARCH_PROJECTIONS = {
+    "itinerary_id": "itinerary_id",
+    "itinerary_name": "itinerary_name",
+    "itinerary_data": "itinerary_data",
+    "destination": "itinerary_data->>'destination' AS destination",
+    "start_date": "itinerary_data->>'start_date' AS start_date",
+    "end_date": "itinerary_data->>'end_date' AS end_date",
+    BLOB_COLUMN: BLOB_COLUMN,
+}
+DELETE_ITINERARIES = "DELETE FROM itineraries WHERE customer_id = $1 RETURNING itinerary_id"
+DELETE_ITINERARIES_BY_ID = (
+    "DELETE FROM itineraries WHERE customer_id = $1 AND itinerary_id = ANY($2::int[]) RETURNING itinerary_id"
+)
+LIST_ITINERARIES_BY_EMAIL = """
+    SELECT i.customer_id, {columns}
+    FROM itineraries i JOIN customers c ON c.customer_id = i.customer_id
+    WHERE c.email = $1
+    ORDER BY i.itinerary_id DESC
+"""
+GET_ITINERARY = "SELECT {columns} FROM itineraries WHERE itinerary_id = $1 AND customer_id = $2"
+# The object is built and encoded by Postgres; Python only relays the text
+GET_ITINERARY_RAW = """
+    SELECT json_build_object(
+        'itinerary_id', itinerary_id, 'itinerary_name', itinerary_name, 'itinerary_data', itinerary_data,
+        'version', version
+    )::text
+    FROM itineraries WHERE itinerary_id = $1 AND customer_id = $2
+"""
+# The patch is applied by the database (db/migrations/0006); only the
+# patch document is sent
+PATCH_ITINERARY = "SELECT current_version, applied FROM patch_itinerary($1, $2, $3, $4::jsonb, $5)"
+# One statement: `current` reads the snapshot from before the update, so
+# it holds the stored version whether or not the update matched
+REPLACE_ITINERARY_DATA = """
+    WITH updated AS (
+        UPDATE itineraries SET itinerary_data = $4::jsonb, itinerary_blob = $5, version = version + 1
+        WHERE itinerary_id = $2 AND customer_id = $1 AND version = $3
+        RETURNING version
+    )
+    SELECT (SELECT version FROM updated) AS updated_version,
+           (SELECT version FROM itineraries WHERE itinerary_id = $2 AND customer_id = $1) AS current_version
+"""
+INSERT_BLOBS = """
+    INSERT INTO itinerary_blobs (hash, encoding, data, raw_size)
+    SELECT * FROM unnest($1::text[], $2::text[], $3::bytea[], $4::int[])
+    ON CONFLICT (hash) DO NOTHING
+"""
+GET_BLOBS = "SELECT hash, encoding, data, raw_size FROM itinerary_blobs WHERE hash = ANY($1::text[])"
+
+
+def _check_columns(columns: Sequence[str], known: Sequence[str]) -> None:
+    # Column names are spliced into SQL text, so only known ones get through
+    for column in columns:
+        if column not in known:
+            raise RepositoryError(f'column "{column}" does not exist', "42703")
+
+
+def _row_count(status: str) -> int:
+    # Command tags look like "UPDATE 1" / "DELETE 0"
+    return int(status.rsplit(" ", 1)[-1])
+
+
+def _translate_errors(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return await fn(*args, **kwargs)
+        except asyncpg.PostgresError as err:
+            raise RepositoryError(str(err), err.sqlstate) from err
+        except (OSError, asyncio.TimeoutError, asyncpg.InterfaceError) as err:
+            raise RepositoryError(str(err) or type(err).__name__) from err
+
+    return wrapper
+
+
+def _record_query(record: "asyncpg.connection.LoggedQuery") -> None:
+    # asyncpg runs query loggers with call_soon, which keeps the calling
+    # task's context and so the db.py operation the query belongs to
+    metrics.record_round_trip(record.elapsed)
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # json/jsonb columns go through orjson instead of asyncpg's text passthrough
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name, schema="pg_catalog",
+            encoder=lambda value: orjson.dumps(value).decode(), decoder=orjson.loads,
+        )
+    # Round trips and backend time, as the PostgREST transport records them.
+    # The pool's reset query on release is one too, and the caller awaits
+    # it. asyncpg does not report wire bytes, so db_payload_bytes stays
+    # PostgREST-only
+    conn.add_query_logger(_record_query)
+
+
+def search_query(
+    customer_id: int, search: ItinerarySearch, fields: Sequence[str], limit: int | None, before_id: int | None
+) -> Tuple[str, List[Any]]:
+    """The SQL and arguments for search_itineraries()."""
+    _check_columns(fields, SEARCH_FIELDS + (BLOB_COLUMN,))
+    # Only the filters in use go into the text, so each combination gets
+    # its own prepared statement and can use the trigram indexes
+    conditions, args = ["customer_id = $1"], [customer_id]
+
+    def condition(template: str, value: Any) -> None:
+        args.append(value)
+        conditions.append(template.format(f"${len(args)}"))
+
+    if search.name:
+        condition("itinerary_name ILIKE {}", like_pattern(search.name, "prefix" if search.name_prefix else "contains"))
+    if search.destination:
+        condition("itinerary_data->>'destination' ILIKE {}", like_pattern(search.destination, "exact"))
+    if search.date_from:
+        condition("itinerary_data->>'end_date' >= {}", search.date_from)
+    if search.date_to:
+        condition("itinerary_data->>'start_date' <= {}", search.date_to)
+    if before_id is not None:
+        condition("itinerary_id < {}", before_id)
+    args.append(limit)
+    sql = (
+        f"SELECT {', '.join(SEARCH_PROJECTIONS[f] for f in fields)} FROM itineraries"
+        f" WHERE {' AND '.join(conditions)} ORDER BY itinerary_id DESC LIMIT ${len(args)}"
+    )
+    return sql, args
+
+
+class PostgresRepository(Repository):
+    """
+    Repository talking to Postgres directly over an asyncpg pool, with no
+    PostgREST hop. Each connection prepares a statement the first time it
+    runs a query text and reuses it after that (asyncpg's statement cache).
+    Behind a transaction-mode pooler such as PgBouncer, set
+    statement_cache_size to 0.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    @classmethod
+    async def connect(cls, dsn: str, **pool_options: Any) -> "PostgresRepository":
+        pool = await asyncpg.create_pool(dsn, init=_init_connection, **pool_options)
+        return cls(pool)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    # --- customers ---
+    @_translate_errors
+    async def find_customer(self, email: str, columns: Sequence[str]) -> Dict[str, Any] | None:
+        _check_columns(columns, CUSTOMER_COLUMNS)
+        row = await self.pool.fetchrow(FIND_CUSTOMER.format(columns=", ".join(columns)), email)
+        return None if row is None else dict(row)
+
+    @_translate_errors
+    async def insert_customer(self, row: Dict[str, Any]) -> int:
+        _check_columns(list(row), CUSTOMER_COLUMNS)
+        placeholders = ", ".join(f"${i}" for i in range(1, len(row) + 1))
+        return await self.pool.fetchval(
+            f"INSERT INTO customers ({', '.join(row)}) VALUES ({placeholders}) RETURNING customer_id",
+            *row.values(),
+        )
+
+    @_translate_errors
+    async def update_customer(self, email: str, fields: Dict[str, Any]) -> int:
+        _check_columns(list(fields), CUSTOMER_COLUMNS[1:])
+        assignments = ", ".join(f"{column} = ${i}" for i, column in enumerate(fields, start=2))
+        status = await self.pool.execute(f"UPDATE customers SET {assignments} WHERE email = $1", email, *fields.values())
+        return _row_count(status)
+
+    @_translate_errors
+    async def delete_customer(self, email: str) -> int:
+        return _row_count(await self.pool.execute("DELETE FROM customers WHERE email = $1", email))
+
+    # --- itineraries ---
+    @_translate_errors
+    async def insert_itineraries(self, rows: List[Dict[str, Any]]) -> List[int]:
+        if not rows:
+            return []
+        for row in rows:
+            _check_columns(list(row), ITINERARY_WRITE_COLUMNS)
+        # One statement for the whole batch; rows come back in input order
+        records = await self.pool.fetch(
+            INSERT_ITINERARIES,
+            [row.get("customer_id") for row in rows],
+            [row.get("itinerary_name") for row in rows],
+            [row.get("itinerary_data") for row in rows],
+            [row.get(BLOB_COLUMN) for row in rows],
+        )
+        return [record['itinerary_id'] for record in records]
+
+    @_translate_errors
+    async def delete_itineraries(self, customer_id: int, itinerary_ids: List[int] | None = None) -> List[int]:
+        if itinerary_ids is None:
+            records = await self.pool.fetch(DELETE_ITINERARIES, customer_id)
+        else:
+            records = await self.pool.fetch(DELETE_ITINERARIES_BY_ID, customer_id, itinerary_ids)
+        return [record['itinerary_id'] for record in records]
+
+    @_translate_errors
+    async def list_itineraries(
+        self, customer_id: int, columns: Sequence[str] = ITINERARY_COLUMNS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        _check_columns(columns, ITINERARY_COLUMNS + ("customer_id", BLOB_COLUMN))
+        records = await self.pool.fetch(
+            LIST_ITINERARIES.format(columns=", ".join(columns)), customer_id, before_id, limit
+        )
+        return [dict(record) for record in records]
+
+    @_translate_errors
+    async def list_itineraries_by_email(
+        self, email: str, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> tuple[int | None, List[Dict[str, Any]]]:
+        _check_columns(columns, ITINERARY_COLUMNS + (BLOB_COLUMN,))
+        records = await self.pool.fetch(
+            LIST_ITINERARIES_BY_EMAIL.format(columns=", ".join(f"i.{column}" for column in columns)), email
+        )
+        rows = [{column: record[column] for column in columns} for record in records]
+        return (records[0]['customer_id'] if records else None), rows
+
+    @_translate_errors
+    async def get_itinerary(
+        self, customer_id: int, itinerary_id: int, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> Dict[str, Any] | None:
+        _check_columns(columns, ITINERARY_VERSIONED_COLUMNS + (BLOB_COLUMN,))
+        record = await self.pool.fetchrow(GET_ITINERARY.format(columns=", ".join(columns)), itinerary_id, customer_id)
+        return None if record is None else dict(record)
+
+    @_translate_errors
+    async def search_itineraries(
+        self, customer_id: int, search: ItinerarySearch, fields: Sequence[str] = SEARCH_DEFAULT_FIELDS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        sql, args = search_query(customer_id, search, fields, limit, before_id)
+        return [dict(record) for record in await self.pool.fetch(sql, *args)]
+
+    @_translate_errors
+    async def patch_itinerary(
+        self, customer_id: int, itinerary_id: int, expected_version: int, patch: Any, kind: str
+    ) -> PatchOutcome:
+        try:
+            record = await self.pool.fetchrow(PATCH_ITINERARY, customer_id, itinerary_id, expected_version, patch, kind)
+        except asyncpg.PostgresError as err:
+            if err.sqlstate == PATCH_ERROR_SQLSTATE:
+                raise PatchError(err.message) from err
+            raise
+        if record is None:
+            return PatchOutcome(None, False)
+        return PatchOutcome(record['current_version'], record['applied'])
+
+    @_translate_errors
+    async def replace_itinerary_data(
+        self, customer_id: int, itinerary_id: int, expected_version: int, itinerary_data: Any,
+        itinerary_blob: str | None = None,
+    ) -> PatchOutcome:
+        record = await self.pool.fetchrow(
+            REPLACE_ITINERARY_DATA, customer_id, itinerary_id, expected_version, itinerary_data, itinerary_blob
+        )
+        if record['updated_version'] is not None:
+            return PatchOutcome(record['updated_version'], True)
+        return PatchOutcome(record['current_version'], False)
+
+    # --- content-addressed payloads ---
+    @_translate_errors
+    async def insert_blobs(self, blobs: List[Blob]) -> None:
+        await self.pool.execute(
+            INSERT_BLOBS,
+            [blob.hash for blob in blobs],
+            [blob.encoding for blob in blobs],
+            [blob.data for blob in blobs],
+            [blob.raw_size for blob in blobs],
+        )
+
+    @_translate_errors
+    async def get_blobs(self, hashes: Sequence[str]) -> Dict[str, Blob]:
+        records = await self.pool.fetch(GET_BLOBS, list(hashes))
+        return {record['hash']: Blob(record['hash'], record['encoding'], record['data'], record['raw_size'])
+                for record in records}
+
+    # --- raw JSON passthrough ---
+    @_translate_errors
+    async def insert_itinerary_raw(
+        self, customer_id: int, itinerary_name: str, itinerary_data: bytes, itinerary_blob: str | None = None
+    ) -> int:
+        return await self.pool.fetchval(
+            INSERT_ITINERARY_RAW, customer_id, itinerary_name, bytes(itinerary_data).decode(), itinerary_blob
+        )
+
+    @_translate_errors
+    async def get_itinerary_raw(self, customer_id: int, itinerary_id: int) -> bytes | None:
+        text = await self.pool.fetchval(GET_ITINERARY_RAW, itinerary_id, customer_id)
+        return None if text is None else text.encode()
+
+
+async def postgres_repository_from_env() -> PostgresRepository:
+    """Connects the pool configured by DATABASE_URL and the PG_* settings."""
+    dsn = os.environ.get("DATABASE_URL")
+    if not dsn:
+        raise EnvironmentError("DATABASE_URL environment variable not set.")
+    return await PostgresRepository.connect(
+        dsn,
+        min_size=int(os.environ.get("PG_POOL_MIN_SIZE", "1")),
+        max_size=int(os.environ.get("PG_POOL_MAX_SIZE", "10")),
+        statement_cache_size=int(os.environ.get("PG_STATEMENT_CACHE_SIZE", "100")),
+        command_timeout=float(os.environ.get("PG_COMMAND_TIMEOUT", "10")),
+    )
@@ -0,0 +1,78 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Deque, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler for slow requests. A daemon thread records the event
+    loop thread's stack every `interval` seconds into a ring buffer; when a
+    request takes longer than `threshold`, the stacks sampled while it ran
+    are aggregated and the hottest ones logged. Since every request shares
+    the one loop thread, the dump shows what the loop was busy with (or
+    that it sat idle waiting on I/O) during the slow request.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.005, top: int = 5, history: float = 30.0):
+        self.threshold = threshold
+        self.interval = interval
+        self.top = top
+        self._samples: Deque[Tuple[float, Tuple[str, ...]]] = collections.deque(maxlen=int(history / interval))
+        self._target_thread: int | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Starts sampling the calling thread (call it from the event loop thread)."""
+        self._target_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                continue
+            stack = tuple(
+                f"{summary.filename}:{summary.lineno} {summary.name}"
+                for summary in traceback.extract_stack(frame, limit=25)
+            )
+            self._samples.append((time.perf_counter(), stack))
+
+    def request_finished(self, label: str, start: float, elapsed: float) -> None:
+        if elapsed < self.threshold or self._thread is None:
+            return
+        end = start + elapsed
+        counts = collections.Counter(stack for ts, stack in list(self._samples) if start <= ts <= end)
+        total = sum(counts.values())
+        hot = [
+            {"samples": n, "share": round(n / total, 3), "stack": list(stack[-8:])}
+            for stack, n in counts.most_common(self.top)
+        ]
+        logger.warning(
+            "Slow request %s took %.1f ms", label, elapsed * 1000,
+            extra={"profile_samples": total, "hot_stacks": hot},
+        )
+
+
+def profiler_from_env() -> SlowRequestProfiler | None:
+    """Builds the profiler when PROFILE_SLOW_REQUEST_MS is set, else None."""
+    threshold_ms = os.environ.get("PROFILE_SLOW_REQUEST_MS")
+    if not threshold_ms:
+        return None
+    interval_ms = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    return SlowRequestProfiler(float(threshold_ms) / 1000, interval_ms / 1000)
@@ -0,0 +1,187 @@
+import ipaddress
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Sequence, Tuple
+
+
+class RateLimited(Exception):
+    """Raised when a caller is over its request budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited; retry after {retry_after:.1f}s.")
+        self.retry_after = retry_after
+
+
+def gcra(tat: float | None, now: float, interval: float, burst: int) -> Tuple[bool, float, float]:
+    """
+    Token bucket in its GCRA form: instead of a token count it keeps one
+    "theoretical arrival time" per key. Returns (allowed, new_tat, retry_after).
+    `interval` is seconds per token and `burst` the bucket size.
+    """
+    tat = now if tat is None or tat < now else tat
+    new_tat = tat + interval
+    allow_at = new_tat - interval * burst
+    if now < allow_at:
+        return False, tat, allow_at - now
+    return True, new_tat, 0.0
+
+
+# Same arithmetic as gcra(), run atomically inside Redis.
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - interval * burst
+if now < allow_at then
+  return {0, tostring(allow_at - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, '0'}
+"""
+
+
+class TokenBucket:
+    """
+    In-process token bucket limiter: one float per key in an LRU-ordered
+    dict, so memory stays bounded under a flood of distinct keys.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int = 100_000):
+        self.name = name
+        self.interval = 60.0 / rate_per_minute
+        self.burst = burst
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.rejected = 0
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    async def hit(self, key: str) -> float:
+        """Takes a token for `key`; returns 0 if allowed, else seconds to wait."""
+        now = time.monotonic()
+        allowed, new_tat, retry_after = gcra(self._tats.get(key), now, self.interval, self.burst)
+        if allowed:
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            if len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+            self.allowed += 1
+        else:
+            self.rejected += 1
+        return retry_after
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket kept in a shared store, so the budget holds across
+    workers. `store` needs register_script() as redis.asyncio.Redis provides.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, store: Any):
+        super().__init__(name, rate_per_minute, burst)
+        self._script = store.register_script(GCRA_SCRIPT)
+
+    async def hit(self, key: str) -> float:
+        allowed, retry_after = await self._script(
+            keys=[f"ratelimit:{self.name}:{key}"],
+            args=[time.time(), self.interval, self.burst],
+        )
+        if int(allowed):
+            self.allowed += 1
+            return 0.0
+        self.rejected += 1
+        return float(retry_after)
+
+
+def make_bucket(name: str, rate_per_minute: float, burst: int) -> TokenBucket:
+    """Builds a limiter on the backend picked by CACHE_BACKEND (memory or redis)."""
+    if os.environ.get("CACHE_BACKEND", "memory") == "redis":
+        from .cache import _get_shared_store
+        return SharedTokenBucket(name, rate_per_minute, burst, _get_shared_store())
+    return TokenBucket(name, rate_per_minute, burst)
+
+
+class LoginThrottle:
+    """Per-IP and per-email budgets for the credential-checking endpoints."""
+
+    def __init__(self, by_ip: TokenBucket, by_email: TokenBucket, enabled: bool = True):
+        self.by_ip = by_ip
+        self.by_email = by_email
+        self.enabled = enabled
+
+    async def check(self, ip: str, email: str | None = None) -> None:
+        """Raises RateLimited if either budget is spent."""
+        if not self.enabled:
+            return
+        retry_after = await self.by_ip.hit(ip)
+        if not retry_after and email is not None:
+            retry_after = await self.by_email.hit(email.lower())
+        if retry_after:
+            raise RateLimited(retry_after)
+
+    def stats(self) -> dict:
+        return {
+            bucket.name: {"allowed": bucket.allowed, "rejected": bucket.rejected}
+            for bucket in (self.by_ip, self.by_email)
+        }
+
+
+def throttle_from_env() -> LoginThrottle:
+    """Reads AUTH_RATE_* settings; RATE_LIMIT_ENABLED=false turns throttling off."""
+    return LoginThrottle(
+        make_bucket(
+            "auth_ip",
+            float(os.environ.get("AUTH_RATE_PER_IP_PER_MIN", "30")),
+            int(os.environ.get("AUTH_IP_BURST", "10")),
+        ),
+        make_bucket(
+            "auth_email",
+            float(os.environ.get("AUTH_RATE_PER_EMAIL_PER_MIN", "10")),
+            int(os.environ.get("AUTH_EMAIL_BURST", "5")),
+        ),
+        enabled=os.environ.get("RATE_LIMIT_ENABLED", "true").lower() not in ("0", "false", "no"),
+    )
+
+
+# Loopback and the private ranges a platform's load balancer connects from
+DEFAULT_TRUSTED_PROXIES = "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7"
+
+
+class TrustedProxies:
+    """
+    Finds the client address of a request that came through proxies. Each
+    proxy appends the address it was connected from to X-Forwarded-For, so
+    starting from the socket peer the entries are read right to left while
+    the address in hand is a trusted proxy; the first other address is the
+    client. Entries further left were written by the client and are ignored.
+    """
+
+    def __init__(self, networks: Sequence[str]):
+        if "*" in networks:
+            raise ValueError("Trusting every proxy lets clients pick their own address; list the proxies' networks.")
+        self.networks = [ipaddress.ip_network(network, strict=False) for network in networks]
+
+    def trusts(self, host: str) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self.networks)
+
+    def client_ip(self, peer: str | None, forwarded_for: str | None = None) -> str:
+        if peer is None:
+            return "unknown"
+        host = peer
+        hops = [entry.strip() for entry in forwarded_for.split(",")] if forwarded_for else []
+        while hops and self.trusts(host):
+            host = hops.pop()
+        return host
+
+
+def trusted_proxies_from_env() -> TrustedProxies:
+    """Reads FORWARDED_ALLOW_IPS, comma-separated addresses or networks (default: loopback and private ranges)."""
+    value = os.environ.get("FORWARDED_ALLOW_IPS", DEFAULT_TRUSTED_PROXIES)
+    return TrustedProxies([network.strip() for network in value.split(",") if network.strip()])
@@ -0,0 +1,172 @@
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+CUSTOMER_COLUMNS = ("customer_id", "first_name", "last_name", "email", "password_hash")
+ITINERARY_COLUMNS = ("itinerary_id", "itinerary_name", "itinerary_data")
+ITINERARY_SUMMARY_COLUMNS = ("itinerary_id", "itinerary_name")
+# What get_itinerary_raw() returns: a full row plus the version PATCH checks
+ITINERARY_VERSIONED_COLUMNS = ITINERARY_COLUMNS + ("version",)
+# Fields a search can return; the last three are keys inside itinerary_data
+SEARCH_FIELDS = ("itinerary_id", "itinerary_name", "itinerary_data", "destination", "start_date", "end_date")
+SEARCH_DEFAULT_FIELDS = ("itinerary_id", "itinerary_name", "destination", "start_date", "end_date")
+# The hash of the itinerary_blobs row holding a row's payload, set only by
+# src/blobs.py (NULL for a payload stored inline). Only BlobRepository asks
+# for it, as an extra column or search field, and writes it.
+BLOB_COLUMN = "itinerary_blob"
+
+
+class ItinerarySearch(NamedTuple):
+    """
+    Filters for search_itineraries(); unset ones match everything. Dates
+    are ISO strings compared with itinerary_data's start_date/end_date.
+    """
+
+    name: str | None = None  # case-insensitive, in itinerary_name
+    name_prefix: bool = False  # `name` must start itinerary_name rather than appear anywhere
+    destination: str | None = None  # equal to itinerary_data's destination
+    date_from: str | None = None  # trips ending on or after this date
+    date_to: str | None = None  # trips starting on or before this date
+
+
+class RepositoryError(Exception):
+    """A storage backend rejected or failed a query (constraint violation, outage...)."""
+
+    def __init__(self, message: str, code: str | None = None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+# SQLSTATE raised by the database's patch functions (db/migrations/0006);
+# PostgREST answers PTxxx codes with HTTP status xxx
+PATCH_ERROR_SQLSTATE = "PT422"
+
+
+class PatchError(ValueError):
+    """A patch that is malformed or does not apply to the itinerary (HTTP 422, not a backend failure)."""
+
+
+class PatchOutcome(NamedTuple):
+    """patch_itinerary()'s result; version is None when the itinerary was not found."""
+
+    version: int | None  # the stored version after the call
+    applied: bool  # False when the expected version was stale
+
+
+class Blob(NamedTuple):
+    """A row of itinerary_blobs: one itinerary_data payload, stored once under its content hash."""
+
+    hash: str  # sha256 hex digest of the canonical JSON
+    encoding: str  # "zstd", "gzip" or "identity"
+    data: bytes  # the JSON, compressed with `encoding`
+    raw_size: int  # bytes of the JSON before compression
+
+
+def like_pattern(text: str, match: str) -> str:
+    """An ILIKE pattern matching `text` literally: "contains", "prefix" or "exact"."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return {"contains": f"%{escaped}%", "prefix": f"{escaped}%", "exact": escaped}[match]
+
+
+class Repository:
+    """
+    Storage operations behind src/db.py, one method per query shape, over
+    the customers and itineraries tables of db/migrations. db.py keeps the
+    caching, logging and error policy; implementations only run queries,
+    raising RepositoryError when the backend fails. Itineraries always
+    come back newest first.
+    """
+
+    async def close(self) -> None:
+        """Releases the backend's connections, if it holds any."""
+
+    # --- customers ---
+    async def find_customer(self, email: str, columns: Sequence[str]) -> Dict[str, Any] | None:
+        raise NotImplementedError
+
+    async def insert_customer(self, row: Dict[str, Any]) -> int:
+        """Inserts a customer; returns its customer_id."""
+        raise NotImplementedError
+
+    async def update_customer(self, email: str, fields: Dict[str, Any]) -> int:
+        """Returns the number of rows updated."""
+        raise NotImplementedError
+
+    async def delete_customer(self, email: str) -> int:
+        """Deletes a customer and, by cascade, their itineraries; returns rows deleted."""
+        raise NotImplementedError
+
+    # --- itineraries ---
+    async def insert_itineraries(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """Inserts rows in one statement; returns their itinerary_ids in order. Rows may set BLOB_COLUMN."""
+        raise NotImplementedError
+
+    async def delete_itineraries(self, customer_id: int, itinerary_ids: List[int] | None = None) -> List[int]:
+        """Deletes the customer's listed itineraries (all if None); returns the ids removed."""
+        raise NotImplementedError
+
+    async def list_itineraries(
+        self, customer_id: int, columns: Sequence[str] = ITINERARY_COLUMNS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        """The customer's itineraries, optionally only those with itinerary_id < before_id."""
+        raise NotImplementedError
+
+    async def list_itineraries_by_email(
+        self, email: str, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> tuple[int | None, List[Dict[str, Any]]]:
+        """Itineraries looked up by owner email in one query; also returns the customer_id if any matched."""
+        raise NotImplementedError
+
+    async def get_itinerary(
+        self, customer_id: int, itinerary_id: int, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> Dict[str, Any] | None:
+        """One itinerary; `columns` from ITINERARY_VERSIONED_COLUMNS and BLOB_COLUMN."""
+        raise NotImplementedError
+
+    async def search_itineraries(
+        self, customer_id: int, search: ItinerarySearch, fields: Sequence[str] = SEARCH_DEFAULT_FIELDS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        """The customer's itineraries matching `search`, projected to `fields` (from SEARCH_FIELDS)."""
+        raise NotImplementedError
+
+    async def patch_itinerary(
+        self, customer_id: int, itinerary_id: int, expected_version: int, patch: Any, kind: str
+    ) -> PatchOutcome:
+        """
+        Applies an RFC 7386 ("merge") or RFC 6902 ("json-patch") patch to
+        itinerary_data and bumps version, only if the stored version is
+        expected_version. Raises PatchError if the patch does not apply.
+        """
+        raise NotImplementedError
+
+    async def replace_itinerary_data(
+        self, customer_id: int, itinerary_id: int, expected_version: int, itinerary_data: Any,
+        itinerary_blob: str | None = None,
+    ) -> PatchOutcome:
+        """
+        Stores itinerary_data (and itinerary_blob as BLOB_COLUMN) in place
+        of the row's and bumps version, only if the stored version is
+        expected_version: patch_itinerary() for patches applied by the caller.
+        """
+        raise NotImplementedError
+
+    # --- content-addressed payloads (src/blobs.py) ---
+    async def insert_blobs(self, blobs: List[Blob]) -> None:
+        """Stores blobs whose hash is not stored yet, in one statement."""
+        raise NotImplementedError
+
+    async def get_blobs(self, hashes: Sequence[str]) -> Dict[str, Blob]:
+        """The stored blobs among `hashes`, by hash."""
+        raise NotImplementedError
+
+    # --- raw JSON passthrough ---
+    async def insert_itinerary_raw(
+        self, customer_id: int, itinerary_name: str, itinerary_data: bytes, itinerary_blob: str | None = None
+    ) -> int:
+        """Like insert_itineraries() for one row whose data is already-encoded JSON."""
+        raise NotImplementedError
+
+    async def get_itinerary_raw(self, customer_id: int, itinerary_id: int) -> bytes | None:
+        """get_itinerary() plus the row's version (ITINERARY_VERSIONED_COLUMNS), as encoded JSON object bytes."""
+        raise NotImplementedError
@@ -0,0 +1,10 @@
+from typing import Any, Dict
+
+from pydantic import BaseModel, Field
+
+
+class ItineraryIn(BaseModel):
+    """JSON body for creating an itinerary through the v2 API."""
+
+    itinerary_name: str = Field(min_length=1, max_length=255)  # VARCHAR(255)
+    itinerary_data: Dict[str, Any]
@@ -0,0 +1,103 @@
+import os
+import secrets
+
+from uvicorn_worker import UvicornWorker as _UvicornWorker
+
+from .ratelimit import trusted_proxies_from_env
+
+# Gunicorn settings for serving the app with several worker processes:
+#
+#     gunicorn -c python:src.serving src.main:app
+#
+# Every value comes from the environment (WEB_* settings, PORT,
+# FORWARDED_ALLOW_IPS); options on the gunicorn command line override
+# them. Gunicorn only reads the lower-case names below that it knows.
+
+LOOPS = ("auto", "asyncio", "uvloop")
+HTTP_PROTOCOLS = ("auto", "h11", "httptools")
+GRACEFUL_TIMEOUT = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "30"))
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+def _choice(name: str, choices: tuple) -> str:
+    value = os.environ.get(name, "auto")
+    if value not in choices:
+        raise ValueError(f'Unknown {name} "{value}"; expected one of {", ".join(choices)}.')
+    return value
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on (a container's cpuset, not the host's)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def workers_from_env() -> int:
+    """WEB_CONCURRENCY, or one worker per CPU: each is a single event loop."""
+    concurrency = os.environ.get("WEB_CONCURRENCY")
+    return int(concurrency) if concurrency else cpu_count()
+
+
+class UvicornWorker(_UvicornWorker):
+    """uvicorn's gunicorn worker with the event loop and HTTP parser picked by WEB_LOOP and WEB_HTTP."""
+
+    CONFIG_KWARGS = {
+        "loop": _choice("WEB_LOOP", LOOPS),
+        "http": _choice("WEB_HTTP", HTTP_PROTOCOLS),
+        # Let uvicorn cancel requests still running a second before gunicorn
+        # gives up on the worker and kills it, so their connections close
+        "timeout_graceful_shutdown": max(1, GRACEFUL_TIMEOUT - 1),
+    }
+
+
+bind = os.environ.get("WEB_BIND") or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = workers_from_env()
+worker_class = "src.serving.UvicornWorker"
+# Import the app once in the master so workers fork with it loaded (faster
+# boots, shared memory pages). Clients, pools and threads are only created
+# in the app's lifespan, so no worker inherits another's connections.
+preload_app = _flag("WEB_PRELOAD", "true")
+# Longer than the usual 60 s idle timeout of a proxy in front, so the proxy
+# rather than the worker closes idle connections and never reuses one that
+# is being closed
+keepalive = int(os.environ.get("WEB_KEEPALIVE", "65"))
+backlog = int(os.environ.get("WEB_BACKLOG", "2048"))
+# Recycle each worker after about this many requests, to bound slow memory
+# growth; the jitter keeps workers from restarting together. Off by
+# default: a recycled worker finishes its requests but closes its idle
+# keep-alive connections, and a request already on its way over one of
+# them is reset unless the client or proxy retries it
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", "1000"))
+graceful_timeout = GRACEFUL_TIMEOUT
+# A worker whose event loop is blocked this long is killed and replaced
+timeout = int(os.environ.get("WEB_TIMEOUT", "60"))
+# The proxies whose X-Forwarded-For and X-Forwarded-Proto uvicorn believes:
+# the same list the app picks the client IP for login throttling with
+# (src/ratelimit.py), so both settle on the rightmost untrusted address
+forwarded_allow_ips = ",".join(str(network) for network in trusted_proxies_from_env().networks)
+accesslog = "-" if _flag("WEB_ACCESS_LOG", "true") else None
+
+
+def post_fork(server, worker) -> None:
+    # Each worker has its own bcrypt pool; unless BCRYPT_POOL_SIZE says
+    # otherwise, split the CPUs between the workers rather than giving each
+    # one a thread per CPU. The pool is built on first use, after the fork.
+    if "BCRYPT_POOL_SIZE" not in os.environ:
+        os.environ["BCRYPT_POOL_SIZE"] = str(max(1, cpu_count() // server.cfg.workers))
+
+
+def on_starting(server) -> None:
+    # Every worker must sign and verify session tokens with the same key.
+    # Without SESSION_SECRET each process would draw its own on first use
+    # (src/tokens.py), preloaded or not, and a token from one worker would
+    # get 401 from the others; the master draws one before forking instead
+    if not os.environ.get("SESSION_SECRET"):
+        os.environ["SESSION_SECRET"] = secrets.token_urlsafe(32)
+        server.log.warning("SESSION_SECRET is not set; the workers share a random key, "
+                           "and tokens stop verifying when the server restarts.")
@@ -0,0 +1,78 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one. The first caller
+    starts the call; callers arriving while it is in flight wait for the
+    same result, or the same exception. Nothing is kept once it settles:
+    this adds no staleness, caching stays the caches' job.
+
+    Each call runs as its own task with its own deadline (`timeout`
+    seconds from its start, not extended by later joiners); past it every
+    waiter gets TimeoutError and the next caller starts afresh. A waiter
+    being cancelled (a client hanging up) does not cancel the call for the
+    others. Waiters share the result object, so they must not mutate it.
+    """
+
+    def __init__(self, name: str, timeout: float, enabled: bool = True):
+        self.name = name
+        self.timeout = timeout
+        self.enabled = enabled
+        self.calls = 0  # calls started
+        self.shared = 0  # callers served by another caller's call
+        self.timeouts = 0
+        self._in_flight: Dict[str, "asyncio.Task[Any]"] = {}
+
+    async def _run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        try:
+            return await asyncio.wait_for(fn(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise TimeoutError(f"{self.name} call timed out after {self.timeout:g}s") from None
+
+    def _settled(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Marks the exception retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Returns fn()'s result, sharing one call among concurrent callers with the same key."""
+        if not self.enabled:
+            return await fn()
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(self._run(fn))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._settled(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def forget(self, key: str) -> None:
+        """Makes the next caller for `key` start a new call; call after writes that change its result."""
+        self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "timeouts": self.timeouts,
+            "in_flight": len(self._in_flight),
+        }
+
+
+def single_flight_from_env(name: str) -> SingleFlight:
+    """SINGLE_FLIGHT_ENABLED (default true) and SINGLE_FLIGHT_TIMEOUT (seconds, default 10)."""
+    return SingleFlight(
+        name,
+        timeout=float(os.environ.get("SINGLE_FLIGHT_TIMEOUT", "10")),
+        enabled=os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes"),
+    )
@@ -0,0 +1,156 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Read endpoints whose last good answer may stand in for a failed one
+READ_PATHS = (
+    "/get_customer_details",
+    "/get_all_itineraries",
+    "/list_itineraries",
+    "/get_itinerary",
+    "/me/",
+    "/v2/me/itineraries",
+)
+# Statuses meaning the backend, not the request, failed
+ERROR_STATUSES = (500, 502, 503, 504)
+_DROPPED_HEADERS = (b"content-length", b"date", b"x-request-id")
+
+
+class StaleResponses:
+    """
+    The last 200 JSON answer of each read, kept for `max_age` seconds in
+    an LRU bounded to `max_bytes` of bodies; bodies over `max_body` bytes
+    are not kept.
+    """
+
+    def __init__(self, max_age: float = 600.0, max_bytes: int = 32 * 1024 * 1024, max_body: int = 256 * 1024):
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_body = max_body
+        self.size = 0
+        self.stored = 0
+        self.served = 0  # failures answered with a stale body
+        self.misses = 0  # failures with nothing (fresh enough) to serve
+        self._entries: "OrderedDict[str, Tuple[float, List[Tuple[bytes, bytes]], bytes]]" = OrderedDict()
+
+    def store(self, key: str, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+        self._drop(key)
+        self._entries[key] = (time.monotonic(), headers, body)
+        self.size += len(body)
+        self.stored += 1
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+    def lookup(self, key: str) -> Tuple[float, List[Tuple[bytes, bytes]], bytes] | None:
+        """(age in seconds, headers, body) of the entry, if it is not older than max_age."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        age = time.monotonic() - entry[0]
+        if age > self.max_age:
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.served += 1
+        return age, entry[1], entry[2]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "stored": self.stored,
+            "served": self.served,
+            "misses": self.misses,
+        }
+
+
+class StaleIfErrorMiddleware:
+    """
+    ASGI middleware serving the stale-if-error of RFC 5861 on the server:
+    it keeps the last good answer of each read in `responses`, keyed by
+    path, query and Authorization header so one caller never sees
+    another's data, and when the same read later fails with a 5xx it
+    answers 200 with that body, marked with Age and a Warning header.
+    Good answers pass straight through.
+    """
+
+    def __init__(self, app: Any, responses: StaleResponses, paths: Tuple[str, ...] = READ_PATHS):
+        self.app = app
+        self.responses = responses
+        self.paths = paths
+
+    def _key(self, scope: Dict[str, Any]) -> str:
+        auth = next((v for k, v in scope["headers"] if k == b"authorization"), b"")
+        return f"{scope['path']}?{scope['query_string'].decode('latin-1')}\n{auth.decode('latin-1')}"
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if (scope["type"] != "http" or scope["method"] != "GET" or self.responses.max_age <= 0
+                or not scope["path"].startswith(self.paths)):
+            await self.app(scope, receive, send)
+            return
+
+        key = self._key(scope)
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] | None = None  # body of a 200 being kept
+        replaced = False
+
+        async def send_or_replace(message: Dict[str, Any]) -> None:
+            nonlocal headers, chunks, replaced
+            if message["type"] == "http.response.start":
+                if message["status"] in ERROR_STATUSES:
+                    entry = self.responses.lookup(key)
+                    if entry is not None:
+                        replaced = True
+                        age, stale_headers, body = entry
+                        logger.warning("Serving a %.0fs old response for %s after a %s.",
+                                       age, scope["path"], message["status"])
+                        await send({"type": "http.response.start", "status": 200, "headers": stale_headers + [
+                            (b"content-length", str(len(body)).encode()),
+                            (b"age", str(int(age)).encode()),
+                            (b"warning", b'111 - "Revalidation Failed"'),
+                        ]})
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                elif message["status"] == 200:
+                    headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in _DROPPED_HEADERS]
+                    content_type = next((v for k, v in headers if k.lower() == b"content-type"), b"")
+                    if content_type.startswith(b"application/json"):
+                        chunks = []
+                await send(message)
+                return
+            if replaced:
+                # The failed response's body; the stale one has been sent
+                return
+            if chunks is not None and message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if sum(map(len, chunks)) > self.responses.max_body:
+                    chunks = None
+                elif not message.get("more_body", False):
+                    self.responses.store(key, headers, b"".join(chunks))
+            await send(message)
+
+        await self.app(scope, receive, send_or_replace)
+
+
+def stale_responses_from_env() -> StaleResponses:
+    """Builds the store from STALE_* settings; STALE_IF_ERROR_MAX_AGE=0 turns stale serving off."""
+    return StaleResponses(
+        max_age=float(os.environ.get("STALE_IF_ERROR_MAX_AGE", "600")),
+        max_bytes=int(os.environ.get("STALE_CACHE_BYTES", str(32 * 1024 * 1024))),
+        max_body=int(os.environ.get("STALE_MAX_BODY", str(256 * 1024))),
+    )
@@ -0,0 +1,302 @@
+import functools
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Sequence
+
+import httpx
+import orjson
+from postgrest.exceptions import APIError, generate_default_error_message
+
+from .repository import (
+    BLOB_COLUMN, ITINERARY_COLUMNS, ITINERARY_VERSIONED_COLUMNS, PATCH_ERROR_SQLSTATE, SEARCH_DEFAULT_FIELDS, SEARCH_FIELDS, Blob,
+    ItinerarySearch, PatchError, PatchOutcome, Repository, RepositoryError,
+)
+
+# PostgREST's like/ilike filters turn every "*" in the value into "%", so a
+# literal "*" cannot be written there. Searches use imatch (~*) instead:
+# in a regular expression every character can be escaped, and the trigram
+# indexes serve it as they serve ILIKE. PostgREST's reserved ",:()" are
+# escaped with the rest; a backslash before punctuation is just that
+# character to the regex.
+_REGEX_SPECIAL = re.compile(r"([\\^$.|?*+()\[\]{},:])")
+
+
+def regex_pattern(text: str, match: str) -> str:
+    """An imatch (~*) pattern matching `text` literally: "contains", "prefix" or "exact"."""
+    escaped = _REGEX_SPECIAL.sub(r"\\\1", text)
+    return {"contains": escaped, "prefix": f"^{escaped}", "exact": f"^{escaped}$"}[match]
+
+
+def _translate_errors(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return await fn(*args, **kwargs)
+        except APIError as err:
+            if err.code == PATCH_ERROR_SQLSTATE:
+                raise PatchError(err.message) from err
+            raise RepositoryError(err.message or "PostgREST error", err.code) from err
+
+    return wrapper
+
+
+class SupabaseRepository(Repository):
+    """
+    Repository over PostgREST, through the Supabase client's query builder
+    (or anything exposing the same table()/select()/.../execute() chain).
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+
+    async def _rest(self, method: str, table: str, params: Dict[str, str], content: bytes | None = None,
+                    headers: Dict[str, str] | None = None) -> httpx.Response:
+        """Sends one request straight through the client's PostgREST session."""
+        postgrest = self.client.postgrest
+        response = await postgrest.session.request(
+            method,
+            f"{postgrest.base_url}/{table}",
+            params=params,
+            content=content,
+            headers={**postgrest.headers, **(headers or {})},
+        )
+        if response.is_error and response.status_code != 406:
+            try:
+                raise APIError(orjson.loads(response.content))
+            except orjson.JSONDecodeError:
+                raise APIError(generate_default_error_message(response))
+        return response
+
+    # --- customers ---
+    @_translate_errors
+    async def find_customer(self, email: str, columns: Sequence[str]) -> Dict[str, Any] | None:
+        response = await (
+            self.client.table("customers")
+            .select(", ".join(columns))
+            .eq("email", email)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    @_translate_errors
+    async def insert_customer(self, row: Dict[str, Any]) -> int:
+        response = await self.client.table("customers").insert(row).execute()
+        return response.data[0]['customer_id']
+
+    @_translate_errors
+    async def update_customer(self, email: str, fields: Dict[str, Any]) -> int:
+        response = await (
+            self.client.table("customers")
+            .update(fields)
+            .eq("email", email)
+            .execute()
+        )
+        # The update returns the changed rows but no count unless one is requested
+        return response.count if response.count is not None else len(response.data)
+
+    @_translate_errors
+    async def delete_customer(self, email: str) -> int:
+        response = await (
+            self.client.table("customers")
+            .delete()
+            .eq("email", email)
+            .execute()
+        )
+        return response.count if response.count is not None else len(response.data)
+
+    # --- itineraries ---
+    @_translate_errors
+    async def insert_itineraries(self, rows: List[Dict[str, Any]]) -> List[int]:
+        response = await self.client.table("itineraries").insert(rows).execute()
+        # PostgREST returns the inserted rows in request order
+        return [row['itinerary_id'] for row in response.data]
+
+    @_translate_errors
+    async def delete_itineraries(self, customer_id: int, itinerary_ids: List[int] | None = None) -> List[int]:
+        query = (
+            self.client.table("itineraries")
+            .delete()
+            .eq("customer_id", customer_id)
+        )
+        if itinerary_ids is not None:
+            query = query.in_("itinerary_id", itinerary_ids)
+        response = await query.execute()
+        return [row['itinerary_id'] for row in response.data]
+
+    @_translate_errors
+    async def list_itineraries(
+        self, customer_id: int, columns: Sequence[str] = ITINERARY_COLUMNS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        query = (
+            self.client.table("itineraries")
+            .select(", ".join(columns))
+            .eq("customer_id", customer_id)
+        )
+        if before_id is not None:
+            query = query.lt("itinerary_id", before_id)
+        query = query.order("itinerary_id", desc=True)
+        if limit is not None:
+            query = query.limit(limit)
+        return (await query.execute()).data
+
+    @_translate_errors
+    async def list_itineraries_by_email(
+        self, email: str, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> tuple[int | None, List[Dict[str, Any]]]:
+        # Supabase API does the join via foreign key relationship in the 'select' string
+        response = await (
+            self.client.table("itineraries")
+            .select(", ".join(("customer_id", *columns, "customers!inner(email)")))
+            .eq("customers.email", email)
+            .order("itinerary_id", desc=True)
+            .execute()
+        )
+        rows = [{column: item[column] for column in columns} for item in response.data]
+        return (response.data[0]['customer_id'] if response.data else None), rows
+
+    @_translate_errors
+    async def get_itinerary(
+        self, customer_id: int, itinerary_id: int, columns: Sequence[str] = ITINERARY_COLUMNS
+    ) -> Dict[str, Any] | None:
+        response = await (
+            self.client.table("itineraries")
+            .select(", ".join(columns))
+            .eq("itinerary_id", itinerary_id)
+            .eq("customer_id", customer_id)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    @_translate_errors
+    async def search_itineraries(
+        self, customer_id: int, search: ItinerarySearch, fields: Sequence[str] = SEARCH_DEFAULT_FIELDS,
+        limit: int | None = None, before_id: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        # Keys inside itinerary_data are projected and filtered with
+        # PostgREST's JSON operators, aliased to their plain names
+        select = ", ".join(
+            f"{field}:itinerary_data->>{field}" if field not in ITINERARY_COLUMNS + (BLOB_COLUMN,) else field
+            for field in fields if field in SEARCH_FIELDS + (BLOB_COLUMN,)
+        )
+        query = (
+            self.client.table("itineraries")
+            .select(select)
+            .eq("customer_id", customer_id)
+        )
+        if search.name:
+            query = query.filter("itinerary_name", "imatch",
+                                 regex_pattern(search.name, "prefix" if search.name_prefix else "contains"))
+        if search.destination:
+            query = query.filter("itinerary_data->>destination", "imatch", regex_pattern(search.destination, "exact"))
+        if search.date_from:
+            query = query.gte("itinerary_data->>end_date", search.date_from)
+        if search.date_to:
+            query = query.lte("itinerary_data->>start_date", search.date_to)
+        if before_id is not None:
+            query = query.lt("itinerary_id", before_id)
+        query = query.order("itinerary_id", desc=True)
+        if limit is not None:
+            query = query.limit(limit)
+        return (await query.execute()).data
+
+    @_translate_errors
+    async def patch_itinerary(
+        self, customer_id: int, itinerary_id: int, expected_version: int, patch: Any, kind: str
+    ) -> PatchOutcome:
+        # The database function (db/migrations/0006) checks the version and
+        # applies the patch in one call
+        response = await self._rest(
+            "POST", "rpc/patch_itinerary",
+            params={},
+            content=orjson.dumps({
+                "p_customer_id": customer_id,
+                "p_itinerary_id": itinerary_id,
+                "p_expected_version": expected_version,
+                "p_patch": patch,
+                "p_kind": kind,
+            }),
+            headers={"Content-Type": "application/json"},
+        )
+        rows = orjson.loads(response.content)
+        if not rows:
+            return PatchOutcome(None, False)
+        return PatchOutcome(rows[0]['current_version'], rows[0]['applied'])
+
+    @_translate_errors
+    async def replace_itinerary_data(
+        self, customer_id: int, itinerary_id: int, expected_version: int, itinerary_data: Any,
+        itinerary_blob: str | None = None,
+    ) -> PatchOutcome:
+        # The version filter makes the update a compare-and-set
+        row = {"itinerary_id": f"eq.{itinerary_id}", "customer_id": f"eq.{customer_id}"}
+        response = await self._rest(
+            "PATCH", "itineraries",
+            params={**row, "version": f"eq.{expected_version}", "select": "version"},
+            content=orjson.dumps({
+                "itinerary_data": itinerary_data, BLOB_COLUMN: itinerary_blob, "version": expected_version + 1,
+            }),
+            headers={"Content-Type": "application/json", "Prefer": "return=representation"},
+        )
+        updated = orjson.loads(response.content)
+        if updated:
+            return PatchOutcome(updated[0]['version'], True)
+        response = await self._rest("GET", "itineraries", params={**row, "select": "version"})
+        current = orjson.loads(response.content)
+        return PatchOutcome(current[0]['version'] if current else None, False)
+
+    # --- content-addressed payloads ---
+    @_translate_errors
+    async def insert_blobs(self, blobs: List[Blob]) -> None:
+        # bytea goes over PostgREST's JSON as "\x" + hex
+        await self._rest(
+            "POST", "itinerary_blobs",
+            params={"on_conflict": "hash"},
+            content=orjson.dumps([
+                {"hash": blob.hash, "encoding": blob.encoding, "data": "\\x" + bytes(blob.data).hex(),
+                 "raw_size": blob.raw_size}
+                for blob in blobs
+            ]),
+            headers={"Content-Type": "application/json", "Prefer": "resolution=ignore-duplicates,return=minimal"},
+        )
+
+    @_translate_errors
+    async def get_blobs(self, hashes: Sequence[str]) -> Dict[str, Blob]:
+        response = await self._rest(
+            "GET", "itinerary_blobs",
+            params={"select": "hash,encoding,data,raw_size", "hash": f"in.({','.join(hashes)})"},
+        )
+        return {row['hash']: Blob(row['hash'], row['encoding'], bytes.fromhex(row['data'][2:]), row['raw_size'])
+                for row in orjson.loads(response.content)}
+
+    # --- raw JSON passthrough ---
+    @_translate_errors
+    async def insert_itinerary_raw(
+        self, customer_id: int, itinerary_name: str, itinerary_data: bytes, itinerary_blob: str | None = None
+    ) -> int:
+        # The data bytes are spliced into the insert body unchanged
+        row = b'{"customer_id":%d,"itinerary_name":%b,"itinerary_blob":%b,"itinerary_data":%b}' % (
+            customer_id, orjson.dumps(itinerary_name), orjson.dumps(itinerary_blob), itinerary_data
+        )
+        response = await self._rest(
+            "POST", "itineraries",
+            params={"select": "itinerary_id"},
+            content=row,
+            headers={"Content-Type": "application/json", "Prefer": "return=representation"},
+        )
+        return orjson.loads(response.content)[0]['itinerary_id']
+
+    @_translate_errors
+    async def get_itinerary_raw(self, customer_id: int, itinerary_id: int) -> bytes | None:
+        response = await self._rest(
+            "GET", "itineraries",
+            params={
+                "select": ",".join(ITINERARY_VERSIONED_COLUMNS),
+                "itinerary_id": f"eq.{itinerary_id}",
+                "customer_id": f"eq.{customer_id}",
+            },
+            # Single-object response; PostgREST answers 406 when no row matches
+            headers={"Accept": "application/vnd.pgrst.object+json"},
+        )
+        return None if response.status_code == 406 else response.content
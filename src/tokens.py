@@ -0,0 +1,58 @@
+import logging
+import os
+import secrets
+import time
+
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", "3600"))
+
+_secret: str | None = None
+_bearer = HTTPBearer(auto_error=False)
+
+
+def _signing_key() -> str:
+    global _secret
+    if _secret is None:
+        _secret = os.environ.get("SESSION_SECRET")
+        if not _secret:
+            # Tokens then only verify in this process and die with it
+            logger.warning("SESSION_SECRET is not set; using a random per-process key.")
+            _secret = secrets.token_urlsafe(32)
+    return _secret
+
+
+def issue_token(customer_id: int) -> str:
+    """Signs a session token for `customer_id`, valid for SESSION_TTL_SECONDS."""
+    now = int(time.time())
+    claims = {"sub": str(customer_id), "iat": now, "exp": now + SESSION_TTL_SECONDS}
+    return jwt.encode(claims, _signing_key(), algorithm=ALGORITHM)
+
+
+def verify_token(token: str) -> int | None:
+    """Returns the token's customer_id, or None if it is forged, malformed or expired."""
+    try:
+        claims = jwt.decode(token, _signing_key(), algorithms=[ALGORITHM], leeway=5, options={"require": ["sub", "exp"]})
+        return int(claims["sub"])
+    except (jwt.InvalidTokenError, ValueError):
+        return None
+
+
+async def current_customer_id(credentials: HTTPAuthorizationCredentials | None = Depends(_bearer)) -> int:
+    """
+    FastAPI dependency: the customer_id from the request's bearer token.
+    Verification is a local signature check, with no database or bcrypt work.
+    """
+    customer_id = verify_token(credentials.credentials) if credentials else None
+    if customer_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or invalid session token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return customer_id
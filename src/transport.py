@@ -0,0 +1,106 @@
+import asyncio
+import httpx
+import os
+import random
+import time
+from typing import Any, AsyncIterator, Dict
+from . import metrics
+
+
+# Retrying is only safe for requests that do not change anything server-side.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+def transport_settings() -> Dict[str, Any]:
+    """Reads the HTTP transport settings from SUPABASE_HTTP_* environment variables."""
+    pool_size = int(os.environ.get("SUPABASE_HTTP_POOL_SIZE", "20"))
+    return {
+        "max_connections": pool_size,
+        # Keeping fewer idle connections than the pool allows means every
+        # burst above that level opens and closes fresh connections.
+        "max_keepalive_connections": int(os.environ.get("SUPABASE_HTTP_KEEPALIVE", str(pool_size))),
+        "keepalive_expiry": float(os.environ.get("SUPABASE_HTTP_KEEPALIVE_EXPIRY", "30")),
+        "connect_timeout": float(os.environ.get("SUPABASE_HTTP_CONNECT_TIMEOUT", "5")),
+        "timeout": float(os.environ.get("SUPABASE_HTTP_TIMEOUT", "10")),
+        "pool_timeout": float(os.environ.get("SUPABASE_HTTP_POOL_TIMEOUT", "5")),
+        "http2": os.environ.get("SUPABASE_HTTP2", "false").lower() in ("1", "true", "yes"),
+        "read_retries": int(os.environ.get("SUPABASE_HTTP_READ_RETRIES", "2")),
+        "retry_backoff": float(os.environ.get("SUPABASE_HTTP_RETRY_BACKOFF", "0.1")),
+    }
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """Wraps a response body to report its size once it has been read."""
+
+    def __init__(self, stream: httpx.AsyncByteStream):
+        self.stream = stream
+        self.size = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            self.size += len(chunk)
+            yield chunk
+        metrics.record_received(self.size)
+
+    async def aclose(self) -> None:
+        await self.stream.aclose()
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    Retries idempotent requests that fail with a transport error or a
+    502/503/504, sleeping a random "full jitter" backoff between attempts
+    (uniform between 0 and backoff * 2**attempt).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, retries: int = 2, backoff: float = 0.1):
+        self.transport = transport
+        self.retries = retries
+        self.backoff = backoff
+        self.retried = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        max_retries = self.retries if request.method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            try:
+                start = time.perf_counter()
+                response = await self.transport.handle_async_request(request)
+                metrics.record_round_trip(time.perf_counter() - start, len(request.content))
+                response.stream = _CountingStream(response.stream)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    return response
+                # Drain the (small) error body so the connection goes back to the pool
+                await response.aread()
+                await response.aclose()
+            except httpx.TransportError:
+                if attempt >= max_retries:
+                    raise
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            attempt += 1
+            self.retried += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def build_http_client(**overrides: Any) -> httpx.AsyncClient:
+    """Builds the pooled, keep-alive HTTP client handed to the Supabase client."""
+    settings = {**transport_settings(), **overrides}
+    limits = httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_keepalive_connections"],
+        keepalive_expiry=settings["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(
+        settings["timeout"],
+        connect=settings["connect_timeout"],
+        pool=settings["pool_timeout"],
+    )
+    pool = httpx.AsyncHTTPTransport(limits=limits, http2=settings["http2"])
+    return httpx.AsyncClient(
+        transport=RetryTransport(pool, settings["read_retries"], settings["retry_backoff"]),
+        timeout=timeout,
+        follow_redirects=True,
+    )